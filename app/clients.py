@@ -1,10 +1,19 @@
 import boto3
-from openai import OpenAI
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, DefaultHttpxClient, OpenAI
 
 from app.core.config import settings
+from app.services.metrics import openai_async_http_hooks, openai_http_hooks
 
 # External clients initialized once and reused.
-openai_client = OpenAI(api_key=settings.OPENAI_API_KEY)
+openai_client = OpenAI(
+    api_key=settings.OPENAI_API_KEY,
+    http_client=DefaultHttpxClient(event_hooks=openai_http_hooks()),
+)
+# 챗봇(asyncio 파이프라인) 전용. 이벤트 루프 스레드를 막지 않는다.
+async_openai_client = AsyncOpenAI(
+    api_key=settings.OPENAI_API_KEY,
+    http_client=DefaultAsyncHttpxClient(event_hooks=openai_async_http_hooks()),
+)
 s3_client = boto3.client(
     "s3",
     aws_access_key_id=settings.AWS_ACCESS_KEY,
@@ -9,13 +9,61 @@ class Settings(BaseSettings):
     EMBED_MODEL: str = "text-embedding-3-small"
     EMBED_CHUNK_WORDS: int = 400
     EMBED_CHUNK_OVERLAP: int = 50
+    EMBED_DIMENSIONS: int | None = None  # text-embedding-3 축소 차원(예: 512, 1024). None이면 모델 기본 차원
+    EMBED_MAX_INPUT_TOKENS: int = 8191  # 입력 1개 토큰 상한 (text-embedding-3)
+    EMBED_BATCH_MAX_TOKENS: int = 100000  # 요청 1건 토큰 합 상한 (API 상한 300k보다 작게)
+    EMBED_BATCH_MAX_INPUTS: int = 512  # 요청 1건 입력 수 상한 (API 상한 2048)
+    EMBED_BATCH_CONCURRENCY: int = 4  # 동시 임베딩 요청 수
+    EMBED_BATCH_RETRIES: int = 2  # 배치 단위 재시도 횟수 (SDK 자체 재시도와 별도)
+    EMBED_OVERLONG_POLICY: str = "split"  # 상한 초과 청크: split(나눠 임베딩 후 가중 평균) | truncate(앞부분만)
+    EMBED_CACHE_PATH: str | None = ".cache/embeddings.sqlite3"  # 임베딩 캐시(SQLite). 비우면 비활성
+    EMBED_CACHE_MAX_ENTRIES: int = 50000  # 초과 시 가장 오래 쓰이지 않은 벡터부터 삭제
     RDB_MODEL: str = "gpt-4o"
+    CHAT_FUSED_PLANNER: bool = True  # 플래너 호출에서 후보 SELECT까지 함께 생성 (LLM 왕복 1회 절감)
 
     # AI 모델 설정 (기본값 설정 가능)
     SPLIT_SECONDS: int = 600
     STT_MODEL: str = "whisper-1"
     SUM_MODEL: str = "gpt-4o"
 
+    # OpenAI 호출 한도 (app/services/rate_governor.py). tpm/rpm이 0이면 해당 한도 미적용
+    # 한도는 계정 티어마다 다르므로 기본값은 없음(사용량 추적/우선순위/동시성만 적용). 실제 한도를 env로 설정한다.
+    # 예: LLM_RATE_LIMITS='{"gpt-4o": {"tpm": 800000, "rpm": 10000}, "text-embedding-3-small": {"tpm": 5000000, "rpm": 10000}}'
+    LLM_GOVERNOR_ENABLED: bool = True
+    LLM_RATE_LIMITS: dict[str, dict[str, int]] = {}
+    LLM_DEFAULT_TPM: int = 0  # LLM_RATE_LIMITS에 없는 모델
+    LLM_DEFAULT_RPM: int = 0
+    LLM_MAX_CONCURRENCY: int = 16  # 모델별 동시 진행 호출 상한 (0이면 무제한)
+    LLM_QUEUE_TIMEOUT_S: float = 120.0  # 한도 대기 최대 시간
+    LLM_PRIORITY_AGING_S: float = 30.0  # 이 시간만큼 기다리면 우선순위 한 단계 상승 (기아 방지)
+
+    # 챗봇 답변 컨텍스트
+    CHAT_CONTEXT_TOKEN_BUDGET: int = 6000  # 최종 답변 프롬프트의 history + DB + RAG 토큰 예산
+    CHAT_RAG_DEDUP_JACCARD: float = 0.8  # 이 값 이상 겹치는 스니펫은 중복으로 제거
+
+    # 챗봇 대화 이력 (sessionId별 요약)
+    CHAT_HISTORY_RECENT_TURNS: int = 6  # 원문으로 유지할 최근 메시지 수
+    CHAT_HISTORY_TOKEN_BUDGET: int = 1200  # 각 LLM 단계에 넣는 history 블록 토큰 상한
+    CHAT_HISTORY_MESSAGE_TOKENS: int = 300  # 최근 메시지 1개당 토큰 상한
+    CHAT_HISTORY_SUMMARY_TOKENS: int = 400
+    CHAT_HISTORY_SUMMARY_MODEL: str = "gpt-4o-mini"
+    CHAT_HISTORY_MAX_SESSIONS: int = 2000
+
+    # 챗봇 액션 추천
+    CHAT_ACTION_RULES: bool = True  # 키워드 규칙이 확실하면 LLM 액션 추천 생략
+    CHAT_ACTION_TIMEOUT_S: float = 15.0  # 답변 종료 후 액션 결과를 기다리는 최대 시간
+
+    # 챗봇 답변 스트림 헤지 (첫 토큰이 늦으면 같은 요청을 하나 더 보내 먼저 온 쪽 사용)
+    CHAT_HEDGE_ENABLED: bool = False
+    CHAT_HEDGE_PERCENTILE: float = 0.95  # 관측 TTFT의 이 백분위를 헤지 마감으로 사용
+    CHAT_HEDGE_MIN_SAMPLES: int = 20  # 표본이 이보다 적으면 기본 마감 사용
+    CHAT_HEDGE_DEFAULT_DELAY_S: float = 2.0
+    CHAT_HEDGE_MIN_DELAY_S: float = 0.5
+    CHAT_HEDGE_MAX_DELAY_S: float = 8.0
+
+    # 같은 sessionId로 새 질문이 오면 진행 중인 이전 답변 생성을 취소
+    CHAT_CANCEL_ON_REASK: bool = True
+
     # Spring 콜백 설정
     CALLBACK_HEADER: str 
     CALLBACK_KEY: str 
@@ -26,9 +74,56 @@ class Settings(BaseSettings):
     WEAVIATE_HTTP_URL: str | None = "http://localhost:8080"
     WEAVIATE_GRPC_PORT: int = 50051
     WEAVIATE_COLLECTION: str = "ProvDocuments"
+    WEAVIATE_HEALTH_CHECK_S: int = 30  # 커넥션 재사용 전 liveness 확인 주기 (0이면 매번 확인)
+    WEAVIATE_BATCH_SIZE: int = 0  # 0이면 dynamic 배치(자동 크기), 양수면 고정 크기 배치
+    WEAVIATE_BATCH_CONCURRENCY: int = 2  # 고정 크기 배치의 동시 요청 수
+    WEAVIATE_BATCH_RETRIES: int = 2  # 실패 객체 재시도 횟수
+    # 컬렉션 인덱스 설정 (새 컬렉션 생성 시 적용, 기존 컬렉션은 migrate_weaviate.py로 반영)
+    WEAVIATE_HNSW_EF: int | None = None  # 검색 후보 수. None이면 서버 기본(동적 ef)
+    WEAVIATE_HNSW_EF_CONSTRUCTION: int | None = None  # 생성 시에만 지정 가능
+    WEAVIATE_HNSW_MAX_CONNECTIONS: int | None = None  # 생성 시에만 지정 가능
+    WEAVIATE_FILTER_STRATEGY: str | None = None  # sweeping | acorn (acorn은 Weaviate 1.27+)
+    WEAVIATE_COMPRESSION: str = "none"  # none | pq | bq | sq
+    WEAVIATE_PQ_SEGMENTS: int | None = None  # None이면 서버가 차원에 맞춰 결정
+    WEAVIATE_CONTENT_TOKENIZATION: str = "word"  # content BM25 토큰화 (kagome_kr은 서버 ENABLE_TOKENIZER_KAGOME_KR 필요, 생성 시에만)
+    RAG_SEARCH_MODE: str = "hybrid"  # vector | hybrid (BM25 + 벡터)
+    RAG_HYBRID_ALPHA: float = 0.6  # 1이면 벡터만, 0이면 BM25만
+    RAG_ARTICLE_LOOKUP: bool = True  # 질문에 "제N조"가 있으면 그 조 번호로 좁혀 순위 검색 (결과 없으면 전체 검색)
+    WEAVIATE_MULTI_TENANCY: bool = False  # comId별 Weaviate 테넌트 사용 (새 컬렉션 필요, migrate_weaviate.py to-tenants)
+    WEAVIATE_COMPRESSION_TRAINING_LIMIT: int | None = None  # pq/sq 학습에 쓸 객체 수
+    PROV_INGEST_MODE: str = "diff"  # diff: 바뀐 조항만 임베딩/반영, full: 문서 전체 재임베딩 후 교체
 
     # RDB (직원 정보 조회 등)
     EMP_DB_DSN: str | None = None  # 예: sqlite:////path/to/file.db 또는 postgres://...
+    EMP_DB_READ_DSN: str | None = None  # 챗봇 SELECT 전용 읽기 레플리카 (없으면 EMP_DB_DSN)
+    SQL_POOL_SIZE: int = 5
+    SQL_MAX_OVERFLOW: int = 10
+    SQL_POOL_TIMEOUT_S: int = 10
+    SQL_POOL_RECYCLE_S: int = 1800
+    SQL_STATEMENT_TIMEOUT_MS: int = 3000  # 서버 측 문장 타임아웃 (0이면 비활성)
+    SQL_EXPLAIN_MAX_ROWS: int = 200000  # EXPLAIN 예상 행 수 상한 (0이면 비용 검사 생략)
+    SQL_GUARD_REWRITE_LIKE: bool = False  # 상한 초과 시 LIKE '%..%'를 접두 검색으로 좁혀 재시도 (결과에 좁힌 검색임을 표시)
+    SQL_MAX_ROWS: int = 50  # fetchmany 상한
+    SCHEMA_CATALOG_REFRESH_S: int = 600  # 스키마 카탈로그 주기 갱신 (0이면 비활성)
+    SCHEMA_CATALOG_MAX_TABLES: int = 4  # SQL 생성 프롬프트에 넣을 최대 테이블 수
+    SQL_CACHE_TTL_S: int = 30  # 챗봇 SQL 결과 캐시 기본 TTL (0이면 비활성)
+    SQL_CACHE_TABLE_TTLS: dict[str, int] = {
+        "employee": 300,
+        "meeting_room": 300,
+        "corporate_car": 300,
+        "shared_equipment": 300,
+        "mail": 10,
+        "attendance": 10,
+        "todo_list": 10,
+    }
+    SQL_CACHE_MAX_ENTRIES: int = 512
+    SQL_CACHE_MAX_BYTES: int = 8 * 1024 * 1024
+
+    # 요청 단위 tracing (app/services/tracing.py)
+    TRACE_ENABLED: bool = True
+    TRACE_KEEP: int = 200  # waterfall 조회용으로 메모리에 남길 최근 trace 수
+    TRACE_JSONL_PATH: str | None = None  # 예: logs/traces.jsonl (span 1개당 한 줄)
+    TRACE_OTLP_ENDPOINT: str | None = None  # 예: http://localhost:4318/v1/traces (OTLP/HTTP JSON)
 
     # AWS S3 설정
     AWS_REGION: str 
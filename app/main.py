@@ -1,4 +1,8 @@
-from fastapi import BackgroundTasks, FastAPI, Header, HTTPException, status, Body
+import asyncio
+from contextlib import asynccontextmanager
+
+from fastapi import BackgroundTasks, FastAPI, Header, HTTPException, Response, status, Body
+from fastapi.responses import PlainTextResponse
 
 import weaviate
 from weaviate.connect import ConnectionParams
@@ -11,11 +15,45 @@ from app.schemas import (
     RunRequest,
 )
 from app.routers.chatbot import router as chatbot_router
+from app.services.chatbot.callback_client import close_http
+from app.services.chatbot.chatbot_service import cancel_all_chatbots
+from app.services.chatbot.rdb_service import dispose_read_engine
+from app.services.chatbot.schema_catalog import start_schema_catalog, stop_schema_catalog
+from app.services.llm_usage import usage_stats
+from app.services.metrics import CONTENT_TYPE, render_metrics
+from app.services.provdocuments.embedding_cache import cache_stats as embedding_cache_stats
+from app.services.rate_governor import governor_status
+from app.services.tracing import recent_traces, trace_waterfall
 from app.workers.meetings import process_job
 from app.workers.prov_documents import process_prov_embedding
-from app.services.provdocuments.weaviate_store import delete_prov_chunks, update_prov_chunks_public
+from app.services.provdocuments.weaviate_store import (
+    bootstrap_weaviate,
+    close_weaviate,
+    delete_prov_chunks,
+    update_prov_chunks_public,
+    visibility_progress,
+)
+
 
-app = FastAPI(title="Meeting AI")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 최초 로드는 DB inspect(블로킹)이므로 스레드에서. DB가 느려도 이벤트 루프는 막지 않는다.
+    await asyncio.to_thread(start_schema_catalog)
+    try:
+        # 스키마 확인은 여기서 1회만. 실패해도 기동은 계속하고 첫 사용 시 다시 시도한다.
+        await asyncio.to_thread(bootstrap_weaviate)
+    except Exception as e:
+        print(f"[WEAVIATE] bootstrap failed: {e}")
+    yield
+    stop_schema_catalog()
+    await cancel_all_chatbots()
+    # 챗봇 파이프라인이 공유하는 비동기 커넥션 정리
+    await close_http()
+    await close_weaviate()
+    await dispose_read_engine()
+
+
+app = FastAPI(title="Meeting AI", lifespan=lifespan)
 app.include_router(chatbot_router)
 
 
@@ -36,6 +74,59 @@ def health():
     return {"ok": True}
 
 
+@app.get("/metrics")
+def metrics():
+    """
+    Prometheus 스크레이프용. 단계별 지연 히스토그램, OpenAI 토큰/재시도 카운터.
+    """
+    return Response(content=render_metrics(), media_type=CONTENT_TYPE)
+
+
+@app.get("/ai/llm/status")
+def llm_status(
+    x_callback_secret: str = Header(..., alias="X-CALLBACK-SECRET", convert_underscores=False),
+):
+    """
+    OpenAI 호출 한도 사용률(모델별 최근 1분 TPM/RPM, 대기열, 429 횟수)과 회사별 사용량,
+    단계별 누적 토큰과 프롬프트 캐시 적중(cachedTokens).
+    """
+    expected = settings.CALLBACK_KEY
+    if not expected or x_callback_secret != expected:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
+    return {**governor_status(), "stages": usage_stats(), "embeddingCache": embedding_cache_stats()}
+
+
+@app.get("/ai/traces")
+def list_traces(
+    limit: int = 50,
+    x_callback_secret: str = Header(..., alias="X-CALLBACK-SECRET", convert_underscores=False),
+):
+    expected = settings.CALLBACK_KEY
+    if not expected or x_callback_secret != expected:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
+    return {"traces": recent_traces(limit)}
+
+
+@app.get("/ai/traces/{trace_ref}")
+def get_trace(
+    trace_ref: str,
+    format: str = "json",
+    x_callback_secret: str = Header(..., alias="X-CALLBACK-SECRET", convert_underscores=False),
+):
+    """
+    trace id 또는 messageId/meetNo/provNo로 최근 요청의 span waterfall 조회. format=text면 막대 그래프 텍스트.
+    """
+    expected = settings.CALLBACK_KEY
+    if not expected or x_callback_secret != expected:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
+    waterfall = trace_waterfall(trace_ref)
+    if waterfall is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="trace not found")
+    if format == "text":
+        return PlainTextResponse(waterfall["text"])
+    return waterfall
+
+
 @app.post("/ai/meetings/run")
 def run_ai(req: RunRequest, background: BackgroundTasks):
     print(f"[AI RUN] meetNo={req.meetNo}, title={req.meetingTitle!r}")
@@ -80,9 +171,30 @@ def update_prov_embedding_status(
     if not expected or x_callback_secret != expected:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
     updated = update_prov_chunks_public(req.comId, req.provNo, req.isPublic)
+    progress = visibility_progress(req.comId, req.provNo) or {}
     return {
         "updated": updated,
+        "state": progress.get("state"),
+        "pending": progress.get("pending", 0),
         "comId": req.comId,
         "provNo": req.provNo,
         "isPublic": req.isPublic,
     }
+
+
+@app.get("/api/v1/prov-documents/embedding/status/progress")
+def get_prov_embedding_status_progress(
+    comId: str,
+    provNo: int,
+    x_callback_secret: str = Header(..., alias="X-CALLBACK-SECRET", convert_underscores=False),
+):
+    """
+    isPublic 변경 진행 상황(total/updated/pending/state). PATCH가 오래 걸리는 대형 문서에서 다른 요청으로 조회한다.
+    """
+    expected = settings.CALLBACK_KEY
+    if not expected or x_callback_secret != expected:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
+    progress = visibility_progress(comId, provNo)
+    if progress is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="progress not found")
+    return {"comId": comId, "provNo": provNo, **progress}
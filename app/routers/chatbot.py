@@ -1,15 +1,74 @@
-from fastapi import APIRouter, BackgroundTasks
+from fastapi import APIRouter, Header, HTTPException, status
 
+from app.core.config import settings
 from app.schemas import ChatbotRunRequest
-from app.services.chatbot.chatbot_service import run_chatbot
+from app.services.chatbot.chatbot_service import cancel_chatbot, start_chatbot
+from app.services.chatbot.hedging import hedge_stats
+from app.services.chatbot.query_cache import cache_stats, fingerprint_stats
+from app.services.chatbot.schema_catalog import refresh_schema_catalog
 
 router = APIRouter(prefix="/ai/chatbot", tags=["chatbot"])
 
 
 @router.post("/run")
-def chatbot_run(req: ChatbotRunRequest, background: BackgroundTasks):
+async def chatbot_run(req: ChatbotRunRequest):
     """
     사내 규정 RAG 챗봇 실행. 즉시 수락 응답 후 백그라운드에서 처리.
+    처리 태스크는 messageId로 등록되어 DELETE /ai/chatbot/{messageId}로 취소할 수 있다.
     """
-    background.add_task(run_chatbot, req)
+    start_chatbot(req)
     return {"accepted": True, "messageId": req.messageId}
+
+
+def _check_secret(x_callback_secret: str):
+    expected = settings.CALLBACK_KEY
+    if not expected or x_callback_secret != expected:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
+
+
+@router.post("/schema/refresh")
+def chatbot_schema_refresh(
+    x_callback_secret: str = Header(..., alias="X-CALLBACK-SECRET", convert_underscores=False),
+):
+    """
+    DB 스키마 변경 후 Text-to-SQL용 스키마 카탈로그를 즉시 다시 읽는다.
+    """
+    _check_secret(x_callback_secret)
+    tables = refresh_schema_catalog()
+    return {"refreshed": True, "tables": tables}
+
+
+@router.get("/sql/stats")
+def chatbot_sql_stats(
+    limit: int = 50,
+    x_callback_secret: str = Header(..., alias="X-CALLBACK-SECRET", convert_underscores=False),
+):
+    """
+    SQL 결과 캐시 적중률과 정규화 문장별 실행 횟수/지연 통계.
+    """
+    _check_secret(x_callback_secret)
+    return {"cache": cache_stats(), "fingerprints": fingerprint_stats(limit)}
+
+
+@router.get("/stream/stats")
+def chatbot_stream_stats(
+    x_callback_secret: str = Header(..., alias="X-CALLBACK-SECRET", convert_underscores=False),
+):
+    """
+    답변 스트림 첫 토큰 지연(p50/p95/p99)과 헤지 요청 발사/승리 횟수.
+    """
+    _check_secret(x_callback_secret)
+    return hedge_stats()
+
+
+@router.delete("/{messageId}")
+async def chatbot_cancel(
+    messageId: str,
+    x_callback_secret: str = Header(..., alias="X-CALLBACK-SECRET", convert_underscores=False),
+):
+    """
+    진행 중인 챗봇 요청 취소. 플래너/SQL/검색/답변 스트림을 중단하고 이후 콜백은 보내지 않는다.
+    태스크 취소는 이벤트 루프 스레드에서 해야 하므로 async 엔드포인트로 둔다.
+    """
+    _check_secret(x_callback_secret)
+    return {"cancelled": cancel_chatbot(messageId), "messageId": messageId}
@@ -12,6 +12,7 @@ class RunRequest(BaseModel):
     meetingTitle: Optional[str] = None
     sttModel: Optional[str] = None
     summaryModel: Optional[str] = None
+    comId: Optional[str] = None  # OpenAI 호출 한도를 회사별로 나눠 쓰기 위한 식별자
 
 
 class ProvEmbeddingRequest(BaseModel):
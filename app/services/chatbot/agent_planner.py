@@ -3,9 +3,13 @@ from typing import List, Literal, Optional
 
 from pydantic import BaseModel, ValidationError
 
-from app.clients import openai_client
+from app.clients import async_openai_client
 from app.core.config import settings
-from app.services.chatbot.utils import _history_to_text, clean_json_string
+from app.services.chatbot.agent_tools import available_rdb_queries, describe_rdb_queries, today_str
+from app.services.chatbot.schema_catalog import ensure_schema_catalog, schema_summary_for
+from app.services.chatbot.utils import clean_json_string
+from app.services.llm_usage import record_usage
+from app.services.rate_governor import allm_slot, estimate_chat_tokens
 
 
 class RagTask(BaseModel):
@@ -22,52 +26,146 @@ class QueryPlan(BaseModel):
     mode: Literal["rdb", "rag", "hybrid"] = "rag"
     rag_tasks: List[RagTask] = []
     rdb_tasks: List[RdbTask] = []
+    sql: Optional[str] = None  # 통합 플래너가 생성한 후보 SELECT (사전 정의 쿼리가 없을 때)
     answer_style: Optional[str] = None
 
 
-def plan_query(question: str, history, emp_id: str, com_id: Optional[str]) -> QueryPlan:
+def _plan_json_schema(task_names: List[str]) -> dict:
+    """
+    strict structured output용 JSON 스키마. strict 모드는 모든 필드가 required여야 하므로 빈 값은 null로 받는다.
+    """
+    name_schema: dict = {"type": "string"}
+    if task_names:
+        name_schema["enum"] = task_names
+    nullable_str = {"type": ["string", "null"]}
+    return {
+        "name": "query_plan",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "additionalProperties": False,
+            "required": ["mode", "rag_tasks", "rdb_tasks", "sql", "answer_style"],
+            "properties": {
+                "mode": {"type": "string", "enum": ["rdb", "rag", "hybrid"]},
+                "rag_tasks": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "additionalProperties": False,
+                        "required": ["query", "top_k"],
+                        "properties": {"query": {"type": "string"}, "top_k": {"type": "integer"}},
+                    },
+                },
+                "rdb_tasks": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "additionalProperties": False,
+                        "required": ["name", "args"],
+                        "properties": {
+                            "name": name_schema,
+                            "args": {
+                                "type": "object",
+                                "additionalProperties": False,
+                                "required": ["date", "keyword", "limit"],
+                                "properties": {
+                                    "date": nullable_str,
+                                    "keyword": nullable_str,
+                                    "limit": {"type": ["integer", "null"]},
+                                },
+                            },
+                        },
+                    },
+                },
+                "sql": nullable_str,
+                "answer_style": nullable_str,
+            },
+        },
+    }
+
+
+# 프롬프트 캐시(앞부분 일치)가 적중하도록 고정 지시문을 앞에, 질문별 내용은 user 메시지 뒤쪽에 둔다.
+_PLANNER_RULES = (
+    "너는 사내 챗봇 플래너다. 질문을 해결하기 위해 DB 조회(RDB), 규정 검색(RAG), 또는 둘 다(Hybrid) 계획을 JSON으로만 출력한다.\n"
+    "- mode: rdb | rag | hybrid\n"
+    "- rag_tasks: [{\"query\": \"...\", \"top_k\": 5}]\n"
+    "- rdb_tasks: [{\"name\": \"task_name\", \"args\": {\"date\": null, \"keyword\": null, \"limit\": null}}]\n"
+    "- answer_style: 요약/비교/추천 등 힌트\n"
+    "규정/정책/조항 해석은 rag, 직원/회사 데이터/개수/목록/일정/예약/연락처는 rdb, 둘 다 필요하면 hybrid.\n"
+    "DB 조회는 허용된 테이블 범위 내에서만 계획해야 한다.\n"
+    "rdb_tasks의 name은 아래 사전 정의 쿼리 중 하나만 쓰고, args는 목록에 있는 것만 채우고 나머지는 null로 둔다(date는 YYYY-MM-DD). "
+    "맞는 쿼리가 없으면 rdb_tasks는 빈 배열로 둔다.\n"
+    "JSON만 출력하고, 설명은 쓰지 마.\n"
+    "이전 대화는 참고만 하고, 현재 질문을 최우선으로 계획을 세워라.\n"
+)
+
+_SQL_RULES = (
+    "- sql: rdb/hybrid인데 맞는 사전 정의 쿼리가 없을 때만 사용자 메시지의 [스키마]로 SELECT 한 개를 작성하고, 그 외에는 null.\n"
+    "  테이블/컬럼은 스키마에 있는 것만, INSERT/UPDATE/DELETE/DDL 금지, LIMIT 20 이하, "
+    "이름/텍스트 검색은 LIKE '%키워드%', 코드펜스와 세미콜론 없이 작성한다. "
+    "[회사 ID]가 주어지고 com_id 컬럼이 존재하면 WHERE com_id = '<회사 ID>' 조건을 반드시 포함한다.\n"
+)
+
+
+async def plan_query(question: str, history_text: str, emp_id: str, com_id: Optional[str]) -> QueryPlan:
     """
     LLM 기반 플래너: rdb/rag/hybrid 플랜(JSON)을 생성하고 검증한다.
+    CHAT_FUSED_PLANNER가 켜져 있으면 같은 호출에서 DB 질의용 후보 SELECT까지 만든다.
+    history_text는 history_store.build_history_block으로 크기가 제한된 블록이다.
     """
-    history_text = _history_to_text(history)
-    user_block = (
-        f"[이전 대화]\n{history_text}\n\n[현재 질문]\n{question}"
-        if history_text
-        else question
-    )
-    system_prompt = (
-        "너는 사내 챗봇 플래너다. 질문을 해결하기 위해 DB 조회(RDB), 규정 검색(RAG), 또는 둘 다(Hybrid) 계획을 JSON으로만 출력한다.\n"
-        "- mode: rdb | rag | hybrid\n"
-        "- rag_tasks: [{\"query\": \"...\", \"top_k\": 5}]\n"
-        "- rdb_tasks: [{\"name\": \"task_name\", \"args\": {...}}]\n"
-        "- answer_style: 요약/비교/추천 등 힌트\n"
-        "규정/정책/조항 해석은 rag, 직원/회사 데이터/개수/목록/일정/예약/연락처는 rdb, 둘 다 필요하면 hybrid.\n"
-        "DB 조회는 허용된 테이블 범위 내에서만 계획해야 한다.\n"
-        "JSON만 출력하고, 설명은 쓰지 마.\n"
-        "이전 대화는 참고만 하고, 현재 질문을 최우선으로 계획을 세워라."
-    )
+    # 카탈로그를 못 불러오면 사전 정의 쿼리/SQL 없이 계획한다 (동기 inspect를 루프에서 다시 시도하지 않도록)
+    loaded = await ensure_schema_catalog()
+    queries = available_rdb_queries() if loaded else {}
+    catalog = (describe_rdb_queries() if loaded else "") or "(없음)"
+    schema = ""
+    if settings.CHAT_FUSED_PLANNER and loaded:
+        try:
+            schema = schema_summary_for(question)
+        except Exception as e:
+            print(f"[PLANNER] schema unavailable, sql disabled: {e}")
+    # 고정 지시문 -> (카탈로그가 바뀔 때만 변하는) 사전 정의 쿼리 목록 순서
+    system_prompt = _PLANNER_RULES + (_SQL_RULES if schema else "") + f"[사전 정의 쿼리]\n{catalog}"
+
+    dynamic = []
+    if schema:
+        dynamic.append(f"[스키마]\n{schema}")
+        if com_id:
+            dynamic.append(f"[회사 ID]\n{com_id}")
+    if history_text:
+        dynamic.append(f"[이전 대화]\n{history_text}")
+    dynamic.append(f"[오늘 날짜]\n{today_str()}")
+    dynamic.append(f"[현재 질문]\n{question}")
+    user_block = "\n\n".join(dynamic)
+
+    raw = "{}"
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_block},
+    ]
     try:
-        resp = openai_client.chat.completions.create(
-            model=settings.RDB_MODEL,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_block},
-            ],
-            temperature=0,
-        )
-        
+        async with allm_slot(settings.RDB_MODEL, estimate_chat_tokens(messages, settings.RDB_MODEL)) as ticket:
+            resp = await async_openai_client.chat.completions.create(
+                model=settings.RDB_MODEL,
+                messages=messages,
+                temperature=0,
+                response_format={"type": "json_schema", "json_schema": _plan_json_schema(sorted(queries))},
+                prompt_cache_key="chatbot-planner",
+            )
+            ticket.settle(resp.usage)
+        record_usage("planner", settings.RDB_MODEL, resp.usage)
+
         raw = resp.choices[0].message.content or "{}"
-        
-        # --- [수정 시작] ---
-        # 1. 디버깅을 위해 LLM이 내뱉은 원문을 출력합니다.
         print(f"[PLANNER] Raw LLM Output: '{raw}'")
-
-        # 2. 마크다운 코드 블록(```json ... ```)이 포함되어 있다면 순수 JSON만 추출합니다.
         raw = clean_json_string(raw)
-        # --- [수정 끝] ---
 
         plan_dict = json.loads(raw)
-        return QueryPlan(**plan_dict)
+        for task in plan_dict.get("rdb_tasks") or []:
+            if isinstance(task.get("args"), dict):
+                task["args"] = {k: v for k, v in task["args"].items() if v is not None}
+        plan = QueryPlan(**plan_dict)
+        if not schema or plan.mode == "rag":
+            plan.sql = None
+        return plan
 
     except (ValidationError, json.JSONDecodeError) as e:
         # 여기서 에러가 발생할 때 raw 값을 출력하면 원인 파악이 쉽습니다.
@@ -1,10 +1,16 @@
+import asyncio
 import json
-from typing import Iterable, List, Optional
+import time
+from contextlib import AsyncExitStack
+from typing import AsyncIterator, Optional
 
-from app.clients import openai_client
+from app.clients import async_openai_client
 from app.core.config import settings
-from app.schemas import ChatHistoryMessage
-from app.services.chatbot.utils import _history_to_text, clean_json_string
+from app.services.chatbot.hedging import race_first_token, record_ttft
+from app.services.chatbot.utils import clean_json_string
+from app.services.llm_usage import record_usage
+from app.services.metrics import observe_stage
+from app.services.rate_governor import LlmTicket, allm_slot, estimate_chat_tokens
 
 _ACTIONS = [
     {"id": "NAV_MAIL_COMPOSE", "label": "메일 작성", "requiredParams": []},
@@ -13,38 +19,76 @@ _ACTIONS = [
     {"id": "NAV_APPROVAL_DRAFT", "label": "결재 작성", "requiredParams": []},
 ]
 
+# 로컬 규칙 매칭용 의도 구문: (대상 키워드, 행동 동사). 둘 다 있는 액션이 정확히 하나일 때만 LLM 없이 선택한다.
+_ACTION_INTENTS = {
+    "NAV_MAIL_COMPOSE": (["메일", "이메일", "mail"], ["작성", "쓰기", "써줘", "쓸래", "보내", "보낼"]),
+    "NAV_MY_RESERVATIONS": (["예약"], ["보여줘", "조회", "확인", "내역", "목록"]),
+    "NAV_TODAY_SCHEDULE": (["일정", "스케줄"], ["보여줘", "조회", "확인", "알려줘", "뭐야", "뭐 있"]),
+    "NAV_APPROVAL_DRAFT": (["결재", "기안", "품의"], ["작성", "쓰기", "써줘", "올리", "올릴", "상신"]),
+}
 
-def _suggest_action(question: str, history: List[ChatHistoryMessage] | None, db_text: str, rag_text: str) -> Optional[dict]:
-    action_list = "\n".join(
-        [f"- {a['id']} (params: {a['requiredParams']})" for a in _ACTIONS]
-    )
-    history_text = _history_to_text(history)
-    user_block = (
-        f"[이전 대화]\n{history_text}\n\n[질문]\n{question}\n\n[DB]\n{db_text}\n\n[RAG]\n{rag_text}"
-        if history_text
-        else f"[질문]\n{question}\n\n[DB]\n{db_text}\n\n[RAG]\n{rag_text}"
-    )
-    system_prompt = (
-        "아래 액션 목록 중 적절한 이동 액션을 하나 선택하고 JSON만 출력하세요. "
-        "이메일 관련 질문이 들어오면 메일 작성 액션을 선택합니다. "
-        "에약 관련 질문이 들어오면 내 예약 조회 액션을 선택합니다 "
-        "일정 관련 질문이 들어오면 오늘 일정 액션을 선택합니다 "
-        "결재 작성 질문이 들어오면 결재 작성을 선택합니다 "
-        "적절한 액션이 없으면 null을 출력합니다. "
-        
-        "형식: {\"actionId\": \"...\", \"params\": {\"key\": \"val\"}} 또는 null. "
-        f"액션 목록:\n{action_list}"
-        "이전 대화는 보조 정보이며, 현재 질문/DB/RAG 근거를 우선하라."
-    )
+# 정보를 묻는 질문(규정, 연락처 등)은 이동 액션이 아닐 가능성이 높으므로 규칙으로 확정하지 않는다
+_INFO_MARKERS = ["규정", "규칙", "정책", "절차", "방법", "기준", "주소", "번호", "연락처"]
+
+
+def _match_action_rule(question: str) -> Optional[dict]:
+    """
+    질문의 의도 구문(키워드 + 행동 동사)으로 액션을 고른다. 확신할 수 없으면 None을 돌려 LLM에 맡긴다.
+    """
+    lowered = question.lower()
+    if any(marker in lowered for marker in _INFO_MARKERS):
+        return None
+    matched = [
+        aid
+        for aid, (keywords, verbs) in _ACTION_INTENTS.items()
+        if any(kw in lowered for kw in keywords) and any(v in lowered for v in verbs)
+    ]
+    if len(matched) != 1:
+        return None
+    return {"actionId": matched[0], "params": {}}
+
+
+_ACTION_SYSTEM_PROMPT = (
+    "아래 액션 목록 중 적절한 이동 액션을 하나 선택하고 JSON만 출력하세요. "
+    "이메일 관련 질문이 들어오면 메일 작성 액션을 선택합니다. "
+    "에약 관련 질문이 들어오면 내 예약 조회 액션을 선택합니다 "
+    "일정 관련 질문이 들어오면 오늘 일정 액션을 선택합니다 "
+    "결재 작성 질문이 들어오면 결재 작성을 선택합니다 "
+    "적절한 액션이 없으면 null을 출력합니다. "
+    "형식: {\"actionId\": \"...\", \"params\": {\"key\": \"val\"}} 또는 null. "
+    "액션 목록:\n"
+    + "\n".join(f"- {a['id']} (params: {a['requiredParams']})" for a in _ACTIONS)
+    + "\n이전 대화는 보조 정보이며, 현재 질문/DB/RAG 근거를 우선하라."
+)
+
+# 답변 단계 고정 지시문. 질문별 내용(history/DB/RAG/질문)은 user 메시지에만 넣어 캐시 앞부분을 유지한다.
+_ANSWER_SYSTEM_PROMPT = (
+    "너는 사내 전자결재/그룹웨어 챗봇이다. DB 결과는 사실, 규정 근거는 정책이다. "
+    "출처가 없는 내용은 추측하지 말고, 필요시 근거/데이터 부족을 명시한다.\n"
+    "사용자 메시지의 DB 결과와 규정 근거를 활용해 한국어로 간결하고 정확하게 답변하세요. "
+    "DB는 사실 데이터, RAG는 규정/정책 근거입니다. 정보가 없으면 모른다고 말하세요. "
+    "이전 대화는 보조 정보이며, 현재 질문/DB/RAG 근거를 우선하라."
+)
+
+
+async def _suggest_action(question: str, history_text: str, db_text: str, rag_text: str) -> Optional[dict]:
+    history_block = f"[이전 대화]\n{history_text}\n\n" if history_text else ""
+    user_block = f"{history_block}[DB]\n{db_text}\n\n[RAG]\n{rag_text}\n\n[질문]\n{question}"
     try:
-        resp = openai_client.chat.completions.create(
-            model=settings.RDB_MODEL,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_block},
-            ],
-            temperature=0,
-        )
+        messages = [
+            {"role": "system", "content": _ACTION_SYSTEM_PROMPT},
+            {"role": "user", "content": user_block},
+        ]
+        with observe_stage("chatbot", "action"):
+            async with allm_slot(settings.RDB_MODEL, estimate_chat_tokens(messages, settings.RDB_MODEL)) as ticket:
+                resp = await async_openai_client.chat.completions.create(
+                    model=settings.RDB_MODEL,
+                    messages=messages,
+                    temperature=0,
+                    prompt_cache_key="chatbot-action",
+                )
+                ticket.settle(resp.usage)
+        record_usage("action", settings.RDB_MODEL, resp.usage)
         raw = resp.choices[0].message.content or "null"
         print(f"[SYNTH] action raw response: {raw!r}")
         raw = clean_json_string(raw)
@@ -61,71 +105,136 @@ def _suggest_action(question: str, history: List[ChatHistoryMessage] | None, db_
     return None
 
 
-def stream_final_answer(
+async def suggest_action(question: str, history_text: str, db_text: str, rag_text: str) -> Optional[dict]:
+    """규칙 매칭이 확실하면 그대로 쓰고, 아니면 LLM에 묻는다."""
+    if settings.CHAT_ACTION_RULES:
+        action = _match_action_rule(question)
+        if action:
+            print(f"[SYNTH] action rule matched: {action['actionId']}")
+            return action
+    return await _suggest_action(question, history_text, db_text, rag_text)
+
+
+async def _join_action(task: "asyncio.Task") -> Optional[dict]:
+    try:
+        return await asyncio.wait_for(task, timeout=settings.CHAT_ACTION_TIMEOUT_S)
+    except Exception as e:
+        print(f"[SYNTH] action join failed: {e}")
+        return None
+
+
+class _AnswerStream:
+    """열린 답변 스트림 1개. stack을 닫으면 HTTP 응답과 호출 한도 슬롯이 정리된다."""
+
+    __slots__ = ("stack", "chunks", "first", "ticket")
+
+    def __init__(self, stack: AsyncExitStack, chunks: AsyncIterator, first: str, ticket: LlmTicket):
+        self.stack = stack
+        self.chunks = chunks
+        self.first = first
+        self.ticket = ticket
+
+
+async def _open_answer_stream(messages: list, estimate: int, admitted: Optional[asyncio.Event] = None) -> _AnswerStream:
+    """
+    답변 스트림을 열고 첫 토큰까지 읽는다.
+    TTFT는 슬롯을 받은 뒤부터 잰다 (rate governor 대기는 모델 지연이 아님).
+    """
+    stack = AsyncExitStack()
+    try:
+        ticket = await stack.enter_async_context(allm_slot(settings.SUM_MODEL, estimate))
+        started = time.monotonic()
+        if admitted is not None:
+            admitted.set()
+        resp = await async_openai_client.chat.completions.create(
+            model=settings.SUM_MODEL,
+            messages=messages,
+            temperature=0,
+            stream=True,
+            stream_options={"include_usage": True},
+            prompt_cache_key="chatbot-answer",
+        )
+        stack.push_async_callback(resp.close)
+        chunks = resp.__aiter__()
+        async for chunk in chunks:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                record_ttft(time.monotonic() - started)
+                return _AnswerStream(stack, chunks, delta, ticket)
+        return _AnswerStream(stack, chunks, "", ticket)
+    except BaseException:
+        await stack.aclose()
+        raise
+
+
+async def _close_answer_stream(attempt: _AnswerStream):
+    await attempt.stack.aclose()
+
+
+async def stream_final_answer(
     question: str,
-    history: List[ChatHistoryMessage] | None,
+    history_text: str,
     db_text: str,
     rag_text: str,
     answer_style: str | None,
     mode: str,
-) -> Iterable[dict]:
+) -> AsyncIterator[dict]:
     """
     DB와 RAG 근거를 모두 사용해 최종 답변을 스트리밍한다.
     반환: {"chunk": str} 또는 마지막에는 {"done": True, "action": {...}} 형태
+    액션 선택은 답변 스트림과 동시에 시작하고 마지막에 합류한다.
     """
-    style_hint = f"답변 스타일: {answer_style}" if answer_style else ""
+    action_task = asyncio.create_task(suggest_action(question, history_text, db_text, rag_text))
+    history_block = f"[이전 대화]\n{history_text}\n\n" if history_text else ""
+    style_hint = f"\n\n[답변 스타일]\n{answer_style}" if answer_style else ""
     user_prompt = (
-        "아래 DB 결과와 규정 근거를 활용해 한국어로 간결하고 정확하게 답변하세요. "
-        "DB는 사실 데이터, RAG는 규정/정책 근거입니다. 정보가 없으면 모른다고 말하세요. "
-        "이전 대화는 보조 정보이며, 현재 질문/DB/RAG 근거를 우선하라."
-        f"{style_hint}\n\n"
-        f"[질문]\n{question}\n\n"
+        f"{history_block}"
         f"[DB 결과]\n{db_text or '(없음)'}\n\n"
-        f"[규정 근거]\n{rag_text or '(없음)'}"
+        f"[규정 근거]\n{rag_text or '(없음)'}\n\n"
+        f"[질문]\n{question}"
+        f"{style_hint}"
     )
-    
-    print("question + db_text + rag_ text "+ question+" "+db_text+ " "+ rag_text)
+
+    messages = [
+        {"role": "system", "content": _ANSWER_SYSTEM_PROMPT},
+        {"role": "user", "content": user_prompt},
+    ]
+    estimate = estimate_chat_tokens(messages, settings.SUM_MODEL)
     try:
-        resp = openai_client.chat.completions.create(
-            model=settings.SUM_MODEL,
-            messages=[
-                {
-                    "role": "system",
-                    "content": (
-                        "너는 사내 전자결재/그룹웨어 챗봇이다. DB 결과는 사실, 규정 근거는 정책이다. "
-                        "출처가 없는 내용은 추측하지 말고, 필요시 근거/데이터 부족을 명시한다."
-                    ),
-                },
-                {"role": "user", "content": user_prompt},
-            ],
-            temperature=0,
-            stream=True,
-        )
-        for chunk in resp:
-            delta = chunk.choices[0].delta.content
-            if delta:
-                yield {"chunk": delta}
-        action = _suggest_action(question, history, db_text, rag_text)
-        yield {"done": True, "action": action}
+        if settings.CHAT_HEDGE_ENABLED:
+            attempt = await race_first_token(
+                lambda admitted: _open_answer_stream(messages, estimate, admitted), _close_answer_stream
+            )
+        else:
+            attempt = await _open_answer_stream(messages, estimate)
+        async with attempt.stack:
+            if attempt.first:
+                yield {"chunk": attempt.first}
+            async for chunk in attempt.chunks:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    yield {"chunk": delta}
+                if chunk.usage:
+                    # include_usage: 마지막 청크에만 usage가 실린다
+                    attempt.ticket.settle(chunk.usage)
+                    record_usage("answer", settings.SUM_MODEL, chunk.usage)
+        yield {"done": True, "action": await _join_action(action_task)}
     except Exception:
-        resp = openai_client.chat.completions.create(
-            model=settings.SUM_MODEL,
-            messages=[
-                {
-                    "role": "system",
-                    "content": (
-                        "너는 사내 전자결재/그룹웨어 챗봇이다. DB 결과는 사실, 규정 근거는 정책이다. "
-                        "출처가 없는 내용은 추측하지 말고, 필요시 근거/데이터 부족을 명시한다."
-                    ),
-                },
-                {"role": "user", "content": user_prompt},
-            ],
-            temperature=0,
-        )
+        async with allm_slot(settings.SUM_MODEL, estimate) as ticket:
+            resp = await async_openai_client.chat.completions.create(
+                model=settings.SUM_MODEL,
+                messages=messages,
+                temperature=0,
+                prompt_cache_key="chatbot-answer",
+            )
+            ticket.settle(resp.usage)
+        record_usage("answer", settings.SUM_MODEL, resp.usage)
         full = resp.choices[0].message.content or ""
         for para in full.split("\n\n"):
             part = para.strip()
             if part:
                 yield {"chunk": part + "\n"}
-        action = _suggest_action(question, history, db_text, rag_text)
-        yield {"done": True, "action": action}
+        yield {"done": True, "action": await _join_action(action_task)}
+    finally:
+        if not action_task.done():
+            action_task.cancel()
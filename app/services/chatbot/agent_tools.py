@@ -1,20 +1,259 @@
-from datetime import datetime
-from typing import Any, Dict, List, Tuple
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
 
-from sqlalchemy import text
+from pydantic import BaseModel
 
 from app.services.chatbot.rdb_service import (
-    get_engine,
-    query_db_with_llm
+    _ensure_allowed_tables,
+    _ensure_employee_columns,
+    _is_safe_select,
+    _table_columns,
+    execute_select,
 )
+from app.services.chatbot.schema_catalog import catalog_version, ensure_schema_catalog
 from app.services.chatbot.utils import ALLOWED_TABLES, PERSONAL_TABLES
 
+try:
+    from zoneinfo import ZoneInfo
+
+    _KST = ZoneInfo("Asia/Seoul")
+except Exception:  # tzdata가 없는 슬림 이미지 대비
+    _KST = timezone(timedelta(hours=9))
+
+
+class RdbQuery(BaseModel):
+    """
+    플래너가 이름으로 고르는 사전 정의 SELECT.
+    com_id/emp_id는 요청 정보로만 바인딩하고, 플래너 args로는 date/keyword/limit만 받는다.
+    """
+    name: str
+    description: str
+    sql: str
+    columns: Dict[str, List[str]]  # 사전 검증용: 테이블 -> 필요한 컬럼
+    args: List[str] = []
+    required_args: List[str] = []
+
+
+RDB_QUERIES: Dict[str, RdbQuery] = {
+    q.name: q
+    for q in [
+        RdbQuery(
+            name="my_meeting_room_reservations",
+            description="내 회의실 예약 목록 (date 이후)",
+            sql=(
+                "SELECT * FROM meeting_room_reservation "
+                "WHERE com_id = :com_id AND emp_id = :emp_id AND start_time >= :day_start "
+                "ORDER BY start_time"
+            ),
+            columns={"meeting_room_reservation": ["com_id", "emp_id", "start_time"]},
+            args=["date", "limit"],
+        ),
+        RdbQuery(
+            name="my_car_reservations",
+            description="내 법인차량 예약 목록 (date 이후)",
+            sql=(
+                "SELECT * FROM corporate_car_reservation "
+                "WHERE com_id = :com_id AND emp_id = :emp_id AND start_time >= :day_start "
+                "ORDER BY start_time"
+            ),
+            columns={"corporate_car_reservation": ["com_id", "emp_id", "start_time"]},
+            args=["date", "limit"],
+        ),
+        RdbQuery(
+            name="my_equipment_reservations",
+            description="내 공용비품 예약 목록 (date 이후)",
+            sql=(
+                "SELECT * FROM shared_equipment_reservation "
+                "WHERE com_id = :com_id AND emp_id = :emp_id AND start_time >= :day_start "
+                "ORDER BY start_time"
+            ),
+            columns={"shared_equipment_reservation": ["com_id", "emp_id", "start_time"]},
+            args=["date", "limit"],
+        ),
+        RdbQuery(
+            name="meeting_room_reservations_on_date",
+            description="회사 전체 회의실 예약 현황 (date 하루, 기본 오늘)",
+            sql=(
+                "SELECT * FROM meeting_room_reservation "
+                "WHERE com_id = :com_id AND start_time >= :day_start AND start_time < :day_end "
+                "ORDER BY start_time"
+            ),
+            columns={"meeting_room_reservation": ["com_id", "start_time"]},
+            args=["date", "limit"],
+        ),
+        RdbQuery(
+            name="my_schedule_on_date",
+            description="내 일정 (date 하루, 기본 오늘)",
+            sql=(
+                "SELECT title, content, start_time, end_time FROM emp_schedule "
+                "WHERE com_id = :com_id AND emp_id = :emp_id AND start_time < :day_end AND end_time >= :day_start "
+                "ORDER BY start_time"
+            ),
+            columns={"emp_schedule": ["com_id", "emp_id", "title", "content", "start_time", "end_time"]},
+            args=["date", "limit"],
+        ),
+        RdbQuery(
+            name="my_unread_mail",
+            description="내 안 읽은 메일 목록",
+            sql=(
+                "SELECT title, sender_id, sent_at FROM mail "
+                "WHERE com_id = :com_id AND emp_id = :emp_id AND is_read = 0 "
+                "ORDER BY sent_at DESC"
+            ),
+            columns={"mail": ["com_id", "emp_id", "title", "sender_id", "sent_at", "is_read"]},
+            args=["limit"],
+        ),
+        RdbQuery(
+            name="my_todo_list",
+            description="내 할 일 목록",
+            sql="SELECT content, is_done, due_date FROM todo_list WHERE com_id = :com_id AND emp_id = :emp_id",
+            columns={"todo_list": ["com_id", "emp_id", "content", "is_done", "due_date"]},
+            args=["limit"],
+        ),
+        RdbQuery(
+            name="employee_contact",
+            description="직원 연락처 검색 (keyword: 이름 일부)",
+            sql=(
+                "SELECT emp_id, emp_name, email, work_phone, msg_stat FROM employee "
+                "WHERE com_id = :com_id AND emp_name LIKE :keyword "
+                "ORDER BY emp_name"
+            ),
+            columns={"employee": ["com_id", "emp_name", "email", "work_phone", "msg_stat"]},
+            args=["keyword", "limit"],
+            required_args=["keyword"],
+        ),
+    ]
+}
+
+_validated: Tuple[float, Dict[str, RdbQuery]] | None = None
+
 
 def _limit_clause(limit: int | None, default: int = 50) -> str:
     lim = limit or default
     return f" LIMIT {min(lim, default)}"
 
 
+def _check_static(q: RdbQuery):
+    if not _is_safe_select(q.sql):
+        raise RuntimeError("SELECT가 아닙니다.")
+    _ensure_allowed_tables(q.sql)
+    _ensure_employee_columns(q.sql)
+    if any(t not in ALLOWED_TABLES for t in q.columns):
+        raise RuntimeError("허용되지 않은 테이블입니다.")
+    # Text-to-SQL 경로의 _ensure_com_filter와 같은 보장: 카탈로그 쿼리는 모든 테이블을 회사로 한정한다
+    if "com_id = :com_id" not in q.sql or any("com_id" not in cols for cols in q.columns.values()):
+        raise RuntimeError("카탈로그 쿼리는 com_id 조건이 필요합니다.")
+    if any(t in PERSONAL_TABLES for t in q.columns):
+        if ":emp_id" not in q.sql:
+            raise RuntimeError("개인 테이블은 emp_id 조건이 필요합니다.")
+        if re.search(r"select\s+\*", q.sql, re.IGNORECASE):
+            raise RuntimeError("개인 테이블은 조회 컬럼을 명시해야 합니다.")
+
+
+def available_rdb_queries() -> Dict[str, RdbQuery]:
+    """
+    스키마 카탈로그와 대조해 사용 가능한 카탈로그 쿼리만 반환한다. 카탈로그가 갱신되면 다시 검증한다.
+    DB 연결 실패 시에는 캐시하지 않고 빈 dict를 반환해 Text-to-SQL로 폴백한다.
+    """
+    global _validated
+    try:
+        cols_by_table = _table_columns()
+    except Exception as e:
+        print(f"[RDB CATALOG] schema load failed: {e}")
+        return {}
+    version = catalog_version()
+    if _validated is not None and _validated[0] == version:
+        return _validated[1]
+
+    valid: Dict[str, RdbQuery] = {}
+    for name, q in RDB_QUERIES.items():
+        try:
+            _check_static(q)
+            for table, cols in q.columns.items():
+                existing = cols_by_table.get(table)
+                if existing is None:
+                    raise RuntimeError(f"테이블 없음: {table}")
+                missing = [c for c in cols if c.lower() not in existing]
+                if missing:
+                    raise RuntimeError(f"{table} 컬럼 없음: {missing}")
+            valid[name] = q
+        except Exception as e:
+            print(f"[RDB CATALOG] disabled {name}: {e}")
+    print(f"[RDB CATALOG] enabled={sorted(valid)}")
+    _validated = (version, valid)
+    return valid
+
+
+def describe_rdb_queries() -> str:
+    """플래너 프롬프트용 카탈로그 설명."""
+    lines = []
+    for q in available_rdb_queries().values():
+        args = f" args: {q.args}" if q.args else ""
+        lines.append(f"- {q.name}: {q.description}{args}")
+    return "\n".join(lines)
+
+
+def today_str() -> str:
+    return datetime.now(_KST).strftime("%Y-%m-%d")
+
+
+def _day_range(raw_date: Any) -> Tuple[datetime, datetime]:
+    if raw_date:
+        try:
+            day = datetime.strptime(str(raw_date)[:10], "%Y-%m-%d")
+        except ValueError:
+            raise RuntimeError(f"date 형식 오류(YYYY-MM-DD): {raw_date}")
+    else:
+        day = datetime.now(_KST).replace(tzinfo=None)
+    start = day.replace(hour=0, minute=0, second=0, microsecond=0)
+    return start, start + timedelta(days=1)
+
+
+def _bind_params(q: RdbQuery, args: Dict[str, Any], com_id: Optional[str], emp_id: Optional[str]) -> Dict[str, Any]:
+    params: Dict[str, Any] = {}
+    if ":com_id" in q.sql:
+        if not com_id:
+            raise RuntimeError(f"{q.name}: com_id가 필요합니다.")
+        params["com_id"] = com_id
+    if ":emp_id" in q.sql:
+        if not emp_id:
+            raise RuntimeError(f"{q.name}: emp_id가 필요합니다.")
+        params["emp_id"] = emp_id
+    for arg in q.required_args:
+        if not args.get(arg):
+            raise RuntimeError(f"{q.name}: {arg} 인자가 필요합니다.")
+    if ":day_start" in q.sql or ":day_end" in q.sql:
+        day_start, day_end = _day_range(args.get("date"))
+        params["day_start"] = day_start
+        if ":day_end" in q.sql:
+            params["day_end"] = day_end
+    if ":keyword" in q.sql:
+        params["keyword"] = f"%{str(args['keyword']).strip()}%"
+    return params
+
+
+async def run_rdb_query(name: str, args: Optional[Dict[str, Any]], com_id: Optional[str], emp_id: Optional[str]) -> List[Dict[str, Any]]:
+    """
+    카탈로그 쿼리를 LLM SQL 생성 없이 바인딩 파라미터로 바로 실행한다.
+    """
+    if not await ensure_schema_catalog():
+        raise RuntimeError("스키마 카탈로그를 불러오지 못했습니다.")
+    q = available_rdb_queries().get(name)
+    if q is None:
+        raise RuntimeError(f"알 수 없는 RDB 태스크: {name}")
+    args = {k: v for k, v in (args or {}).items() if k in q.args}
+    params = _bind_params(q, args, com_id, emp_id)
+    try:
+        limit = int(args["limit"]) if args.get("limit") else None
+    except (TypeError, ValueError):
+        limit = None
+    if limit is not None and limit < 1:
+        limit = None
+    sql = q.sql + _limit_clause(limit)
+    print(f"[RDB CATALOG] run {name} args={args}")
+    return await execute_select(sql, params, guard=False)
+
 
 def format_rows(rows: List[Dict[str, Any]], max_rows: int = 10) -> str:
     if not rows:
@@ -27,4 +266,6 @@ def format_rows(rows: List[Dict[str, Any]], max_rows: int = 10) -> str:
         lines.append(line)
     if len(rows) > max_rows:
         lines.append(f"...({len(rows) - max_rows} more)")
+    if getattr(rows, "narrowed", False):
+        lines.insert(0, "(주의: 조회 범위가 너무 커서 키워드로 '시작하는' 항목만 찾았습니다. 중간에 키워드가 들어간 항목은 빠졌을 수 있습니다.)")
     return "\n".join(lines)
@@ -1,9 +1,13 @@
-import time
-from typing import Any
+import asyncio
+from typing import Any, Optional
 from urllib.parse import urlparse
 
 import httpx
 
+from app.services.metrics import observe_stage
+
+_http: Optional[httpx.AsyncClient] = None
+
 
 def validate_callback_url(url: str) -> str:
     parsed = urlparse(url)
@@ -13,7 +17,22 @@ def validate_callback_url(url: str) -> str:
     return url
 
 
-def post_with_retry(callback_url: str, callback_key: str, payload: dict[str, Any], timeout: float = 10.0):
+def _get_http() -> httpx.AsyncClient:
+    # 콜백마다 새 연결을 맺지 않도록 커넥션 풀을 공유한다
+    global _http
+    if _http is None or _http.is_closed:
+        _http = httpx.AsyncClient()
+    return _http
+
+
+async def close_http():
+    global _http
+    if _http is not None:
+        await _http.aclose()
+        _http = None
+
+
+async def post_with_retry(callback_url: str, callback_key: str, payload: dict[str, Any], timeout: float = 10.0):
     """
     POST callback with retries. Raises the last error if all attempts fail.
     """
@@ -26,12 +45,11 @@ def post_with_retry(callback_url: str, callback_key: str, payload: dict[str, Any
 
     for attempt, delay in enumerate(delays, start=1):
         if delay:
-            time.sleep(delay)
+            await asyncio.sleep(delay)
         try:
-            with httpx.Client(timeout=timeout) as http:
-                res = http.post(callback_url, headers=headers, json=payload)
-
-            res.raise_for_status()
+            with observe_stage("chatbot", "callback"):
+                res = await _get_http().post(callback_url, headers=headers, json=payload, timeout=timeout)
+                res.raise_for_status()
             return
         except Exception as e:
             last_error = e
@@ -1,85 +1,166 @@
-from typing import Iterable, List
+import asyncio
+import time
+from typing import AsyncIterator, Dict, List, Tuple
 
+from app.core.config import settings
 from app.schemas import ChatbotRunRequest
-from app.services.chatbot.agent_planner import plan_query
+from app.services.chatbot.agent_planner import QueryPlan, plan_query
 from app.services.chatbot.agent_synthesizer import stream_final_answer
 from app.services.chatbot.callback_client import post_with_retry, validate_callback_url
-from app.services.provdocuments.weaviate_store import search_prov_chunks
-from app.services.chatbot.rdb_service import query_db_with_llm
-from app.services.chatbot.agent_tools import format_rows
-from app.services.chatbot.utils import _history_to_text
+from app.services.provdocuments.weaviate_store import asearch_prov_chunk_hits
+from app.services.chatbot.rdb_service import query_db_with_llm, query_db_with_sql
+from app.services.chatbot.agent_tools import format_rows, run_rdb_query
+from app.services.chatbot.context_packer import pack_context
+from app.services.chatbot.history_store import build_history_block
+from app.services.metrics import observe_seconds, observe_stage
+from app.services.rate_governor import set_tenant
+from app.services.tracing import span, start_trace
 
+# 진행 중인 챗봇 요청. 취소 API와 같은 세션 재질문 시 이전 요청 중단에 사용한다.
+_running: Dict[str, "asyncio.Task"] = {}
+_session_latest: Dict[str, str] = {}
 
-def _run_rag_tasks(rag_tasks, question: str) -> List[str]:
-    contexts: List[str] = []
+
+async def _search_one(q: str, top_k: int, com_id) -> List[dict]:
+    try:
+        with span("rag_task", query=q, top_k=top_k):
+            return await asearch_prov_chunk_hits(q, top_k=top_k, com_id=com_id)
+    except Exception as e:
+        print(f"[RAG] search failed for {q}: {e}")
+        return []
+
+
+async def _run_rag_tasks(rag_tasks, question: str, com_id) -> List[dict]:
     tasks = rag_tasks or []
     if not tasks:
         tasks = [{"query": question, "top_k": 5}]
+    searches = []
     for t in tasks:
         q = t.get("query") if isinstance(t, dict) else getattr(t, "query", question)
         top_k = t.get("top_k") if isinstance(t, dict) else getattr(t, "top_k", 5)
+        searches.append(_search_one(q, top_k, com_id))
+    hits: List[dict] = []
+    for res in await asyncio.gather(*searches):
+        hits.extend(res)
+    return hits
+
+
+async def _run_rdb_task(task, com_id, emp_id) -> List[dict]:
+    with span("rdb_task", name=task.name):
+        return await run_rdb_query(task.name, task.args, com_id, emp_id)
+
+
+async def _run_rdb_tasks(rdb_tasks, com_id, emp_id) -> List[Tuple[str, List[dict]]] | None:
+    """
+    카탈로그 쿼리를 동시에 실행한다. 하나라도 실패하면 None을 반환해 Text-to-SQL로 폴백한다.
+    """
+    if not rdb_tasks:
+        return None
+    outcomes = await asyncio.gather(
+        *(_run_rdb_task(t, com_id, emp_id) for t in rdb_tasks),
+        return_exceptions=True,
+    )
+    results: List[Tuple[str, List[dict]]] = []
+    for t, rows in zip(rdb_tasks, outcomes):
+        if isinstance(rows, BaseException):
+            print(f"[CHATBOT] rdb task {t.name} failed, fallback to LLM SQL: {rows}")
+            return None
+        results.append((t.name, rows))
+    return results
+
+
+def _format_task_rows(results: List[Tuple[str, List[dict]]]) -> str:
+    if len(results) == 1:
+        return format_rows(results[0][1])
+    sections = [f"[{name}]\n{format_rows(rows)}" for name, rows in results if rows]
+    return "\n\n".join(sections)
+
+
+async def _collect_db_text(plan: QueryPlan, req: ChatbotRunRequest) -> str:
+    # 사전 정의 쿼리 우선, 없거나 실패하면 Text-to-SQL로 폴백
+    task_results = await _run_rdb_tasks(plan.rdb_tasks, req.comId, req.empId)
+    if task_results is None and plan.sql:
+        # 통합 플래너가 만든 SELECT도 동일한 안전 검사/필터를 거친다
         try:
-            res = search_prov_chunks(q, top_k=top_k)
-            contexts.extend(res)
+            with span("planner_sql"):
+                task_results = [("planner_sql", await query_db_with_sql(plan.sql, req.comId, req.empId))]
         except Exception as e:
-            print(f"[RAG] search failed for {q}: {e}")
-    return contexts
+            print(f"[CHATBOT] planner SQL failed, fallback to LLM SQL: {e}")
+    if task_results is not None:
+        return _format_task_rows(task_results)
+    try:
+        with span("llm_sql"):
+            db_rows = await query_db_with_llm(req.question, req.comId, req.empId)
+        print(f"[CHATBOT] db_rows count={len(db_rows)}")
+        return format_rows(db_rows)
+    except Exception as e:
+        import traceback
+        print(f"[CHATBOT] LLM SQL failed: {e}\n{traceback.format_exc()}")
+        return ""
+
+
+async def _empty() -> List[dict]:
+    return []
 
 
-def run_chatbot(req: ChatbotRunRequest):
+async def _blank() -> str:
+    return ""
+
+
+async def run_chatbot(req: ChatbotRunRequest):
+    with start_trace("chatbot", req.messageId, sessionId=req.sessionId, comId=req.comId):
+        with observe_stage("chatbot", "total"):
+            await _run_chatbot(req)
+
+
+async def _run_chatbot(req: ChatbotRunRequest):
     callback_url = validate_callback_url(req.callbackUrl)
+    set_tenant(req.comId)
     try:
-        hist_preview = _history_to_text(req.history)
-        print(f"[CHATBOT] history preview:\n{hist_preview}" if hist_preview else "[CHATBOT] no history provided")
+        with span("history"):
+            history_text = build_history_block(req.sessionId, req.history)
+        print(f"[CHATBOT] history block chars={len(history_text)}" if history_text else "[CHATBOT] no history provided")
 
-        plan = plan_query(req.question, req.history, req.empId, req.comId)
+        with observe_stage("chatbot", "planner"):
+            plan = await plan_query(req.question, history_text, req.empId, req.comId)
         print(f"[CHATBOT] plan mode={plan.mode} rag_tasks={len(plan.rag_tasks)} rdb_tasks={len(plan.rdb_tasks)}")
 
-        db_rows: List[dict] = []
-        rag_contexts: List[str] = []
-
-        if plan.mode in {"rdb", "hybrid"}:
-            # 자동 Text-to-SQL만 사용 (사전 정의 태스크 미사용)
-            try:
-                db_rows = query_db_with_llm(req.question, req.comId, req.empId)
-                print(f"[CHATBOT] db_rows: {db_rows}")
-            except Exception as e:
-                import traceback
-                print(f"[CHATBOT] LLM SQL failed: {e}\n{traceback.format_exc()}")
-
-        if plan.mode in {"rag", "hybrid"}:
-            rag_contexts.extend(_run_rag_tasks([t.model_dump() for t in plan.rag_tasks], req.question))
+        # hybrid면 DB 조회와 규정 검색을 동시에 진행
+        db_text, rag_hits = await asyncio.gather(
+            _collect_db_text(plan, req) if plan.mode in {"rdb", "hybrid"} else _blank(),
+            _run_rag_tasks([t.model_dump() for t in plan.rag_tasks], req.question, req.comId)
+            if plan.mode in {"rag", "hybrid"}
+            else _empty(),
+        )
 
-        db_text = format_rows(db_rows)
-        print("[CHATBOT] db_text: "+db_text)
-        rag_text = "\n".join(rag_contexts)
-        print("[CHATBOT] rag_text: "+rag_text)
+        with span("pack_context"):
+            db_text, rag_text = pack_context(rag_hits, db_text, history_text)
+        print(f"[CHATBOT] context db_chars={len(db_text)} rag_hits={len(rag_hits)} rag_chars={len(rag_text)}")
 
         if not db_text and not rag_text:
             msg = "근거와 데이터가 부족해 답변할 수 없습니다.\n"
-            post_with_retry(callback_url, req.callbackKey, {"messageId": req.messageId, "chunk": msg, "done": False, "success": True})
-            post_with_retry(callback_url, req.callbackKey, {"messageId": req.messageId, "done": True, "success": True})
+            await post_with_retry(callback_url, req.callbackKey, {"messageId": req.messageId, "chunk": msg, "done": False, "success": True})
+            await post_with_retry(callback_url, req.callbackKey, {"messageId": req.messageId, "done": True, "success": True})
             return
 
-        stream: Iterable[dict] = stream_final_answer(
+        stream: AsyncIterator[dict] = stream_final_answer(
             question=req.question,
-            history=req.history,
+            history_text=history_text,
             db_text=db_text,
             rag_text=rag_text,
             answer_style=plan.answer_style,
             mode=plan.mode,
         )
 
+        stream_started = time.perf_counter()
         try:
-            import time
-
             flush_interval_s = 0.1
             seq = 0
             full_answer_parts: List[str] = []
             buffer_text = ""
             last_flush = time.monotonic()
 
-            def _flush_buffer():
+            async def _flush_buffer():
                 nonlocal buffer_text, seq, last_flush
                 if not buffer_text:
                     return
@@ -92,19 +173,19 @@ def run_chatbot(req: ChatbotRunRequest):
                 }
                 print(f"[CHATBOT] stream chunk seq={seq} messageId={req.messageId} size={len(buffer_text)}")
                 seq += 1
-                post_with_retry(callback_url, req.callbackKey, payload)
                 buffer_text = ""
                 last_flush = time.monotonic()
+                await post_with_retry(callback_url, req.callbackKey, payload)
 
-            for delta in stream:
+            async for delta in stream:
                 if delta.get("chunk"):
                     chunk = delta["chunk"]
                     full_answer_parts.append(chunk)
                     buffer_text += chunk
                     if time.monotonic() - last_flush >= flush_interval_s:
-                        _flush_buffer()
+                        await _flush_buffer()
                 if delta.get("done"):
-                    _flush_buffer()
+                    await _flush_buffer()
                     action = delta.get("action")
                     done_payload = {
                         "messageId": req.messageId,
@@ -115,14 +196,21 @@ def run_chatbot(req: ChatbotRunRequest):
                     if action:
                         done_payload["actionId"] = action.get("actionId")
                         done_payload["params"] = action.get("params")
-                    print(f"[CHATBOT] done payload -> {done_payload}")
-                    post_with_retry(callback_url, req.callbackKey, done_payload)
+                    print(f"[CHATBOT] done messageId={req.messageId} chars={len(done_payload['fullText'])} action={action}")
+                    await post_with_retry(callback_url, req.callbackKey, done_payload)
+                    observe_seconds("chatbot", "stream_total", time.perf_counter() - stream_started)
         except Exception as e:
             print(f"[CHATBOT] stream failed: {e}")
             msg = "근거와 데이터가 부족해 답변할 수 없습니다.\n"
-            post_with_retry(callback_url, req.callbackKey, {"messageId": req.messageId, "chunk": msg, "done": False, "success": True})
-            post_with_retry(callback_url, req.callbackKey, {"messageId": req.messageId, "done": True, "success": True})
+            await post_with_retry(callback_url, req.callbackKey, {"messageId": req.messageId, "chunk": msg, "done": False, "success": True})
+            await post_with_retry(callback_url, req.callbackKey, {"messageId": req.messageId, "done": True, "success": True})
             return
+        finally:
+            await stream.aclose()
+    except asyncio.CancelledError:
+        # 취소는 Spring이 요청한 것이므로 남은 콜백은 보내지 않는다
+        print(f"[CHATBOT] cancelled messageId={req.messageId}")
+        raise
     except Exception as e:
         err_msg = str(e)
         print(f"[CHATBOT] error: {err_msg}")
@@ -133,6 +221,52 @@ def run_chatbot(req: ChatbotRunRequest):
                 "errorMessage": err_msg,
                 "done": True,
             }
-            post_with_retry(callback_url, req.callbackKey, error_payload)
+            await post_with_retry(callback_url, req.callbackKey, error_payload)
         except Exception as cb_err:
             print(f"[CHATBOT] callback failed after error: {cb_err}")
+
+
+def _forget(req: ChatbotRunRequest, task: "asyncio.Task"):
+    if _running.get(req.messageId) is task:
+        del _running[req.messageId]
+    if req.sessionId and _session_latest.get(req.sessionId) == req.messageId:
+        del _session_latest[req.sessionId]
+
+
+def start_chatbot(req: ChatbotRunRequest) -> "asyncio.Task":
+    """
+    run_chatbot을 이벤트 루프 태스크로 띄우고 messageId로 등록한다.
+    같은 sessionId에서 새 질문이 오면 이전 답변 생성을 중단한다(CHAT_CANCEL_ON_REASK).
+    """
+    if settings.CHAT_CANCEL_ON_REASK and req.sessionId:
+        previous = _session_latest.get(req.sessionId)
+        if previous and previous != req.messageId and cancel_chatbot(previous):
+            print(f"[CHATBOT] re-ask in session={req.sessionId}, cancelled messageId={previous}")
+    task = asyncio.get_running_loop().create_task(run_chatbot(req))
+    _running[req.messageId] = task
+    if req.sessionId:
+        _session_latest[req.sessionId] = req.messageId
+    task.add_done_callback(lambda t: _forget(req, t))
+    return task
+
+
+def cancel_chatbot(message_id: str) -> bool:
+    """
+    진행 중인 요청을 취소한다. 이미 끝났거나 없는 messageId면 False.
+    Task.cancel은 스레드 안전하지 않으므로 이벤트 루프 스레드(async 엔드포인트)에서만 호출한다.
+    """
+    task = _running.get(message_id)
+    if task is None or task.done():
+        return False
+    task.cancel()
+    return True
+
+
+async def cancel_all_chatbots():
+    """종료 시 진행 중인 요청을 모두 취소하고, 공유 커넥션을 닫기 전에 끝날 때까지 기다린다."""
+    tasks = [t for t in _running.values() if not t.done()]
+    for task in tasks:
+        task.cancel()
+    if tasks:
+        await asyncio.gather(*tasks, return_exceptions=True)
+        print(f"[CHATBOT] cancelled {len(tasks)} running request(s) on shutdown")
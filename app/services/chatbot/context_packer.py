@@ -0,0 +1,78 @@
+from typing import Any, Dict, List, Set, Tuple
+
+from app.core.config import settings
+from app.services.tokens import count_tokens, truncate_to_tokens
+
+_SHINGLE = 3
+
+
+def _shingles(text: str) -> Set[Tuple[str, ...]]:
+    words = text.split()
+    if len(words) < _SHINGLE:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i : i + _SHINGLE]) for i in range(len(words) - _SHINGLE + 1)}
+
+
+def _jaccard(a: Set, b: Set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def dedupe_hits(hits: List[Dict[str, Any]], threshold: float | None = None) -> List[Dict[str, Any]]:
+    """
+    (provNo, chunkIndex) 중복과 내용이 거의 같은 청크(word 3-gram Jaccard)를 제거하고 점수순으로 정렬한다.
+    """
+    threshold = settings.CHAT_RAG_DEDUP_JACCARD if threshold is None else threshold
+    best: Dict[Tuple[Any, Any], Dict[str, Any]] = {}
+    for h in hits:
+        key = (h.get("provNo"), h.get("chunkIndex"))
+        if key == (None, None):
+            key = ("content", h.get("content"))
+        prev = best.get(key)
+        if prev is None or (h.get("score") or 0.0) > (prev.get("score") or 0.0):
+            best[key] = h
+
+    ordered = sorted(best.values(), key=lambda h: h.get("score") or 0.0, reverse=True)
+    kept: List[Dict[str, Any]] = []
+    kept_shingles: List[Set] = []
+    for h in ordered:
+        sh = _shingles(h.get("content") or "")
+        if any(_jaccard(sh, other) >= threshold for other in kept_shingles):
+            continue
+        kept.append(h)
+        kept_shingles.append(sh)
+    return kept
+
+
+def pack_context(
+    hits: List[Dict[str, Any]],
+    db_text: str,
+    history_text: str,
+    budget_tokens: int | None = None,
+    model: str | None = None,
+) -> Tuple[str, str]:
+    """
+    history/DB/RAG를 합쳐 토큰 예산 안에 맞춘다. 반환: (db_text, rag_text)
+    history_text는 프롬프트에 실제로 들어가는 이전 대화 블록으로, 예산에서 먼저 뺀다(없으면 "").
+    DB 결과는 예산의 절반까지만 쓰고, 나머지를 점수가 높은 스니펫부터 채운다.
+    """
+    budget = budget_tokens or settings.CHAT_CONTEXT_TOKEN_BUDGET
+    model = model or settings.SUM_MODEL
+
+    remaining = budget - count_tokens(history_text, model)
+    db_limit = max(remaining // 2, 0)
+    if count_tokens(db_text, model) > db_limit:
+        db_text = truncate_to_tokens(db_text, db_limit, model)
+    remaining -= count_tokens(db_text, model)
+
+    parts: List[str] = []
+    for h in dedupe_hits(hits):
+        snippet = h.get("snippet") or h.get("content") or ""
+        cost = count_tokens(snippet, model) + 1  # 구분 개행
+        if cost > remaining:
+            continue
+        parts.append(snippet)
+        remaining -= cost
+    print(f"[CONTEXT] hits={len(hits)} packed={len(parts)} remaining_tokens={remaining}")
+    return db_text, "\n".join(parts)
@@ -0,0 +1,130 @@
+import asyncio
+import math
+import threading
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, TypeVar
+
+from app.core.config import settings
+from app.services.metrics import observe_seconds
+
+_MAX_SAMPLES = 500
+
+T = TypeVar("T")
+
+_lock = threading.Lock()
+_ttft: Deque[float] = deque(maxlen=_MAX_SAMPLES)  # 최근 답변 스트림의 첫 토큰 지연(초)
+_stats = {"streams": 0, "hedgesFired": 0, "hedgesWon": 0, "primaryWon": 0}
+
+
+def record_ttft(seconds: float):
+    observe_seconds("chatbot", "ttft", seconds)
+    with _lock:
+        _ttft.append(seconds)
+
+
+def _percentile(samples, pct: float) -> float:
+    ordered = sorted(samples)
+    idx = min(max(math.ceil(pct * len(ordered)) - 1, 0), len(ordered) - 1)
+    return ordered[idx]
+
+
+def hedge_delay() -> float:
+    """
+    관측된 TTFT의 CHAT_HEDGE_PERCENTILE 값을 헤지 마감으로 쓴다.
+    표본이 적으면 기본값을 쓰고, 결과는 [MIN, MAX] 범위로 자른다.
+    """
+    with _lock:
+        samples = list(_ttft)
+    if len(samples) < settings.CHAT_HEDGE_MIN_SAMPLES:
+        delay = settings.CHAT_HEDGE_DEFAULT_DELAY_S
+    else:
+        delay = _percentile(samples, settings.CHAT_HEDGE_PERCENTILE)
+    return min(max(delay, settings.CHAT_HEDGE_MIN_DELAY_S), settings.CHAT_HEDGE_MAX_DELAY_S)
+
+
+async def _discard(task: "asyncio.Task", close: Callable[[Any], Awaitable[None]]):
+    """진 쪽 요청을 취소하고, 이미 열린 스트림이면 닫는다."""
+    if not task.done():
+        task.cancel()
+    try:
+        result = await task
+    except BaseException:
+        return
+    try:
+        await close(result)
+    except Exception as e:
+        print(f"[HEDGE] close loser failed: {e}")
+
+
+async def _admitted_or_done(task: "asyncio.Task", admitted: asyncio.Event):
+    """rate governor 대기는 모델 지연이 아니므로, 슬롯을 받거나 끝날 때까지는 헤지 마감을 세지 않는다."""
+    waiter = asyncio.create_task(admitted.wait())
+    try:
+        await asyncio.wait({task, waiter}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        waiter.cancel()
+
+
+async def race_first_token(
+    start: Callable[[asyncio.Event], Awaitable[T]],
+    close: Callable[[T], Awaitable[None]],
+) -> T:
+    """
+    start(admitted)는 첫 토큰을 받은 시점에 끝나는 코루틴이고, LLM 슬롯을 받으면 admitted를 set한다.
+    슬롯을 받은 뒤 마감 안에 끝나지 않으면 같은 요청을 하나 더 보내고, 먼저 첫 토큰을 받은 쪽을 반환한다.
+    """
+    with _lock:
+        _stats["streams"] += 1
+    admitted = asyncio.Event()
+    primary = asyncio.create_task(start(admitted))
+    try:
+        await _admitted_or_done(primary, admitted)
+        done, _ = await asyncio.wait({primary}, timeout=hedge_delay())
+    except BaseException:
+        await _discard(primary, close)
+        raise
+    if done:
+        return primary.result()
+
+    with _lock:
+        _stats["hedgesFired"] += 1
+    print("[HEDGE] first token late, firing hedge request")
+    hedge = asyncio.create_task(start(asyncio.Event()))
+    pending = {primary, hedge}
+    error: BaseException | None = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is not None:
+                    error = task.exception()
+                    continue
+                with _lock:
+                    _stats["hedgesWon" if task is hedge else "primaryWon"] += 1
+                for other in (primary, hedge):
+                    if other is not task:
+                        await _discard(other, close)
+                return task.result()
+    finally:
+        # 바깥에서 취소된 경우에도 두 요청을 모두 정리한다
+        for task in pending:
+            await _discard(task, close)
+    raise error  # 두 요청 모두 실패
+
+
+def hedge_stats() -> Dict[str, Any]:
+    with _lock:
+        samples = list(_ttft)
+        stats = dict(_stats)
+    if samples:
+        stats.update(
+            {
+                "ttftSamples": len(samples),
+                "ttftP50Ms": round(_percentile(samples, 0.5) * 1000, 1),
+                "ttftP95Ms": round(_percentile(samples, 0.95) * 1000, 1),
+                "ttftP99Ms": round(_percentile(samples, 0.99) * 1000, 1),
+            }
+        )
+    stats["enabled"] = settings.CHAT_HEDGE_ENABLED
+    stats["currentDelayMs"] = round(hedge_delay() * 1000, 1)
+    return stats
@@ -0,0 +1,141 @@
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Set, Tuple
+
+from app.clients import async_openai_client
+from app.core.config import settings
+from app.services.chatbot.utils import _history_turns
+from app.services.llm_usage import record_usage
+from app.services.rate_governor import PRIORITY_NORMAL, allm_slot, estimate_chat_tokens
+from app.services.tokens import count_tokens, truncate_to_tokens
+
+
+class _SessionState:
+    def __init__(self):
+        self.summary = ""
+        self.summarized_turns = 0  # summary에 반영된 (오래된) 턴 수
+        self.updating = False
+        self.generation = 0  # 요약 초기화마다 증가. 진행 중이던 갱신 결과를 버리는 기준
+
+
+_lock = threading.Lock()
+_sessions: "OrderedDict[str, _SessionState]" = OrderedDict()
+_background: Set["asyncio.Task"] = set()  # 요약 태스크가 GC되지 않도록 참조 유지
+
+
+def _turns_to_text(turns: List[Tuple[str, str]]) -> str:
+    return "\n".join(f"{role}: {content}" for role, content in turns)
+
+
+def _get_state(session_id: str) -> _SessionState:
+    with _lock:
+        state = _sessions.get(session_id)
+        if state is None:
+            state = _sessions[session_id] = _SessionState()
+        _sessions.move_to_end(session_id)
+        while len(_sessions) > settings.CHAT_HISTORY_MAX_SESSIONS:
+            _sessions.popitem(last=False)
+        return state
+
+
+async def _summarize(previous: str, turns: List[Tuple[str, str]]) -> str:
+    instruction = (
+        "다음은 사내 챗봇과 사용자의 이전 대화 요약과, 요약에 아직 반영되지 않은 대화이다. "
+        "둘을 합쳐 이후 질문 해석에 필요한 사실(대상, 날짜, 사람, 규정명, 사용자의 의도)만 남긴 "
+        f"한국어 요약을 {settings.CHAT_HISTORY_SUMMARY_TOKENS}토큰 이내로 작성하라."
+    )
+    prompt = f"[기존 요약]\n{previous or '(없음)'}\n\n[추가 대화]\n{_turns_to_text(turns)}"
+    model = settings.CHAT_HISTORY_SUMMARY_MODEL
+    messages = [{"role": "system", "content": instruction}, {"role": "user", "content": prompt}]
+    estimate = estimate_chat_tokens(messages, model, settings.CHAT_HISTORY_SUMMARY_TOKENS)
+    # 백그라운드 갱신이므로 챗봇 응답 경로보다 뒤로 양보한다
+    async with allm_slot(model, estimate, PRIORITY_NORMAL) as ticket:
+        resp = await async_openai_client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=0,
+            max_tokens=settings.CHAT_HISTORY_SUMMARY_TOKENS,
+            prompt_cache_key="chatbot-history",
+        )
+        ticket.settle(resp.usage)
+    record_usage("history_summary", model, resp.usage)
+    return (resp.choices[0].message.content or "").strip()
+
+
+async def _update_summary(session_id: str, state: _SessionState, older: List[Tuple[str, str]]):
+    with _lock:
+        generation = state.generation
+        previous = state.summary
+        pending = older[state.summarized_turns :]
+    try:
+        summary = await _summarize(previous, pending)
+        with _lock:
+            if state.generation != generation:
+                print(f"[HISTORY] session={session_id} reset during summary update, result dropped")
+                return
+            state.summary = summary
+            state.summarized_turns = len(older)
+        print(f"[HISTORY] session={session_id} summarized_turns={len(older)}")
+    except Exception as e:
+        print(f"[HISTORY] summary update failed session={session_id}: {e}")
+    finally:
+        with _lock:
+            state.updating = False
+
+
+def _fit_recent(turns: List[Tuple[str, str]], budget: int, model: str) -> List[str]:
+    """최근 턴부터 거꾸로 채워 예산을 넘지 않게 한다. 각 메시지도 상한으로 자른다."""
+    lines: List[str] = []
+    per_msg = settings.CHAT_HISTORY_MESSAGE_TOKENS
+    for role, content in reversed(turns):
+        line = f"{role}: {truncate_to_tokens(content, per_msg, model)}"
+        cost = count_tokens(line, model) + 1
+        if cost > budget:
+            break
+        lines.append(line)
+        budget -= cost
+    lines.reverse()
+    return lines
+
+
+def build_history_block(session_id: Optional[str], history) -> str:
+    """
+    LLM 단계에 넣을 크기 제한된 history 블록.
+    최근 N턴은 원문, 그 이전 턴은 sessionId별로 누적 요약(백그라운드 갱신)으로 대체한다.
+    요약 갱신은 실행 중인 이벤트 루프의 백그라운드 태스크로 돌고, 이번 요청은 기존 요약을 쓴다.
+    """
+    turns = _history_turns(history)
+    if not turns:
+        return ""
+    model = settings.SUM_MODEL
+    keep = max(settings.CHAT_HISTORY_RECENT_TURNS, 0)
+    older, recent = (turns[:-keep], turns[-keep:]) if keep else (turns, [])
+
+    summary = ""
+    if session_id and older:
+        state = _get_state(session_id)
+        with _lock:
+            if len(older) < state.summarized_turns:
+                # 다른 대화로 바뀐 경우(history가 짧아짐) 요약을 초기화
+                state.summary, state.summarized_turns = "", 0
+                state.generation += 1
+            summary = state.summary
+            schedule = len(older) > state.summarized_turns and not state.updating
+            if schedule:
+                state.updating = True
+        if schedule:
+            task = asyncio.get_running_loop().create_task(_update_summary(session_id, state, list(older)))
+            _background.add(task)
+            task.add_done_callback(_background.discard)
+
+    budget = settings.CHAT_HISTORY_TOKEN_BUDGET
+    blocks: List[str] = []
+    if summary:
+        summary = truncate_to_tokens(summary, budget // 2, model)
+        blocks.append(f"[이전 대화 요약]\n{summary}")
+        budget -= count_tokens(blocks[-1], model)
+    lines = _fit_recent(recent, budget, model)
+    if lines:
+        blocks.append("\n".join(lines))
+    return "\n".join(blocks)
@@ -0,0 +1,156 @@
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.core.config import settings
+
+_MAX_FINGERPRINTS = 500
+
+_lock = threading.Lock()
+_entries: "OrderedDict[Tuple[str, str], Tuple[float, int, List[Dict[str, Any]]]]" = OrderedDict()
+_bytes = 0
+_stats = {"hits": 0, "misses": 0, "evictions": 0, "expired": 0}
+_fingerprints: Dict[str, Dict[str, Any]] = {}
+
+
+# 따옴표 리터럴 ('' 또는 \' 이스케이프 포함). split의 캡처 그룹이라 홀수 위치에 리터럴이 온다
+_LITERAL = re.compile(r"""('(?:[^'\\]|\\.|'')*'|"(?:[^"\\]|\\.|"")*")""")
+
+
+def normalize_sql(sql: str) -> str:
+    """리터럴 밖의 공백만 한 칸으로 줄인다. 'a  b'와 'a b'는 다른 값이므로 캐시 키에서 구분돼야 한다."""
+    parts = _LITERAL.split(sql)
+    return "".join(p if i % 2 else re.sub(r"\s+", " ", p) for i, p in enumerate(parts)).strip()
+
+
+def fingerprint_sql(sql: str) -> str:
+    """
+    리터럴을 ?로 치환한 정규화 문장. 같은 형태의 쿼리를 묶어 통계를 낸다.
+    """
+    fp = normalize_sql(sql).lower()
+    fp = re.sub(r"'(?:[^']|'')*'", "?", fp)
+    fp = re.sub(r"\"(?:[^\"]|\"\")*\"", "?", fp)
+    fp = re.sub(r"\b\d+(?:\.\d+)?\b", "?", fp)
+    fp = re.sub(r":\w+", "?", fp)
+    fp = re.sub(r"\bin\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", "in (?+)", fp)
+    return fp
+
+
+def _cache_key(sql: str, params: Optional[Dict[str, Any]]) -> Tuple[str, str]:
+    bound = json.dumps(params or {}, sort_keys=True, default=str, ensure_ascii=False)
+    return normalize_sql(sql), bound
+
+
+def ttl_for_tables(tables: Iterable[str]) -> int:
+    """쿼리에 포함된 테이블 중 가장 짧은 TTL을 사용한다."""
+    overrides = settings.SQL_CACHE_TABLE_TTLS
+    ttls = [overrides.get(t, settings.SQL_CACHE_TTL_S) for t in tables]
+    return min(ttls) if ttls else settings.SQL_CACHE_TTL_S
+
+
+def get_cached(sql: str, params: Optional[Dict[str, Any]]) -> Optional[List[Dict[str, Any]]]:
+    key = _cache_key(sql, params)
+    now = time.monotonic()
+    with _lock:
+        item = _entries.get(key)
+        if item is None:
+            _stats["misses"] += 1
+            return None
+        expires_at, size, rows = item
+        if expires_at <= now:
+            _drop(key)
+            _stats["expired"] += 1
+            _stats["misses"] += 1
+            return None
+        _entries.move_to_end(key)
+        _stats["hits"] += 1
+    return [dict(r) for r in rows]
+
+
+def _drop(key):
+    global _bytes
+    item = _entries.pop(key, None)
+    if item is not None:
+        _bytes -= item[1]
+
+
+def put_cached(sql: str, params: Optional[Dict[str, Any]], rows: List[Dict[str, Any]], tables: Iterable[str]):
+    global _bytes
+    ttl = ttl_for_tables(tables)
+    if ttl <= 0 or settings.SQL_CACHE_MAX_ENTRIES <= 0:
+        return
+    size = len(json.dumps(rows, default=str, ensure_ascii=False))
+    if size > settings.SQL_CACHE_MAX_BYTES:
+        return
+    key = _cache_key(sql, params)
+    with _lock:
+        _drop(key)
+        _entries[key] = (time.monotonic() + ttl, size, [dict(r) for r in rows])
+        _bytes += size
+        while _entries and (len(_entries) > settings.SQL_CACHE_MAX_ENTRIES or _bytes > settings.SQL_CACHE_MAX_BYTES):
+            oldest = next(iter(_entries))
+            _drop(oldest)
+            _stats["evictions"] += 1
+
+
+def clear_cache():
+    global _bytes
+    with _lock:
+        _entries.clear()
+        _bytes = 0
+
+
+def record_query(sql: str, elapsed_ms: float, rows: int, cache_hit: bool):
+    fp = fingerprint_sql(sql)
+    with _lock:
+        st = _fingerprints.get(fp)
+        if st is None:
+            if len(_fingerprints) >= _MAX_FINGERPRINTS:
+                # 가장 적게 실행된 문장을 버린다
+                victim = min(_fingerprints, key=lambda k: _fingerprints[k]["count"])
+                _fingerprints.pop(victim, None)
+            st = _fingerprints[fp] = {
+                "count": 0,
+                "cacheHits": 0,
+                "totalMs": 0.0,
+                "maxMs": 0.0,
+                "rows": 0,
+            }
+        st["count"] += 1
+        st["rows"] += rows
+        if cache_hit:
+            st["cacheHits"] += 1
+            return
+        st["totalMs"] += elapsed_ms
+        st["maxMs"] = max(st["maxMs"], elapsed_ms)
+
+
+def cache_stats() -> Dict[str, Any]:
+    with _lock:
+        total = _stats["hits"] + _stats["misses"]
+        return {
+            **_stats,
+            "hitRate": round(_stats["hits"] / total, 4) if total else 0.0,
+            "entries": len(_entries),
+            "bytes": _bytes,
+        }
+
+
+def fingerprint_stats(limit: int = 50) -> List[Dict[str, Any]]:
+    """DB 실행 누적 시간 순 정렬. 인덱스가 필요한 문장을 찾는 용도."""
+    with _lock:
+        items = []
+        for fp, st in _fingerprints.items():
+            executed = st["count"] - st["cacheHits"]
+            items.append({
+                "fingerprint": fp,
+                **st,
+                "totalMs": round(st["totalMs"], 2),
+                "maxMs": round(st["maxMs"], 2),
+                "avgMs": round(st["totalMs"] / executed, 2) if executed else 0.0,
+            })
+    items.sort(key=lambda x: x["totalMs"], reverse=True)
+    return items[:limit]
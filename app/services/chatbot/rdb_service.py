@@ -1,48 +1,83 @@
+import json
 import re
+import time
 from functools import lru_cache
 from typing import Any, Dict, List, Optional, Tuple
 
-from sqlalchemy import create_engine, inspect, text
+from sqlalchemy import create_engine, text
 from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 
-from app.clients import openai_client
+from app.clients import async_openai_client
 from app.core.config import settings
-from app.services.chatbot.utils import ALLOWED_TABLES, PERSONAL_TABLES
+from app.services.chatbot.query_cache import get_cached, put_cached, record_query
+from app.services.chatbot.schema_catalog import ensure_schema_catalog, schema_summary_for, table_columns
+from app.services.chatbot.utils import ALLOWED_TABLES, EMPLOYEE_ALLOWED_COLUMNS, PERSONAL_TABLES
+from app.services.llm_usage import record_usage
+from app.services.metrics import observe_stage
+from app.services.rate_governor import allm_slot, estimate_chat_tokens
+
+_ASYNC_DRIVERS = [
+    ("mysql+pymysql://", "mysql+aiomysql://"),
+    ("mysql://", "mysql+aiomysql://"),
+    ("postgresql+psycopg2://", "postgresql+asyncpg://"),
+    ("postgresql://", "postgresql+asyncpg://"),
+    ("postgres://", "postgresql+asyncpg://"),
+    ("sqlite://", "sqlite+aiosqlite://"),
+]
+
+
+def _async_dsn(dsn: str) -> str:
+    """동기 드라이버 DSN을 asyncio 드라이버 DSN으로 바꾼다. 이미 async 드라이버면 그대로."""
+    for sync_prefix, async_prefix in _ASYNC_DRIVERS:
+        if dsn.startswith(sync_prefix):
+            return async_prefix + dsn[len(sync_prefix):]
+    return dsn
+
+
+def _pool_kwargs(dsn: str) -> Dict[str, Any]:
+    if dsn.startswith("sqlite"):
+        return {"pool_pre_ping": True}
+    return {
+        "pool_pre_ping": True,
+        "pool_size": settings.SQL_POOL_SIZE,
+        "max_overflow": settings.SQL_MAX_OVERFLOW,
+        "pool_timeout": settings.SQL_POOL_TIMEOUT_S,
+        "pool_recycle": settings.SQL_POOL_RECYCLE_S,
+    }
+
+
+def _create_engine(dsn: str) -> Engine:
+    return create_engine(dsn, **_pool_kwargs(dsn))
 
-EMPLOYEE_ALLOWED_COLUMNS = {"emp_id", "emp_name", "email", "work_phone", "msg_stat", "delegate"}
 
 @lru_cache(maxsize=1)
 def get_engine() -> Engine:
     if not settings.EMP_DB_DSN:
         raise RuntimeError("EMP_DB_DSN이 설정되지 않았습니다. 직원 DB DSN을 .env에 설정하세요.")
-    return create_engine(settings.EMP_DB_DSN, pool_pre_ping=True)
+    return _create_engine(settings.EMP_DB_DSN)
 
 
-def _schema_summary() -> str:
+@lru_cache(maxsize=1)
+def get_read_engine() -> AsyncEngine:
     """
-    간단한 테이블/컬럼 목록을 문자열로 반환 (SQL 생성 보조용).
+    챗봇 SELECT용 async 엔진. EMP_DB_READ_DSN(읽기 전용 레플리카)이 있으면 그쪽으로 보낸다.
     """
-    engine = get_engine()
-    insp = inspect(engine)
-    lines: List[str] = []
-    allowed = {t.lower() for t in ALLOWED_TABLES}
-    for table in insp.get_table_names():
-        if table.lower() not in allowed:
-            continue
-        cols = [c["name"] for c in insp.get_columns(table)]
-        lines.append(f"{table}({', '.join(cols)})")
-    return "\n".join(lines)
+    dsn = settings.EMP_DB_READ_DSN or settings.EMP_DB_DSN
+    if not dsn:
+        raise RuntimeError("EMP_DB_DSN이 설정되지 않았습니다. 직원 DB DSN을 .env에 설정하세요.")
+    async_dsn = _async_dsn(dsn)
+    return create_async_engine(async_dsn, **_pool_kwargs(async_dsn))
+
+
+async def dispose_read_engine():
+    if get_read_engine.cache_info().currsize:
+        await get_read_engine().dispose()
+        get_read_engine.cache_clear()
 
 
-@lru_cache(maxsize=1)
 def _table_columns() -> Dict[str, set]:
-    engine = get_engine()
-    insp = inspect(engine)
-    columns: Dict[str, set] = {}
-    for table in insp.get_table_names():
-        cols = {c["name"].lower() for c in insp.get_columns(table)}
-        columns[table.lower()] = cols
-    return columns
+    return table_columns()
 
 
 def _tables_have_column(tables: List[str], column: str) -> bool:
@@ -62,41 +97,53 @@ def _strip_column_filter(sql: str, column: str) -> str:
     return updated
 
 
-def _generate_select_sql(question: str, schema: str, com_id: Optional[str]) -> str:
+def _strip_code_fence(s: str) -> str:
+    s = s.strip()
+    if s.startswith("```"):
+        s = s[3:].lstrip()  # remove leading ```
+        if s.lower().startswith("sql"):
+            s = s[3:].lstrip()  # remove optional 'sql'
+        if s.endswith("```"):
+            s = s[:-3].rstrip()
+    return s
+
+
+def clean_generated_sql(raw_sql: str) -> str:
+    sql = _strip_code_fence(raw_sql or "")
+    # 마지막 세미콜론은 제거해도 무방
+    if sql.endswith(";"):
+        sql = sql[:-1].strip()
+    return sql
+
+
+async def _generate_select_sql(question: str, schema: str, com_id: Optional[str]) -> str:
     """
     LLM으로 안전한 SELECT 쿼리를 생성합니다. DDL/DML 금지.
     """
-    def _strip_code_fence(s: str) -> str:
-        s = s.strip()
-        if s.startswith("```"):
-            s = s[3:].lstrip()  # remove leading ```
-            if s.lower().startswith("sql"):
-                s = s[3:].lstrip()  # remove optional 'sql'
-            if s.endswith("```"):
-                s = s[:-3].rstrip()
-        return s
-
-    extra = f"com_id 컬럼이 존재하면 WHERE com_id = '{com_id}' 조건을 반드시 포함하세요. " if com_id else ""
+    # 고정 지시문(허용 테이블 포함)을 앞에 두고 스키마/회사/질문은 뒤에 붙여 프롬프트 캐시 앞부분을 유지한다
     allowed_tables = ", ".join(sorted(ALLOWED_TABLES))
-    prompt = (
+    system_prompt = (
+        "You are a SQL assistant that only writes safe read-only queries.\n"
         "다음 질문을 SQL SELECT 한 개로 변환하세요. 테이블/컬럼은 스키마에 명시된 것만 사용합니다. "
         f"허용 테이블만 사용하세요: {allowed_tables}. "
         "INSERT/UPDATE/DELETE/DDL은 금지. LIMIT 20 이하로 설정하세요. 이름/텍스트 검색은 LIKE '%키워드%'를 사용하세요. "
-        f"{extra}"
-        "답변은 코드펜스 없이 SQL만 출력하고, 세미콜론은 붙이지 마세요.\n\n"
-        f"[스키마]\n{schema}\n\n[질문]\n{question}"
+        "[회사 ID]가 주어지고 com_id 컬럼이 존재하면 WHERE com_id = '<회사 ID>' 조건을 반드시 포함하세요. "
+        "답변은 코드펜스 없이 SQL만 출력하고, 세미콜론은 붙이지 마세요."
     )
-    resp = openai_client.chat.completions.create(
-        model=settings.RDB_MODEL,
-        messages=[{"role": "system", "content": "You are a SQL assistant that only writes safe read-only queries."},
-                  {"role": "user", "content": prompt}],
-        temperature=0,
-    )
-    raw_sql = (resp.choices[0].message.content or "").strip()
-    sql = _strip_code_fence(raw_sql)
-    # 마지막 세미콜론은 제거해도 무방
-    if sql.endswith(";"):
-        sql = sql[:-1].strip()
+    company = f"[회사 ID]\n{com_id}\n\n" if com_id else ""
+    messages = [{"role": "system", "content": system_prompt},
+                {"role": "user", "content": f"[스키마]\n{schema}\n\n{company}[질문]\n{question}"}]
+    with observe_stage("chatbot", "sql_generation"):
+        async with allm_slot(settings.RDB_MODEL, estimate_chat_tokens(messages, settings.RDB_MODEL)) as ticket:
+            resp = await async_openai_client.chat.completions.create(
+                model=settings.RDB_MODEL,
+                messages=messages,
+                temperature=0,
+                prompt_cache_key="chatbot-sql",
+            )
+            ticket.settle(resp.usage)
+    record_usage("sql_generation", settings.RDB_MODEL, resp.usage)
+    sql = clean_generated_sql(resp.choices[0].message.content or "")
     print(f"[RDB] generated SQL: {sql}")
     return sql
 
@@ -169,19 +216,118 @@ def _ensure_allowed_tables(sql: str):
     print(f"[RDB] allowed tables: {tables}")
 
 
-def execute_select(sql: str, params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+def _explain_row_estimate(conn, sql: str, params: Dict[str, Any]) -> Optional[int]:
+    """
+    EXPLAIN으로 예상 스캔 행 수를 구한다. 추정이 불가능한 DB(sqlite 등)는 None.
+    """
+    dialect = conn.dialect.name
+    if dialect == "mysql":
+        rows = conn.execute(text(f"EXPLAIN {sql}"), params).mappings().all()
+        estimate = 1
+        for r in rows:
+            estimate *= max(int(r.get("rows") or 1), 1)
+        return estimate
+    if dialect == "postgresql":
+        raw = conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"), params).scalar()
+        plan = (json.loads(raw) if isinstance(raw, str) else raw)[0]["Plan"]
+        total = 0
+        stack = [plan]
+        while stack:
+            node = stack.pop()
+            if "Scan" in node.get("Node Type", ""):
+                total += int(node.get("Plan Rows") or 0)
+            stack.extend(node.get("Plans", []))
+        return total
+    return None
+
+
+class NarrowedRows(list):
+    """
+    비용 가드가 LIKE '%키워드%'를 접두 검색 LIKE '키워드%'로 좁혀 얻은 결과.
+    키워드가 중간에 있는 행은 빠져 있으므로 format_rows가 답변에 그 사실을 알린다.
+    """
+    narrowed = True
+
+
+def _rewrite_leading_wildcard(sql: str) -> str:
+    # LIKE '%키워드%' -> LIKE '키워드%' (인덱스 범위 스캔 가능하도록)
+    return re.sub(r"(\blike\s+')%+", r"\1", sql, flags=re.IGNORECASE)
+
+
+def _guard_cost(conn, sql: str, params: Dict[str, Any]) -> Tuple[str, bool]:
+    """
+    예상 행 수가 임계값을 넘으면 거부한다. 반환: (실행할 SQL, 접두 검색으로 좁혔는지)
+    SQL_GUARD_REWRITE_LIKE가 켜져 있으면 선행 와일드카드 LIKE를 접두 검색으로 바꿔 재시도하고 결과에 표시한다.
+    """
+    max_rows = settings.SQL_EXPLAIN_MAX_ROWS
+    if max_rows <= 0:
+        return sql, False
+    estimate = _explain_row_estimate(conn, sql, params)
+    if estimate is None or estimate <= max_rows:
+        return sql, False
+    print(f"[RDB] cost guard: estimated rows={estimate} > {max_rows}")
+    if settings.SQL_GUARD_REWRITE_LIKE:
+        rewritten = _rewrite_leading_wildcard(sql)
+        if rewritten != sql:
+            estimate = _explain_row_estimate(conn, rewritten, params)
+            if estimate is not None and estimate <= max_rows:
+                print(f"[RDB] cost guard: narrowed to prefix search -> {rewritten} estimated rows={estimate}")
+                return rewritten, True
+    raise RuntimeError(f"쿼리 예상 비용이 너무 큽니다(예상 {estimate}행). 조건을 좁혀 다시 질문해주세요.")
+
+
+def _with_statement_timeout(conn, sql: str) -> str:
+    """
+    DB가 지원하면 서버 측 문장 타임아웃을 건다. MySQL은 힌트, MariaDB는 SET STATEMENT, PostgreSQL은 SET LOCAL.
+    """
+    timeout_ms = settings.SQL_STATEMENT_TIMEOUT_MS
+    if timeout_ms <= 0:
+        return sql
+    dialect = conn.dialect
+    if dialect.name == "mysql":
+        if getattr(dialect, "is_mariadb", False):
+            return f"SET STATEMENT max_statement_time={timeout_ms / 1000:.3f} FOR {sql}"
+        return re.sub(r"^\s*select\b", f"SELECT /*+ MAX_EXECUTION_TIME({timeout_ms}) */", sql, count=1, flags=re.IGNORECASE)
+    if dialect.name == "postgresql":
+        conn.execute(text(f"SET LOCAL statement_timeout = {timeout_ms}"))
+    return sql
+
+
+def _run_select(conn, sql: str, bound: Dict[str, Any], guard: bool) -> List[Dict[str, Any]]:
+    """동기 Connection 위에서 비용 검사/타임아웃/fetchmany를 적용해 실행한다 (AsyncConnection.run_sync용)."""
+    run_sql, narrowed = _guard_cost(conn, sql, bound) if guard else (sql, False)
+    run_sql = _with_statement_timeout(conn, run_sql)
+    print(f"[RDB] executing SQL -> {run_sql} params={bound}")
+    rows = conn.execute(text(run_sql), bound).mappings().fetchmany(settings.SQL_MAX_ROWS)
+    print(f"[RDB] rows fetched={len(rows)}")
+    result = [dict(r) for r in rows]
+    return NarrowedRows(result) if narrowed else result
+
+
+async def execute_select(sql: str, params: Optional[Dict[str, Any]] = None, guard: bool = True) -> List[Dict[str, Any]]:
     """
     SELECT만 실행. 결과를 dict 리스트로 반환.
+    동일 SQL + 바인딩 파라미터는 테이블별 TTL 동안 캐시된 결과를 반환한다.
+    guard=True면 EXPLAIN 비용 검사를 거친다(사전 검증된 카탈로그 쿼리는 생략).
     """
     if not _is_safe_select(sql):
         raise RuntimeError("허용되지 않는 SQL입니다. SELECT만 지원합니다.")
 
-    engine = get_engine()
-    with engine.connect() as conn:
-        print(f"[RDB] executing SQL -> {sql} params={params}")
-        rows = conn.execute(text(sql), params or {}).mappings().all()
-        print(f"[RDB] rows fetched={len(rows)}")
-        return [dict(r) for r in rows]
+    cached = get_cached(sql, params)
+    if cached is not None:
+        print(f"[RDB] cache hit rows={len(cached)}")
+        record_query(sql, 0.0, len(cached), cache_hit=True)
+        return cached
+
+    engine = get_read_engine()
+    started = time.perf_counter()
+    with observe_stage("chatbot", "sql_execution"):
+        async with engine.connect() as conn:
+            result = await conn.run_sync(_run_select, sql, params or {}, guard)
+    record_query(sql, (time.perf_counter() - started) * 1000, len(result), cache_hit=False)
+    if not isinstance(result, NarrowedRows):  # 캐시에서는 표시가 사라지므로 좁힌 결과는 캐시하지 않는다
+        put_cached(sql, params, result, _extract_tables(sql))
+    return result
 
 
 def _ensure_com_filter(sql: str, com_id: Optional[str]) -> Tuple[str, Dict[str, Any]]:
@@ -224,14 +370,26 @@ def _ensure_personal_filter(sql: str, tables: List[str], emp_id: Optional[str])
     return sql, params
 
 
-def query_db_with_llm(question: str, com_id: Optional[str], emp_id: Optional[str] = None) -> List[Dict[str, Any]]:
+async def query_db_with_llm(question: str, com_id: Optional[str], emp_id: Optional[str] = None) -> List[Dict[str, Any]]:
     """
     질문을 SQL로 변환 후 실행. 결과 반환.
     """
-    schema = _schema_summary()
-    sql = _generate_select_sql(question, schema, com_id)
+    if not await ensure_schema_catalog():
+        raise RuntimeError("스키마 카탈로그를 불러오지 못했습니다.")
+    schema = schema_summary_for(question)
+    sql = await _generate_select_sql(question, schema, com_id)
+    return await query_db_with_sql(sql, com_id, emp_id)
+
+
+async def query_db_with_sql(sql: str, com_id: Optional[str], emp_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    LLM이 만든 SELECT(플래너 통합 출력 포함)에 안전 검사/필터/LIMIT을 적용해 실행한다.
+    """
+    if not await ensure_schema_catalog():
+        raise RuntimeError("스키마 카탈로그를 불러오지 못했습니다.")
+    sql = clean_generated_sql(sql)
     print(f"[RDB] LLM raw sql -> {sql}")
-    
+
     # 1. LLM이 생성한 SQL에 이미 LIMIT이 있다면 제거 (문법 오류 방지)
     sql = re.sub(r"\s+limit\s+\d+\s*$", "", sql, flags=re.IGNORECASE).strip()
 
@@ -248,4 +406,4 @@ def query_db_with_llm(question: str, com_id: Optional[str], emp_id: Optional[str
     final_sql = _ensure_limit(p_sql)
     
     print(f"[RDB] final sql -> {final_sql} params={params}")
-    return execute_select(final_sql, params)
+    return await execute_select(final_sql, params)
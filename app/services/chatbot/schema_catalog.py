@@ -0,0 +1,218 @@
+import asyncio
+import re
+import threading
+import time
+from typing import Dict, List, Optional
+
+from sqlalchemy import inspect
+
+from app.core.config import settings
+from app.services.chatbot.utils import ALLOWED_TABLES, EMPLOYEE_ALLOWED_COLUMNS
+
+# 질문 키워드 -> 테이블 매칭용 힌트 (프롬프트에는 테이블 설명으로도 사용)
+TABLE_HINTS: Dict[str, List[str]] = {
+    "approval_line": ["결재", "결재선", "승인", "기안"],
+    "attendance": ["근태", "출근", "퇴근", "출퇴근", "지각", "근무"],
+    "board": ["게시판", "게시글", "공지", "공지사항"],
+    "corporate_car": ["법인차", "법인차량", "차량"],
+    "corporate_car_reservation": ["법인차", "법인차량", "차량", "배차", "예약"],
+    "meeting_room": ["회의실"],
+    "meeting_room_reservation": ["회의실", "예약"],
+    "shared_equipment": ["비품", "장비", "공용"],
+    "shared_equipment_reservation": ["비품", "장비", "대여", "예약"],
+    "emp_schedule": ["내 일정", "개인 일정", "일정", "스케줄"],
+    "employee": ["직원", "사원", "연락처", "전화", "이메일", "메일 주소", "담당자", "이름", "부재"],
+    "todo_list": ["할 일", "할일", "투두", "todo"],
+    "mail": ["메일", "이메일", "받은", "안 읽은", "편지"],
+    "meeting": ["회의", "회의록", "미팅"],
+    "meeting_emp": ["회의 참석", "참석자", "참석"],
+    "schedule": ["일정", "회사 일정", "행사", "스케줄"],
+}
+
+# 함께 조인되는 경우가 많은 테이블 (본 테이블이 선택되면 같이 포함)
+RELATED_TABLES: Dict[str, List[str]] = {
+    "corporate_car_reservation": ["corporate_car"],
+    "meeting_room_reservation": ["meeting_room"],
+    "shared_equipment_reservation": ["shared_equipment"],
+    "meeting_emp": ["meeting"],
+}
+
+_TYPE_ABBR = [
+    ("datetime", "dt"),
+    ("timestamp", "dt"),
+    ("date", "date"),
+    ("time", "time"),
+    ("bigint", "int"),
+    ("int", "int"),
+    ("bool", "bool"),
+    ("decimal", "num"),
+    ("numeric", "num"),
+    ("float", "num"),
+    ("double", "num"),
+    ("char", "str"),
+    ("text", "text"),
+    ("enum", "enum"),
+]
+
+_lock = threading.Lock()
+_tables: Optional[Dict[str, List[str]]] = None  # table -> ["col type(comment)", ...]
+_columns: Dict[str, set] = {}
+_loaded_at: float = 0.0
+_refresher: Optional[threading.Thread] = None
+_stop = threading.Event()
+
+
+def _abbr_type(raw_type) -> str:
+    name = str(raw_type).lower()
+    for key, abbr in _TYPE_ABBR:
+        if key in name:
+            return abbr
+    return name.split("(", 1)[0]
+
+
+def _annotate(col: dict) -> str:
+    label = f"{col['name']} {_abbr_type(col.get('type'))}"
+    comment = (col.get("comment") or "").strip()
+    if comment and len(comment) <= 20:
+        label = f"{label}({comment})"
+    return label
+
+
+def load_schema_catalog() -> Dict[str, List[str]]:
+    """
+    허용 테이블의 컬럼 정보를 한 번에 읽어 캐시한다. 요청 경로에서는 inspect()를 호출하지 않는다.
+    """
+    global _tables, _columns, _loaded_at
+    # rdb_service가 이 모듈을 import하므로 순환 참조를 피하려고 지연 import
+    from app.services.chatbot.rdb_service import get_engine
+
+    insp = inspect(get_engine())
+    tables: Dict[str, List[str]] = {}
+    columns: Dict[str, set] = {}
+    for table in insp.get_table_names():
+        name = table.lower()
+        if name not in ALLOWED_TABLES:
+            continue
+        cols = insp.get_columns(table)
+        columns[name] = {c["name"].lower() for c in cols}
+        if name == "employee":
+            # employee는 SELECT 가능한 컬럼과 필터용 com_id만 노출
+            cols = [c for c in cols if c["name"].lower() in EMPLOYEE_ALLOWED_COLUMNS | {"com_id"}]
+        tables[name] = [_annotate(c) for c in cols]
+    with _lock:
+        _tables = tables
+        _columns = columns
+        _loaded_at = time.time()
+    print(f"[SCHEMA] catalog loaded tables={len(tables)}")
+    return tables
+
+
+def refresh_schema_catalog() -> int:
+    """수동 갱신용. 로드된 테이블 수를 반환한다."""
+    return len(load_schema_catalog())
+
+
+def _ensure_loaded() -> Dict[str, List[str]]:
+    if _tables is None:
+        return load_schema_catalog()
+    return _tables
+
+
+async def ensure_schema_catalog() -> bool:
+    """
+    async 경로용. 카탈로그가 비어 있으면(시작 시 로드 실패 등) inspect()를 스레드에서 실행해 이벤트 루프를 막지 않는다.
+    로드되어 있으면 True. 이후 같은 요청의 동기 조회(table_columns 등)는 캐시만 읽는다.
+    """
+    if _tables is not None:
+        return True
+    try:
+        await asyncio.to_thread(load_schema_catalog)
+        return True
+    except Exception as e:
+        print(f"[SCHEMA] lazy load failed: {e}")
+        return False
+
+
+def catalog_version() -> float:
+    """마지막 로드 시각. 카탈로그 기반 캐시의 무효화 키로 사용."""
+    return _loaded_at
+
+
+def table_columns() -> Dict[str, set]:
+    _ensure_loaded()
+    return _columns
+
+
+def select_relevant_tables(question: str, max_tables: Optional[int] = None) -> List[str]:
+    """
+    질문 키워드/테이블명/컬럼명 매칭으로 관련 테이블만 고른다. 매칭이 없으면 전체 테이블을 반환한다.
+    """
+    tables = _ensure_loaded()
+    limit = max_tables or settings.SCHEMA_CATALOG_MAX_TABLES
+    lowered = question.lower()
+    words = set(re.findall(r"[a-z_][a-z0-9_]+", lowered))
+
+    scores: Dict[str, int] = {}
+    for table, cols in tables.items():
+        score = sum(2 for kw in TABLE_HINTS.get(table, []) if kw in lowered)
+        if table in words:
+            score += 3
+        score += sum(1 for c in cols if c.split(" ", 1)[0] in words)
+        if score:
+            scores[table] = score
+
+    if not scores:
+        return sorted(tables)
+
+    picked = [t for t, _ in sorted(scores.items(), key=lambda kv: (-kv[1], kv[0]))][:limit]
+    for t in list(picked):
+        for rel in RELATED_TABLES.get(t, []):
+            if rel in tables and rel not in picked:
+                picked.append(rel)
+    return picked
+
+
+def schema_summary_for(question: str, max_tables: Optional[int] = None) -> str:
+    """
+    SQL 생성 프롬프트용 축약 스키마. 예: meeting_room_reservation[회의실/예약](res_no int, ...)
+    """
+    tables = _ensure_loaded()
+    lines: List[str] = []
+    for table in select_relevant_tables(question, max_tables):
+        hint = "/".join(TABLE_HINTS.get(table, [])[:2])
+        label = f"{table}[{hint}]" if hint else table
+        lines.append(f"{label}({', '.join(tables.get(table, []))})")
+    return "\n".join(lines)
+
+
+def _refresh_loop(interval_s: int):
+    while not _stop.wait(interval_s):
+        try:
+            load_schema_catalog()
+        except Exception as e:
+            print(f"[SCHEMA] periodic refresh failed: {e}")
+
+
+def start_schema_catalog():
+    """
+    앱 시작 시 1회 로드하고, 설정된 주기로 백그라운드 갱신을 시작한다.
+    """
+    global _refresher
+    if not settings.EMP_DB_DSN:
+        print("[SCHEMA] EMP_DB_DSN not set; schema catalog disabled")
+        return
+    try:
+        load_schema_catalog()
+    except Exception as e:
+        print(f"[SCHEMA] initial load failed (will retry lazily): {e}")
+    interval = settings.SCHEMA_CATALOG_REFRESH_S
+    if interval > 0 and _refresher is None:
+        _stop.clear()
+        _refresher = threading.Thread(target=_refresh_loop, args=(interval,), daemon=True, name="schema-catalog")
+        _refresher.start()
+
+
+def stop_schema_catalog():
+    global _refresher
+    _stop.set()
+    _refresher = None
@@ -1,5 +1,5 @@
 import re
-from typing import Mapping
+from typing import List, Mapping, Tuple
 
 ALLOWED_TABLES = {
     "approval_line",
@@ -22,12 +22,12 @@ ALLOWED_TABLES = {
 
 PERSONAL_TABLES = {"todo_list", "mail", "attendance", "emp_schedule"}
 
+EMPLOYEE_ALLOWED_COLUMNS = {"emp_id", "emp_name", "email", "work_phone", "msg_stat", "delegate"}
 
-def _history_to_text(history) -> str:
-    if not history:
-        return ""
-    lines = []
-    for m in history:
+
+def _history_turns(history) -> List[Tuple[str, str]]:
+    turns: List[Tuple[str, str]] = []
+    for m in history or []:
         if isinstance(m, Mapping):
             role = str(m.get("role", "")).lower()
             content = m.get("content", "")
@@ -37,8 +37,14 @@ def _history_to_text(history) -> str:
         if not content:
             continue
         prefix = "User" if role.startswith("user") else "Assistant"
-        lines.append(f"{prefix}: {content}")
-    return "\n".join(lines)
+        turns.append((prefix, content))
+    return turns
+
+
+def _history_to_text(history) -> str:
+    if not history:
+        return ""
+    return "\n".join(f"{prefix}: {content}" for prefix, content in _history_turns(history))
 
 
 def clean_json_string(raw: str | None, default: str = "{}") -> str:
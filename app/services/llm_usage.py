@@ -0,0 +1,46 @@
+import threading
+from collections import defaultdict
+from typing import Any, Dict
+
+from app.services.metrics import record_tokens
+
+_lock = threading.Lock()
+_stages: Dict[str, Dict[str, int]] = defaultdict(
+    lambda: {"calls": 0, "promptTokens": 0, "cachedTokens": 0, "completionTokens": 0}
+)
+
+
+def cached_tokens(usage: Any) -> int:
+    details = getattr(usage, "prompt_tokens_details", None)
+    return int(getattr(details, "cached_tokens", 0) or 0)
+
+
+def record_usage(stage: str, model: str, usage: Any):
+    """
+    단계별 OpenAI usage 집계. cached_tokens는 프롬프트 앞부분이 서버 캐시에 적중한 토큰 수다.
+    """
+    if usage is None:
+        return
+    prompt = int(getattr(usage, "prompt_tokens", 0) or 0)
+    cached = cached_tokens(usage)
+    completion = int(getattr(usage, "completion_tokens", 0) or 0)
+    record_tokens(model, stage, prompt, cached, completion)
+    with _lock:
+        s = _stages[f"{stage}:{model}"]
+        s["calls"] += 1
+        s["promptTokens"] += prompt
+        s["cachedTokens"] += cached
+        s["completionTokens"] += completion
+    if cached:
+        print(f"[LLM USAGE] stage={stage} prompt={prompt} cached={cached}")
+
+
+def usage_stats() -> Dict[str, Dict[str, Any]]:
+    with _lock:
+        out = {}
+        for key, s in _stages.items():
+            out[key] = {
+                **s,
+                "cacheHitRatio": round(s["cachedTokens"] / s["promptTokens"], 4) if s["promptTokens"] else 0.0,
+            }
+        return out
@@ -2,10 +2,13 @@ from pathlib import Path
 from typing import Optional
 
 from app.clients import openai_client
+from app.services.llm_usage import record_usage
+from app.services.rate_governor import estimate_chat_tokens, llm_slot
 
 
 def whisper_transcribe(file_path: Path, model_name: str) -> str:
-    with open(file_path, "rb") as f:
+    # Whisper는 토큰이 아니라 요청 수(RPM) 한도만 적용한다
+    with open(file_path, "rb") as f, llm_slot(model_name, 0):
         tr = openai_client.audio.transcriptions.create(
             model=model_name,
             file=f,
@@ -15,7 +18,8 @@ def whisper_transcribe(file_path: Path, model_name: str) -> str:
 
 def gpt_summarize(transcribed_text: str, model_name: str, meeting_title: Optional[str] = None) -> str:
     title_line = f"회의 제목: {meeting_title}" if meeting_title else "회의 제목: (제공되지 않음)"
-    detailed_prompt = f"""
+    # 고정 지시문을 앞에 두고 회의 제목/녹취록은 뒤에 붙여 프롬프트 캐시 앞부분을 유지한다
+    instructions = """
 당신은 전문적인 회의록 작성 서기입니다. 
 제공된 녹취록은 화자 분리가 되어 있지 않으므로, 다음 지침에 따라 상세한 회의록을 작성해 주세요.
 
@@ -23,9 +27,9 @@ def gpt_summarize(transcribed_text: str, model_name: str, meeting_title: Optiona
 2. 내용 중심 정리: 발언자가 명확하지 않은 경우 무리하게 특정하지 말고, 논의된 '내용'과 '의견의 흐름'을 중심으로 정리하세요.
 3. Action Items: 할 일의 담당자가 명시되지 않았다면 '관련 부서 확인 필요' 또는 '회의 참여자 전체' 등으로 표기하세요.
 
-반드시 다음 형식을 지켜주세요:
+반드시 다음 형식을 지켜주세요 (첫 줄은 아래 입력의 회의 제목 줄을 그대로 씁니다):
 
-{title_line}
+회의 제목: ...
 
 ## 1. 회의 개요
 - 주제와 목적 요약
@@ -38,20 +42,23 @@ def gpt_summarize(transcribed_text: str, model_name: str, meeting_title: Optiona
 
 ## 4. 향후 행동 계획 (Action Items)
 - [할 일 내용] (담당자 / 기한)
----
-[녹취록 전문]
-{transcribed_text}
 """.strip()
+    detailed_prompt = f"{instructions}\n---\n{title_line}\n\n[녹취록 전문]\n{transcribed_text}"
 
-    resp = openai_client.chat.completions.create(
-        model=model_name,
-        messages=[
-            {
-                "role": "system",
-                "content": "You are a professional meeting minutes assistant. You create detailed, structured reports in Korean.",
-            },
-            {"role": "user", "content": detailed_prompt},
-        ],
-        temperature=0.3,
-    )
+    messages = [
+        {
+            "role": "system",
+            "content": "You are a professional meeting minutes assistant. You create detailed, structured reports in Korean.",
+        },
+        {"role": "user", "content": detailed_prompt},
+    ]
+    with llm_slot(model_name, estimate_chat_tokens(messages, model_name, 4096)) as ticket:
+        resp = openai_client.chat.completions.create(
+            model=model_name,
+            messages=messages,
+            temperature=0.3,
+            prompt_cache_key="meeting-summary",
+        )
+        ticket.settle(resp.usage)
+    record_usage("meeting_summary", model_name, resp.usage)
     return resp.choices[0].message.content or ""
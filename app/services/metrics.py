@@ -0,0 +1,95 @@
+import json
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+import httpx
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Histogram, generate_latest
+
+from app.services.tracing import span
+
+# 단계 지연은 수 ms(캐시 적중 SQL)부터 수 분(STT)까지 넓게 분포한다
+_STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60, 120, 300, 600)
+
+STAGE_SECONDS = Histogram(
+    "ai_stage_duration_seconds",
+    "파이프라인 단계별 소요 시간",
+    ["pipeline", "stage"],
+    buckets=_STAGE_BUCKETS,
+)
+STAGE_ERRORS = Counter(
+    "ai_stage_errors_total",
+    "파이프라인 단계별 예외 횟수",
+    ["pipeline", "stage"],
+)
+LLM_TOKENS = Counter(
+    "ai_llm_tokens_total",
+    "OpenAI usage 토큰 (kind=prompt|cached|completion)",
+    ["model", "stage", "kind"],
+)
+LLM_RETRIES = Counter(
+    "ai_openai_retries_total",
+    "OpenAI SDK 자동 재시도 횟수",
+    ["model"],
+)
+
+CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+
+@contextmanager
+def observe_stage(pipeline: str, stage: str) -> Iterator[None]:
+    """
+    with 블록 소요 시간을 pipeline/stage 히스토그램에 기록하고, trace 안이면 같은 이름의 span도 연다.
+    async 함수 안에서도 그대로 쓴다.
+    """
+    started = time.perf_counter()
+    try:
+        with span(stage, pipeline=pipeline):
+            yield
+    except Exception:
+        STAGE_ERRORS.labels(pipeline, stage).inc()
+        raise
+    finally:
+        STAGE_SECONDS.labels(pipeline, stage).observe(time.perf_counter() - started)
+
+
+def observe_seconds(pipeline: str, stage: str, seconds: float):
+    STAGE_SECONDS.labels(pipeline, stage).observe(seconds)
+
+
+def record_tokens(model: str, stage: str, prompt: int, cached: int, completion: int):
+    LLM_TOKENS.labels(model, stage, "prompt").inc(prompt)
+    if cached:
+        LLM_TOKENS.labels(model, stage, "cached").inc(cached)
+    if completion:
+        LLM_TOKENS.labels(model, stage, "completion").inc(completion)
+
+
+def _retry_model(request: httpx.Request) -> str:
+    try:
+        return str(json.loads(request.content).get("model") or "unknown")
+    except Exception:
+        return "unknown"  # multipart(Whisper) 등 JSON이 아닌 요청
+
+
+def _count_retry(request: httpx.Request):
+    # OpenAI SDK는 재시도 요청에 x-stainless-retry-count 헤더(1부터)를 붙인다
+    retry = request.headers.get("x-stainless-retry-count")
+    if retry and retry != "0":
+        LLM_RETRIES.labels(_retry_model(request)).inc()
+
+
+async def _acount_retry(request: httpx.Request):
+    _count_retry(request)
+
+
+def openai_http_hooks() -> dict:
+    return {"request": [_count_retry]}
+
+
+def openai_async_http_hooks() -> dict:
+    return {"request": [_acount_retry]}
+
+
+def render_metrics() -> bytes:
+    return generate_latest()
@@ -1,7 +1,7 @@
 import re
 import subprocess
 from pathlib import Path
-from typing import List
+from typing import List, Optional, Tuple
 
 import httpx
 from docx import Document
@@ -12,6 +12,8 @@ from app.services.storage import presign_get_url
 
 _chapter_re = re.compile(r"^제\s*\d+\s*장\b\s*(.*)")
 _article_re = re.compile(r"^제\s*\d+\s*조\b.*")
+_chapter_no_re = re.compile(r"제\s*(\d+)\s*장")
+_article_no_re = re.compile(r"제\s*(\d+)\s*조")
 
 
 def download_object(object_key: str, dst_path: Path):
@@ -90,6 +92,28 @@ def _infer_doc_title(text: str, default_title: str) -> str:
     return fallback
 
 
+def chunk_article_numbers(chunk: str) -> Tuple[Optional[int], Optional[int]]:
+    """
+    chunk_by_article 결과 청크에서 (조 번호, 장 번호)를 읽는다.
+    청크는 "문서명 - 제N장 ..." 헤더 줄 다음에 "제M조..." 본문이 오는 형태다.
+    """
+    lines = chunk.split("\n", 1)
+    header, body = (lines[0], lines[1]) if len(lines) == 2 else ("", lines[0])
+    article = _article_no_re.match(body)
+    chapter = _chapter_no_re.search(header)
+    return (
+        int(article.group(1)) if article else None,
+        int(chapter.group(1)) if chapter else None,
+    )
+
+
+def find_article_refs(text: str) -> Tuple[List[int], List[int]]:
+    """질문에 명시된 조/장 번호. 예: "제12조 연차" -> ([12], [])"""
+    articles = [int(n) for n in _article_no_re.findall(text or "")]
+    chapters = [int(n) for n in _chapter_no_re.findall(text or "")]
+    return list(dict.fromkeys(articles)), list(dict.fromkeys(chapters))
+
+
 def chunk_by_article(
     text: str,
     default_doc_title: str,
@@ -0,0 +1,120 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.core.config import settings
+
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+# 같은 조 본문(표준 규약 템플릿, 재업로드, 재색인)이 반복되므로 (모델, 차원, 본문 해시)로 벡터를 재사용한다
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    dims INTEGER NOT NULL,
+    vector BLOB NOT NULL,
+    last_used REAL NOT NULL
+)
+"""
+
+
+def cache_key(model: str, dims: int, text: str) -> str:
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return f"{model}:{dims}:{digest}"
+
+
+@lru_cache(maxsize=1)
+def _connection() -> Optional[sqlite3.Connection]:
+    path = settings.EMBED_CACHE_PATH
+    if not path or settings.EMBED_CACHE_MAX_ENTRIES <= 0:
+        return None
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(_SCHEMA)
+    conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings(last_used)")
+    print(f"[EMBED CACHE] opened path={path}")
+    return conn
+
+
+def get_many(model: str, dims: int, texts: List[str]) -> Dict[int, np.ndarray]:
+    """texts 위치 -> 캐시된 float32 벡터. 적중한 항목은 last_used를 갱신한다(LRU)."""
+    conn = _connection()
+    if conn is None or not texts:
+        return {}
+    keys = [cache_key(model, dims, t) for t in texts]
+    found: Dict[str, np.ndarray] = {}
+    with _lock:
+        unique = list(dict.fromkeys(keys))
+        for i in range(0, len(unique), 500):  # sqlite 바인딩 변수 수 제한
+            part = unique[i:i + 500]
+            rows = conn.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(part))})",
+                part,
+            ).fetchall()
+            for key, blob in rows:
+                found[key] = np.frombuffer(blob, dtype=np.float32)
+        if found:
+            now = time.time()
+            conn.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?", [(now, k) for k in found])
+        hits = {idx: found[key] for idx, key in enumerate(keys) if key in found}
+        _stats["hits"] += len(hits)
+        _stats["misses"] += len(keys) - len(hits)
+    return hits
+
+
+def put_many(model: str, dims: int, texts: List[str], vectors) -> None:
+    conn = _connection()
+    if conn is None or not texts:
+        return
+    now = time.time()
+    rows = [
+        (cache_key(model, dims, t), model, dims, np.asarray(v, dtype=np.float32).tobytes(), now)
+        for t, v in zip(texts, vectors)
+    ]
+    with _lock:
+        conn.execute("BEGIN")
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, model, dims, vector, last_used) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            _stats["writes"] += len(rows)
+            _evict(conn)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+
+def _evict(conn: sqlite3.Connection):
+    count = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+    overflow = count - settings.EMBED_CACHE_MAX_ENTRIES
+    if overflow <= 0:
+        return
+    conn.execute(
+        "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+        (overflow,),
+    )
+    _stats["evictions"] += overflow
+
+
+def cache_stats() -> Dict[str, object]:
+    conn = _connection()
+    with _lock:
+        stats: Dict[str, object] = dict(_stats)
+        total = _stats["hits"] + _stats["misses"]
+        stats["hitRate"] = round(_stats["hits"] / total, 4) if total else 0.0
+        stats["enabled"] = conn is not None
+        if conn is not None:
+            stats["entries"] = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            stats["maxEntries"] = settings.EMBED_CACHE_MAX_ENTRIES
+    return stats
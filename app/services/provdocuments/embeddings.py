@@ -1,36 +1,233 @@
+import asyncio
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from functools import lru_cache
-from typing import List
+from typing import List, Optional, Tuple
 
 import numpy as np
-from openai import OpenAI
+from openai import (
+    NOT_GIVEN,
+    APIConnectionError,
+    APITimeoutError,
+    AsyncOpenAI,
+    DefaultAsyncHttpxClient,
+    DefaultHttpxClient,
+    InternalServerError,
+    OpenAI,
+    RateLimitError,
+)
 
 from app.core.config import settings
+from app.services.llm_usage import record_usage
+from app.services.metrics import observe_stage, openai_async_http_hooks, openai_http_hooks
+from app.services.provdocuments import embedding_cache
+from app.services.rate_governor import (
+    PRIORITY_BULK,
+    allm_slot,
+    estimate_embedding_tokens,
+    llm_slot,
+)
+from app.services.tokens import count_tokens, split_by_tokens, truncate_to_tokens
 
 
 @lru_cache(maxsize=1)
 def get_openai_client() -> OpenAI:
-    return OpenAI(api_key=settings.OPENAI_API_KEY)
+    return OpenAI(
+        api_key=settings.OPENAI_API_KEY,
+        http_client=DefaultHttpxClient(event_hooks=openai_http_hooks()),
+    )
+
+
+@lru_cache(maxsize=1)
+def get_async_openai_client() -> AsyncOpenAI:
+    return AsyncOpenAI(
+        api_key=settings.OPENAI_API_KEY,
+        http_client=DefaultAsyncHttpxClient(event_hooks=openai_async_http_hooks()),
+    )
+
+
+# dimensions 미지정 시 모델 기본 차원
+_MODEL_DIMS = {
+    "text-embedding-3-small": 1536,
+    "text-embedding-3-large": 3072,
+    "text-embedding-ada-002": 1536,
+}
+
+
+def embedding_dims() -> Optional[int]:
+    """저장/검색 벡터 차원. EMBED_DIMENSIONS가 있으면 그 값, 없으면 모델 기본값."""
+    return settings.EMBED_DIMENSIONS or _MODEL_DIMS.get(settings.EMBED_MODEL)
+
+
+def _dimensions_arg():
+    return settings.EMBED_DIMENSIONS if settings.EMBED_DIMENSIONS else NOT_GIVEN
+
+
+def _cache_dims() -> int:
+    return settings.EMBED_DIMENSIONS or 0
 
 
 def _normalize_embeddings(vectors: np.ndarray) -> np.ndarray:
+    """float32 행렬을 제자리에서 단위 벡터로 만든다."""
     norms = np.linalg.norm(vectors, axis=1, keepdims=True)
-    norms = np.where(norms == 0, 1.0, norms)
-    return vectors / norms
+    norms[norms == 0] = 1.0
+    vectors /= norms
+    return vectors
 
 
 def embed_chunks(chunks: List[str]):
     """Run embeddings; return numpy array for optional downstream storage."""
     if not chunks:
-        return np.array([], dtype=float)
+        return np.empty((0, embedding_dims() or 0), dtype=np.float32)
+
+    cached = embedding_cache.get_many(settings.EMBED_MODEL, _cache_dims(), chunks)
+    missing = [i for i in range(len(chunks)) if i not in cached]
+    print(f"[EMBED] chunks={len(chunks)} cache_hits={len(cached)} to_embed={len(missing)}")
+    fresh = _embed_texts([chunks[i] for i in missing]) if missing else None
+    if fresh is not None:
+        embedding_cache.put_many(settings.EMBED_MODEL, _cache_dims(), [chunks[i] for i in missing], fresh)
+    if not cached:
+        return fresh
+
+    dims = fresh.shape[1] if fresh is not None else len(next(iter(cached.values())))
+    out = np.empty((len(chunks), dims), dtype=np.float32)
+    for idx, vector in cached.items():
+        out[idx] = vector
+    if fresh is not None:
+        out[missing] = fresh
+    return out
+
+
+def _prepare_inputs(texts: List[str]) -> Tuple[List[str], List[int], List[int]]:
+    """
+    입력 상한을 넘는 청크를 정책대로 자른다.
+    반환: (API에 보낼 조각, 조각별 원래 청크 위치, 조각별 토큰 수)
+    """
+    model = settings.EMBED_MODEL
+    limit = settings.EMBED_MAX_INPUT_TOKENS
+    pieces: List[str] = []
+    owners: List[int] = []
+    counts: List[int] = []
+    for idx, text in enumerate(texts):
+        tokens = count_tokens(text, model)
+        if tokens <= limit:
+            parts = [text or " "]  # 빈 문자열은 API가 거부한다
+        elif settings.EMBED_OVERLONG_POLICY == "truncate":
+            parts = [truncate_to_tokens(text, limit, model)]
+            print(f"[EMBED] chunk {idx} truncated tokens={tokens} -> {limit}")
+        else:
+            parts = split_by_tokens(text, limit, model)
+            print(f"[EMBED] chunk {idx} split tokens={tokens} parts={len(parts)}")
+        for part in parts:
+            pieces.append(part)
+            owners.append(idx)
+            counts.append(max(count_tokens(part, model), 1))
+    return pieces, owners, counts
+
+
+def _pack_batches(counts: List[int]) -> List[List[int]]:
+    """조각 위치를 순서대로 묶는다. 배치마다 토큰 합과 입력 수 상한을 지킨다."""
+    batches: List[List[int]] = []
+    current: List[int] = []
+    total = 0
+    for pos, tokens in enumerate(counts):
+        if current and (
+            total + tokens > settings.EMBED_BATCH_MAX_TOKENS or len(current) >= settings.EMBED_BATCH_MAX_INPUTS
+        ):
+            batches.append(current)
+            current, total = [], 0
+        current.append(pos)
+        total += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _embed_batch(client: OpenAI, texts: List[str], estimate: int) -> List[List[float]]:
+    for attempt in range(settings.EMBED_BATCH_RETRIES + 1):
+        try:
+            with llm_slot(settings.EMBED_MODEL, estimate, PRIORITY_BULK) as ticket:
+                response = client.embeddings.create(
+                    model=settings.EMBED_MODEL,
+                    input=texts,
+                    dimensions=_dimensions_arg(),
+                )
+                ticket.settle(response.usage)
+            break
+        except (APIConnectionError, APITimeoutError, InternalServerError, RateLimitError) as e:
+            if attempt >= settings.EMBED_BATCH_RETRIES:
+                raise
+            delay = min(2.0 ** attempt, 10.0)
+            print(f"[EMBED] batch retry attempt={attempt + 1} inputs={len(texts)} delay={delay:.0f}s error={e}")
+            time.sleep(delay)
+    record_usage("embedding", settings.EMBED_MODEL, response.usage)
+    vectors = [item.embedding for item in sorted(response.data, key=lambda d: d.index)]
+    if len(vectors) != len(texts):
+        raise RuntimeError(
+            f"OpenAI embedding count mismatch: expected {len(texts)}, got {len(vectors)}"
+        )
+    return vectors
+
+
+def _embed_texts(texts: List[str]) -> np.ndarray:
+    """
+    토큰 수 기준으로 배치를 나눠 EMBED_BATCH_CONCURRENCY개까지 동시에 요청하고, 원래 순서로 합친다.
+    나눠 임베딩한 청크는 조각 벡터를 토큰 수로 가중 평균한다.
+    """
     if not settings.OPENAI_API_KEY:
         raise RuntimeError("OPENAI_API_KEY가 설정되지 않았습니다.")
 
     client = get_openai_client()
-    response = client.embeddings.create(model=settings.EMBED_MODEL, input=chunks)
-    vectors = [item.embedding for item in response.data]
-    if len(vectors) != len(chunks):
-        raise RuntimeError(
-            f"OpenAI embedding count mismatch: expected {len(chunks)}, got {len(vectors)}"
-        )
-    embeddings = np.array(vectors, dtype=float)
+    pieces, owners, counts = _prepare_inputs(texts)
+    batches = _pack_batches(counts)
+    print(f"[EMBED] texts={len(texts)} pieces={len(pieces)} batches={len(batches)}")
+
+    piece_vectors: List[Optional[List[float]]] = [None] * len(pieces)
+    workers = max(1, min(settings.EMBED_BATCH_CONCURRENCY, len(batches)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="embed") as pool:
+        # 테넌트/trace 컨텍스트를 배치 스레드로 넘긴다
+        futures = {
+            pool.submit(
+                contextvars.copy_context().run,
+                _embed_batch,
+                client,
+                [pieces[p] for p in batch],
+                sum(counts[p] for p in batch),
+            ): batch
+            for batch in batches
+        }
+        for future in as_completed(futures):
+            for pos, vector in zip(futures[future], future.result()):
+                piece_vectors[pos] = vector
+
+    if len(pieces) == len(texts):
+        embeddings = np.asarray(piece_vectors, dtype=np.float32)
+    else:
+        embeddings = np.zeros((len(texts), len(piece_vectors[0])), dtype=np.float32)
+        for pos, owner in enumerate(owners):
+            embeddings[owner] += np.asarray(piece_vectors[pos], dtype=np.float32) * counts[pos]
     return _normalize_embeddings(embeddings)
+
+
+async def aembed_query(text: str) -> np.ndarray:
+    """챗봇 검색용 단일 질의 임베딩 (asyncio). 같은 질문은 캐시에서 바로 돌려준다."""
+    cached = await asyncio.to_thread(embedding_cache.get_many, settings.EMBED_MODEL, _cache_dims(), [text])
+    if cached:
+        return cached[0]
+    if not settings.OPENAI_API_KEY:
+        raise RuntimeError("OPENAI_API_KEY가 설정되지 않았습니다.")
+    client = get_async_openai_client()
+    with observe_stage("chatbot", "embedding"):
+        async with allm_slot(settings.EMBED_MODEL, estimate_embedding_tokens([text], settings.EMBED_MODEL)) as ticket:
+            response = await client.embeddings.create(
+                model=settings.EMBED_MODEL,
+                input=[text],
+                dimensions=_dimensions_arg(),
+            )
+            ticket.settle(response.usage)
+    record_usage("query_embedding", settings.EMBED_MODEL, response.usage)
+    embeddings = np.array([response.data[0].embedding], dtype=np.float32)
+    vector = _normalize_embeddings(embeddings)[0]
+    await asyncio.to_thread(embedding_cache.put_many, settings.EMBED_MODEL, _cache_dims(), [text], [vector])
+    return vector
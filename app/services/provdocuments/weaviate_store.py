@@ -1,50 +1,498 @@
-from functools import lru_cache
-from typing import List, Optional
+import asyncio
+import functools
+import hashlib
+import json
+import re
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
 
 import weaviate
-from weaviate.classes.config import Configure, DataType, Property
-from weaviate.classes.query import Filter
+from pydantic import BaseModel
+from weaviate.classes.config import (
+    Configure,
+    DataType,
+    Property,
+    Reconfigure,
+    Tokenization,
+    VectorDistances,
+    VectorFilterStrategy,
+)
+from weaviate.classes.query import Filter, MetadataQuery
+from weaviate.classes.tenants import Tenant, TenantActivityStatus
 from weaviate.connect import ConnectionParams
+from weaviate.exceptions import (
+    WeaviateClosedClientError,
+    WeaviateConnectionError,
+    WeaviateGRPCUnavailableError,
+)
 
 from app.core.config import settings
-from app.services.provdocuments.embeddings import embed_chunks
+from app.services.metrics import observe_stage
+from app.services.provdocuments.documents import chunk_article_numbers, find_article_refs
+from app.services.provdocuments.embeddings import aembed_query, embed_chunks, embedding_dims
 
 
 COLLECTION_NAME = settings.WEAVIATE_COLLECTION
 
+# 커넥션이 끊겼다고 보고 재연결할 예외
+_DISCONNECT_ERRORS = (WeaviateConnectionError, WeaviateClosedClientError, WeaviateGRPCUnavailableError)
 
-@lru_cache(maxsize=1)
-def get_client() -> weaviate.WeaviateClient:
+_client: Optional[weaviate.WeaviateClient] = None
+_client_checked_at = 0.0
+_client_lock = threading.Lock()
+_handles: Dict[str, Any] = {}  # 테넌트("" = 컬렉션 자체) -> 컬렉션 핸들, 재연결 시 비운다
+
+_async_client: Optional[weaviate.WeaviateAsyncClient] = None
+_async_checked_at = 0.0
+_async_handles: Dict[str, Any] = {}
+_async_lock = asyncio.Lock()
+
+_schema_ready = False
+_schema_lock = threading.Lock()
+
+
+def _connection_params() -> ConnectionParams:
     if not settings.WEAVIATE_HTTP_URL:
         raise RuntimeError("WEAVIATE_HTTP_URL이 설정되지 않았습니다.")
-    params = ConnectionParams.from_url(
+    return ConnectionParams.from_url(
         settings.WEAVIATE_HTTP_URL,
         grpc_port=settings.WEAVIATE_GRPC_PORT,
     )
-    client = weaviate.WeaviateClient(connection_params=params)
-    client.connect()
-    return client
 
 
-def ensure_collection(client: weaviate.WeaviateClient):
-    existing = client.collections.list_all()
-    if COLLECTION_NAME in existing:
-        return
+def _health_due(checked_at: float) -> bool:
+    return time.monotonic() - checked_at >= settings.WEAVIATE_HEALTH_CHECK_S
+
+
+def get_client() -> weaviate.WeaviateClient:
+    """
+    프로세스 공용 동기 클라이언트. WEAVIATE_HEALTH_CHECK_S마다 liveness를 확인하고
+    끊겼으면 닫고 다시 연결한다.
+    """
+    global _client, _client_checked_at
+    with _client_lock:
+        if _client is not None:
+            if _client.is_connected() and not _health_due(_client_checked_at):
+                return _client
+            try:
+                alive = _client.is_connected() and _client.is_live()
+            except Exception:
+                alive = False
+            if alive:
+                _client_checked_at = time.monotonic()
+                return _client
+            print("[WEAVIATE] connection lost, reconnecting")
+            _close_quietly(_client)
+            _client = None
+            _handles.clear()
+        client = weaviate.WeaviateClient(connection_params=_connection_params())
+        client.connect()
+        _client = client
+        _client_checked_at = time.monotonic()
+        return client
+
+
+def _close_quietly(client):
+    try:
+        client.close()
+    except Exception as e:
+        print(f"[WEAVIATE] close failed: {e}")
+
+
+def reset_client():
+    """다음 get_client()가 새로 연결하도록 현재 클라이언트를 버린다."""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _close_quietly(_client)
+        _client = None
+        _handles.clear()
+
+
+def close_client():
+    reset_client()
+
+
+def _reconnecting(fn):
+    """커넥션 오류면 클라이언트를 새로 만들어 한 번 더 시도한다. 감싼 함수는 모두 재실행해도 안전하다(uuid 기반 upsert/삭제/조회)."""
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        try:
+            return fn(*args, **kwargs)
+        except _DISCONNECT_ERRORS as e:
+            print(f"[WEAVIATE] {fn.__name__} connection error, retrying once: {e}")
+            reset_client()
+            return fn(*args, **kwargs)
+
+    return wrapper
+
+
+async def get_async_client() -> weaviate.WeaviateAsyncClient:
+    """챗봇 검색용 async 클라이언트 (이벤트 루프 안에서 1회 연결, 주기적으로 liveness 확인)."""
+    global _async_client, _async_checked_at
+    async with _async_lock:
+        if _async_client is not None and (not _async_client.is_connected() or _health_due(_async_checked_at)):
+            try:
+                alive = _async_client.is_connected() and await _async_client.is_live()
+            except Exception:
+                alive = False
+            if alive:
+                _async_checked_at = time.monotonic()
+            else:
+                print("[WEAVIATE] async connection lost, reconnecting")
+                await _aclose_quietly(_async_client)
+                _async_client = None
+                _async_handles.clear()
+        if _async_client is None:
+            client = weaviate.WeaviateAsyncClient(connection_params=_connection_params())
+            await client.connect()
+            _async_client = client
+            _async_checked_at = time.monotonic()
+    return _async_client
+
+
+async def _aclose_quietly(client):
+    try:
+        await client.close()
+    except Exception as e:
+        print(f"[WEAVIATE] async close failed: {e}")
+
+
+async def close_async_client():
+    global _async_client
+    async with _async_lock:
+        if _async_client is not None:
+            await _aclose_quietly(_async_client)
+            _async_client = None
+            _async_handles.clear()
+
+
+def bootstrap_weaviate():
+    """앱 시작 시 1회: 연결하고 컬렉션 스키마를 확인/생성한다. 이후 요청 경로에서는 스키마 조회를 하지 않는다."""
+    ensure_collection(get_client())
+    print(f"[WEAVIATE] bootstrap done collection={COLLECTION_NAME} multiTenancy={settings.WEAVIATE_MULTI_TENANCY}")
+
+
+async def close_weaviate():
+    await close_async_client()
+    await asyncio.to_thread(close_client)
+
+
+def _embedding_meta() -> Dict[str, Any]:
+    return {"embedModel": settings.EMBED_MODEL, "embedDims": embedding_dims()}
+
+
+def _parse_meta(description: Optional[str]) -> Dict[str, Any]:
+    try:
+        meta = json.loads(description or "")
+    except ValueError:
+        return {}
+    return meta if isinstance(meta, dict) else {}
+
+
+def _check_embedding_meta(client: weaviate.WeaviateClient):
+    """
+    컬렉션 description에 기록된 임베딩 모델/차원이 현재 설정과 다르면 저장·검색을 거부한다.
+    기록이 없는(이전에 만든) 컬렉션은 저장된 벡터 1개로 차원을 확인한 뒤 기록한다.
+    """
+    coll = client.collections.get(COLLECTION_NAME)
+    expected = _embedding_meta()
+    meta = _parse_meta(coll.config.get().description)
+    if not meta:
+        sample = None
+        if not settings.WEAVIATE_MULTI_TENANCY:  # 테넌트 컬렉션은 테넌트 없이 조회할 수 없다
+            res = coll.query.fetch_objects(limit=1, include_vector=True, return_properties=[])
+            sample = _default_vector(res.objects[0].vector) if res.objects else None
+        if sample is not None and expected["embedDims"] and len(sample) != expected["embedDims"]:
+            raise RuntimeError(
+                f"Weaviate 컬렉션 벡터 차원({len(sample)})이 설정({expected['embedDims']})과 다릅니다. "
+                "EMBED_DIMENSIONS를 확인하거나 재색인하세요."
+            )
+        coll.config.update(description=json.dumps(expected))
+        print(f"[WEAVIATE] recorded embedding meta collection={COLLECTION_NAME} meta={expected}")
+    elif meta.get("embedModel") != expected["embedModel"] or meta.get("embedDims") != expected["embedDims"]:
+        raise RuntimeError(
+            f"Weaviate 컬렉션 임베딩 설정 불일치: 컬렉션={meta} 현재={expected}. "
+            "EMBED_MODEL/EMBED_DIMENSIONS를 확인하거나 재색인하세요."
+        )
+
+
+def _collection_properties() -> List[Property]:
+    # 필터 전용 필드는 field 토큰화(완전 일치)로 두고 BM25 색인을 만들지 않는다
+    exact = {"data_type": DataType.TEXT, "tokenization": Tokenization.FIELD, "index_searchable": False}
+    return [
+        Property(name="comId", index_filterable=True, **exact),
+        Property(name="provNo", data_type=DataType.INT, index_filterable=True, index_range_filters=True),
+        Property(name="objectKey", index_filterable=True, **exact),
+        Property(name="originalName", data_type=DataType.TEXT),
+        Property(name="chunkIndex", data_type=DataType.INT, index_filterable=True, index_range_filters=True),
+        Property(
+            name="content",
+            data_type=DataType.TEXT,
+            index_filterable=False,
+            index_searchable=True,
+            tokenization=Tokenization(settings.WEAVIATE_CONTENT_TOKENIZATION),
+        ),
+        Property(name="isPublic", data_type=DataType.BOOL, index_filterable=True),
+        *_article_properties(),
+    ]
+
+
+def _article_properties() -> List[Property]:
+    # 조/장 번호 -> 청크 직접 조회용 (필터 인덱스가 곧 번호별 역색인)
+    return [
+        Property(name="articleNo", data_type=DataType.INT, index_filterable=True, index_range_filters=True),
+        Property(name="chapterNo", data_type=DataType.INT, index_filterable=True),
+    ]
+
+
+def _quantizer(factory):
+    """factory는 Configure.VectorIndex.Quantizer(생성) 또는 Reconfigure.VectorIndex.Quantizer(변경)."""
+    mode = (settings.WEAVIATE_COMPRESSION or "none").lower()
+    if mode == "pq":
+        return factory.pq(segments=settings.WEAVIATE_PQ_SEGMENTS, training_limit=settings.WEAVIATE_COMPRESSION_TRAINING_LIMIT)
+    if mode == "bq":
+        return factory.bq()
+    if mode == "sq":
+        return factory.sq(training_limit=settings.WEAVIATE_COMPRESSION_TRAINING_LIMIT)
+    if mode != "none":
+        raise RuntimeError(f"지원하지 않는 WEAVIATE_COMPRESSION: {settings.WEAVIATE_COMPRESSION}")
+    return None
+
+
+def _filter_strategy() -> Optional[VectorFilterStrategy]:
+    if not settings.WEAVIATE_FILTER_STRATEGY:
+        return None
+    return VectorFilterStrategy(settings.WEAVIATE_FILTER_STRATEGY.lower())
+
+
+def vector_index_config():
+    return Configure.VectorIndex.hnsw(
+        distance_metric=VectorDistances.COSINE,
+        ef=settings.WEAVIATE_HNSW_EF,
+        ef_construction=settings.WEAVIATE_HNSW_EF_CONSTRUCTION,
+        max_connections=settings.WEAVIATE_HNSW_MAX_CONNECTIONS,
+        filter_strategy=_filter_strategy(),
+        quantizer=_quantizer(Configure.VectorIndex.Quantizer),
+    )
+
+
+def vector_index_update():
+    """기존 컬렉션에 바꿀 수 있는 항목만(ef, 필터 전략, 압축 활성화) 담은 변경 설정."""
+    return Reconfigure.VectorIndex.hnsw(
+        ef=settings.WEAVIATE_HNSW_EF,
+        filter_strategy=_filter_strategy(),
+        quantizer=_quantizer(Reconfigure.VectorIndex.Quantizer),
+    )
+
+
+def create_collection(client: weaviate.WeaviateClient, name: str, multi_tenancy: Optional[bool] = None):
+    if multi_tenancy is None:
+        multi_tenancy = settings.WEAVIATE_MULTI_TENANCY
     client.collections.create(
-        name=COLLECTION_NAME,
+        name=name,
+        description=json.dumps(_embedding_meta()),
         vectorizer_config=Configure.Vectorizer.none(),
-        properties=[
-            Property(name="comId", data_type=DataType.TEXT),
-            Property(name="provNo", data_type=DataType.INT),
-            Property(name="objectKey", data_type=DataType.TEXT),
-            Property(name="originalName", data_type=DataType.TEXT),
-            Property(name="chunkIndex", data_type=DataType.INT),
-            Property(name="content", data_type=DataType.TEXT),
-            Property(name="isPublic", data_type=DataType.BOOL),
-        ],
+        vector_index_config=vector_index_config(),
+        properties=_collection_properties(),
+        multi_tenancy_config=(
+            Configure.multi_tenancy(enabled=True, auto_tenant_creation=True, auto_tenant_activation=True)
+            if multi_tenancy
+            else None
+        ),
     )
+    print(f"[WEAVIATE] created collection={name} compression={settings.WEAVIATE_COMPRESSION} multiTenancy={multi_tenancy}")
 
 
+def _add_missing_properties(client: weaviate.WeaviateClient):
+    """이전에 만든 컬렉션에 조/장 번호 속성을 추가한다. 기존 객체는 다음 재색인(diff) 때 채워진다."""
+    coll = client.collections.get(COLLECTION_NAME)
+    existing = {p.name for p in coll.config.get().properties}
+    for prop in _article_properties():
+        if prop.name not in existing:
+            coll.config.add_property(prop)
+            print(f"[WEAVIATE] added property={prop.name} collection={COLLECTION_NAME}")
+
+
+def ensure_collection(client: weaviate.WeaviateClient):
+    """스키마 확인/생성은 프로세스당 1회만 한다 (재연결해도 서버 스키마는 그대로)."""
+    global _schema_ready
+    if _schema_ready:
+        return
+    with _schema_lock:
+        if _schema_ready:
+            return
+        # exists는 alias 이름도 인식한다 (migrate_weaviate.py rebuild --swap 이후)
+        if client.collections.exists(COLLECTION_NAME):
+            _check_embedding_meta(client)
+            _add_missing_properties(client)
+        else:
+            create_collection(client, COLLECTION_NAME)
+        _schema_ready = True
+
+
+_TENANT_NAME = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+_tenants_lock = threading.Lock()
+_known_tenants: set = set()
+
+
+def tenant_name(com_id: str) -> str:
+    """comId를 Weaviate 테넌트 이름 규칙([A-Za-z0-9_-], 64자)에 맞춘다."""
+    com_id = str(com_id)
+    if _TENANT_NAME.match(com_id):
+        return com_id
+    return "t_" + hashlib.sha1(com_id.encode("utf-8")).hexdigest()
+
+
+def _has_tenant(coll, name: str, create: bool) -> bool:
+    with _tenants_lock:
+        if name in _known_tenants:
+            return True
+        if not coll.tenants.exists(name):
+            if not create:
+                return False
+            coll.tenants.create(Tenant(name=name, activity_status=TenantActivityStatus.ACTIVE))
+            print(f"[WEAVIATE] created tenant={name} collection={COLLECTION_NAME}")
+        _known_tenants.add(name)
+        return True
+
+
+def _collection(client: weaviate.WeaviateClient, com_id: Optional[str], create: bool = False):
+    """
+    단일 컬렉션 모드면 컬렉션 그대로, 멀티테넌시 모드면 comId 테넌트로 좁힌 핸들을 돌려준다.
+    create=True(적재 경로)면 테넌트가 없을 때 만들고, 아니면 테넌트가 없을 때 None.
+    """
+    ensure_collection(client)
+    coll = _handles.get("")
+    if coll is None:
+        coll = _handles[""] = client.collections.get(COLLECTION_NAME)
+    if not settings.WEAVIATE_MULTI_TENANCY:
+        return coll
+    if not com_id:
+        raise RuntimeError("멀티테넌시 모드에서는 comId가 필요합니다.")
+    name = tenant_name(com_id)
+    if not _has_tenant(coll, name, create):
+        return None
+    scoped = _handles.get(name)
+    if scoped is None:
+        scoped = _handles[name] = coll.with_tenant(name)
+    return scoped
+
+
+@_reconnecting
+def tenant_status() -> Dict[str, str]:
+    client = get_client()
+    ensure_collection(client)
+    tenants = client.collections.get(COLLECTION_NAME).tenants.get()
+    return {name: t.activity_status.value for name, t in tenants.items()}
+
+
+@_reconnecting
+def set_tenant_activity(com_id: str, active: bool):
+    """오래 쓰지 않는 회사 테넌트를 INACTIVE로 내려 메모리에서 내린다. 조회 시 auto activation으로 다시 올라온다."""
+    client = get_client()
+    ensure_collection(client)
+    status = TenantActivityStatus.ACTIVE if active else TenantActivityStatus.INACTIVE
+    client.collections.get(COLLECTION_NAME).tenants.update(Tenant(name=tenant_name(com_id), activity_status=status))
+    print(f"[WEAVIATE] tenant={tenant_name(com_id)} activity={status.value}")
+
+
+def _open_batch(coll):
+    if settings.WEAVIATE_BATCH_SIZE > 0:
+        return coll.batch.fixed_size(
+            batch_size=settings.WEAVIATE_BATCH_SIZE,
+            concurrent_requests=settings.WEAVIATE_BATCH_CONCURRENCY,
+        )
+    # 0이면 서버 큐 상태에 맞춰 배치 크기를 자동 조절
+    return coll.batch.dynamic()
+
+
+def _batch_insert(coll, objects: List[Dict[str, Any]]) -> int:
+    """
+    gRPC 배치로 객체를 넣는다. objects: [{"properties", "vector", "uuid"(선택)}]
+    실패한 객체만 모아 WEAVIATE_BATCH_RETRIES회까지 다시 넣고, 끝내 실패하면 RuntimeError.
+    """
+    dims = embedding_dims()
+    if dims and any(len(obj["vector"]) != dims for obj in objects):
+        raise RuntimeError(f"임베딩 차원이 설정({dims})과 다른 벡터가 있습니다.")
+    started = time.perf_counter()
+    pending = objects
+    failed_messages: List[str] = []
+    for attempt in range(settings.WEAVIATE_BATCH_RETRIES + 1):
+        if attempt:
+            time.sleep(min(0.5 * 2 ** (attempt - 1), 5.0))
+            print(f"[WEAVIATE] batch retry attempt={attempt} objects={len(pending)}")
+        with _open_batch(coll) as batch:
+            for obj in pending:
+                batch.add_object(properties=obj["properties"], vector=obj["vector"], uuid=obj.get("uuid"))
+        failed = coll.batch.failed_objects
+        if not failed:
+            pending = []
+            break
+        failed_messages = [f.message for f in failed]
+        # 배치가 부여한 uuid를 그대로 써서 재시도 시 중복 객체가 생기지 않게 한다
+        pending = [
+            {"properties": f.object_.properties, "vector": f.object_.vector, "uuid": f.object_.uuid}
+            for f in failed
+        ]
+        print(f"[WEAVIATE] batch failed objects={len(failed)} first_error={failed_messages[0]}")
+
+    elapsed = time.perf_counter() - started
+    inserted = len(objects) - len(pending)
+    rate = inserted / elapsed if elapsed > 0 else float(inserted)
+    print(f"[WEAVIATE] batch inserted={inserted}/{len(objects)} elapsed={elapsed:.2f}s objects_per_sec={rate:.1f}")
+    if pending:
+        raise RuntimeError(f"Weaviate 배치 저장 실패: {len(pending)}건 ({failed_messages[0]})")
+    return inserted
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def chunk_uuid(com_id: str, prov_no: int, digest: str, occurrence: int = 0) -> str:
+    """(comId, provNo, 내용 해시)로 정해지는 청크 UUID. 같은 문서 안의 동일 본문은 occurrence로 구분한다."""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"prov:{com_id}:{prov_no}:{digest}:{occurrence}"))
+
+
+def _chunk_ids(com_id: str, prov_no: int, chunks: List[str]) -> List[Tuple[str, str]]:
+    seen: Dict[str, int] = {}
+    out = []
+    for chunk in chunks:
+        digest = content_hash(chunk)
+        occurrence = seen.get(digest, 0)
+        seen[digest] = occurrence + 1
+        out.append((digest, chunk_uuid(com_id, prov_no, digest, occurrence)))
+    return out
+
+
+def _chunk_properties(
+    com_id: str,
+    prov_no: int,
+    object_key: str,
+    original_name: str,
+    public: bool,
+    idx: int,
+    chunk: str,
+) -> Dict[str, Any]:
+    article_no, chapter_no = chunk_article_numbers(chunk)
+    return {
+        "comId": com_id,
+        "provNo": prov_no,
+        "objectKey": object_key,
+        "originalName": original_name,
+        "chunkIndex": idx,
+        "content": chunk,
+        "isPublic": public,
+        "articleNo": article_no,
+        "chapterNo": chapter_no,
+    }
+
+
+@_reconnecting
 def store_prov_chunks(
     com_id: str,
     prov_no: int,
@@ -53,43 +501,190 @@ def store_prov_chunks(
     is_public: Optional[bool],
     chunks: List[str],
     embeddings,
-):
+) -> int:
     """
-    Store each chunk embedding in Weaviate with company/prov metadata.
+    Store chunk embeddings in Weaviate with company/prov metadata (gRPC batch).
+    UUID가 내용 기반이라 같은 청크를 다시 넣으면 덮어쓴다(중복 없음).
     """
-    client = get_client()
-    ensure_collection(client)
-    coll = client.collections.get(COLLECTION_NAME)
+    coll = _collection(get_client(), com_id, create=True)
 
-    for idx, (chunk, vec) in enumerate(zip(chunks, embeddings)):
-        coll.data.insert(
-            properties={
-                "comId": com_id,
-                "provNo": prov_no,
-                "objectKey": object_key,
-                "originalName": original_name,
-                "chunkIndex": idx,
-                "content": chunk,
-                "isPublic": bool(is_public) if is_public is not None else False,
-            },
-            vector=vec.tolist(),
+    vectors = embeddings.tolist() if hasattr(embeddings, "tolist") else list(embeddings)  # 행렬 단위로 한 번에 변환
+    public = bool(is_public) if is_public is not None else False
+    ids = _chunk_ids(com_id, prov_no, chunks)
+    objects = [
+        {
+            "properties": _chunk_properties(com_id, prov_no, object_key, original_name, public, idx, chunk),
+            "vector": vec,
+            "uuid": obj_id,
+        }
+        for idx, (chunk, vec, (_, obj_id)) in enumerate(zip(chunks, vectors, ids))
+    ]
+    return _batch_insert(coll, objects)
+
+
+def _stored_prov_chunks(coll, com_id: str, prov_no: int, page_size: int = 1000) -> List[Any]:
+    # 문서 1건 분량(수백~수천 청크)만 읽으므로 offset 페이지로 충분하다
+    out: List[Any] = []
+    while True:
+        res = coll.query.fetch_objects(
+            filters=_prov_filter(com_id, prov_no),
+            limit=page_size,
+            offset=len(out),
+            return_properties=["content", *_META_KEYS],
         )
+        objs = res.objects or []
+        out.extend(objs)
+        if len(objs) < page_size:
+            return out
 
 
-def delete_prov_chunks(com_id: str, prov_no: int) -> int:
+# 본문이 같아도 이 값들이 다르면 벡터는 두고 속성만 갱신한다
+_META_KEYS = ("chunkIndex", "objectKey", "originalName", "isPublic", "articleNo", "chapterNo")
+
+
+class ReindexPlan(BaseModel):
+    """diff 재색인 계획. new는 임베딩이 필요한 청크 위치, reuse는 기존 벡터를 새 UUID로 옮길 청크."""
+
+    com_id: str
+    prov_no: int
+    object_key: str
+    original_name: str
+    public: bool
+    chunks: List[str]
+    ids: List[str]
+    new: List[int] = []
+    reuse: Dict[int, str] = {}  # 청크 위치 -> 벡터를 가져올 기존 객체 uuid
+    update: Dict[int, str] = {}  # 청크 위치 -> 메타데이터만 바뀐 기존 객체 uuid
+    unchanged: int = 0
+    delete: List[str] = []
+
+
+@_reconnecting
+def plan_prov_reindex(
+    com_id: str,
+    prov_no: int,
+    object_key: str,
+    original_name: str,
+    is_public: Optional[bool],
+    chunks: List[str],
+    full: bool = False,
+) -> ReindexPlan:
     """
-    Delete all chunks for a company/provNo. Returns deleted count (best-effort).
+    저장된 청크와 새 청크 목록을 내용 해시로 비교한다.
+    - 같은 UUID가 있으면 유지(메타데이터가 다르면 update)
+    - UUID는 없지만 같은 본문이 있으면(이전 랜덤 UUID 적재분) 벡터만 재사용
+    - 그 외는 새로 임베딩, 새 목록에 없는 저장 객체는 삭제
+    full=True면 모든 청크를 새로 임베딩한다(삭제 대상 계산은 동일).
     """
-    client = get_client()
-    ensure_collection(client)
-    coll = client.collections.get(COLLECTION_NAME)
-    where = Filter.all_of([
+    coll = _collection(get_client(), com_id, create=True)
+    public = bool(is_public) if is_public is not None else False
+
+    stored = _stored_prov_chunks(coll, com_id, prov_no)
+    by_id = {str(obj.uuid): obj for obj in stored}
+    by_hash: Dict[str, str] = {}
+    for obj in stored:
+        by_hash.setdefault(content_hash(obj.properties.get("content") or ""), str(obj.uuid))
+
+    ids = _chunk_ids(com_id, prov_no, chunks)
+    plan = ReindexPlan(
+        com_id=com_id,
+        prov_no=prov_no,
+        object_key=object_key,
+        original_name=original_name,
+        public=public,
+        chunks=chunks,
+        ids=[obj_id for _, obj_id in ids],
+    )
+    for idx, (digest, obj_id) in enumerate(ids):
+        obj = by_id.get(obj_id)
+        if full:
+            plan.new.append(idx)
+        elif obj is not None:
+            want = _chunk_properties(com_id, prov_no, object_key, original_name, public, idx, chunks[idx])
+            if any(obj.properties.get(k) != want[k] for k in _META_KEYS):
+                plan.update[idx] = obj_id
+            else:
+                plan.unchanged += 1
+        elif digest in by_hash:
+            plan.reuse[idx] = by_hash[digest]
+        else:
+            plan.new.append(idx)
+    keep = set(plan.ids)
+    plan.delete = [obj_id for obj_id in by_id if obj_id not in keep]
+    print(
+        f"[WEAVIATE] reindex plan comId={com_id} provNo={prov_no} stored={len(stored)} chunks={len(chunks)} "
+        f"new={len(plan.new)} reuse={len(plan.reuse)} update={len(plan.update)} "
+        f"unchanged={plan.unchanged} delete={len(plan.delete)}"
+    )
+    return plan
+
+
+def _fetch_vectors(coll, obj_ids: List[str], page_size: int = 200) -> Dict[str, Any]:
+    vectors: Dict[str, Any] = {}
+    for i in range(0, len(obj_ids), page_size):
+        part = obj_ids[i:i + page_size]
+        res = coll.query.fetch_objects(
+            filters=Filter.by_id().contains_any(part),
+            limit=len(part),
+            include_vector=True,
+            return_properties=[],
+        )
+        for obj in res.objects or []:
+            vectors[str(obj.uuid)] = _default_vector(obj.vector)
+    return vectors
+
+
+@_reconnecting
+def apply_prov_reindex(plan: ReindexPlan, new_embeddings) -> int:
+    """
+    plan.new 순서대로 임베딩한 결과를 받아 반영한다. 새/변경 청크를 먼저 넣고 마지막에 삭제해
+    검색 공백 구간을 만들지 않는다. 반환값은 쓰기(삽입+갱신) 건수.
+    """
+    coll = _collection(get_client(), plan.com_id, create=True)
+
+    vectors = new_embeddings.tolist() if hasattr(new_embeddings, "tolist") else list(new_embeddings)
+    if len(vectors) != len(plan.new):
+        raise RuntimeError(f"재색인 임베딩 수 불일치: expected {len(plan.new)}, got {len(vectors)}")
+    source = {**plan.reuse, **plan.update}
+    existing = _fetch_vectors(coll, sorted(set(source.values())))
+
+    def props(idx: int) -> Dict[str, Any]:
+        return _chunk_properties(
+            plan.com_id, plan.prov_no, plan.object_key, plan.original_name, plan.public, idx, plan.chunks[idx]
+        )
+
+    objects = [{"properties": props(idx), "vector": vec, "uuid": plan.ids[idx]} for idx, vec in zip(plan.new, vectors)]
+    for idx, src in source.items():
+        if existing.get(src) is None:
+            raise RuntimeError(f"재색인 기존 벡터 조회 실패: uuid={src}")
+        objects.append({"properties": props(idx), "vector": existing[src], "uuid": plan.ids[idx]})
+    written = _batch_insert(coll, objects) if objects else 0
+
+    if plan.delete:
+        res = coll.data.delete_many(where=Filter.by_id().contains_any(plan.delete))
+        print(f"[WEAVIATE] reindex delete comId={plan.com_id} provNo={plan.prov_no} deleted={res.successful}")
+    return written
+
+
+def _prov_filter(com_id: str, prov_no: int):
+    return Filter.all_of([
         Filter.by_property("comId").equal(com_id),
         Filter.by_property("provNo").equal(prov_no),
     ])
-    res = coll.data.delete_many(where=where)
+
+
+@_reconnecting
+def delete_prov_chunks(com_id: str, prov_no: int) -> int:
+    """
+    Delete all chunks for a company/provNo. Returns deleted count (best-effort).
+    멀티테넌시 모드에서는 해당 회사 테넌트 안에서만 지운다.
+    """
+    coll = _collection(get_client(), com_id)
+    if coll is None:
+        return 0
+    res = coll.data.delete_many(where=_prov_filter(com_id, prov_no))
     try:
-        deleted = res.results["successful"]  # type: ignore[dict-item]
+        deleted = res.successful
         print(f"[WEAVIATE] delete comId={com_id} provNo={prov_no} deleted={deleted}")
         return deleted
     except Exception as e:
@@ -97,76 +692,135 @@ def delete_prov_chunks(com_id: str, prov_no: int) -> int:
         return 0
 
 
-def update_prov_chunks_public(com_id: str, prov_no: int, is_public: bool, batch_size: int = 200) -> int:
-    """
-    Update isPublic metadata for all chunks matching com_id + prov_no.
-    """
-    client = get_client()
-    ensure_collection(client)
-    coll = client.collections.get(COLLECTION_NAME)
-    where = Filter.all_of([
-        Filter.by_property("comId").equal(com_id),
-        Filter.by_property("provNo").equal(prov_no),
-    ])
+@_reconnecting
+def count_prov_chunks(com_id: str, prov_no: int, is_public: Optional[bool] = None) -> int:
+    """aggregate total_count로 객체를 가져오지 않고 개수만 센다."""
+    coll = _collection(get_client(), com_id)
+    if coll is None:
+        return 0
+    where = _prov_filter(com_id, prov_no)
+    if is_public is not None:
+        where = where & Filter.by_property("isPublic").equal(is_public)
+    res = coll.aggregate.over_all(filters=where, total_count=True)
+    return int(res.total_count or 0)
 
-    updated = 0
-    offset = 0
-    while True:
-        res = coll.query.fetch_objects(
-            filters=where,
-            limit=batch_size,
-            offset=offset,
-            return_properties=["isPublic"],
-        )
-        objs = getattr(res, "objects", None) or []
-        if not objs:
-            break
-        for obj in objs:
-            obj_id = getattr(obj, "uuid", None) or getattr(obj, "id", None)
-            if not obj_id:
-                continue
-            try:
-                coll.data.update(uuid=obj_id, properties={"isPublic": bool(is_public)})
-                updated += 1
-            except Exception as e:
-                print(f"[WEAVIATE] update failed for {obj_id}: {e}")
-        offset += len(objs)
 
-    print(f"[WEAVIATE] update comId={com_id} provNo={prov_no} isPublic={is_public} updated={updated}")
-    return updated
+_progress_lock = threading.Lock()
+_progress: Dict[Tuple[str, int], Dict[str, Any]] = {}
 
 
-def search_prov_chunks(
-    query: str,
-    top_k: int = 5,
-    com_id: Optional[str] = None,
-    prov_no: Optional[int] = None,
-) -> List[str]:
+def _set_progress(com_id: str, prov_no: int, **fields):
+    with _progress_lock:
+        _progress.setdefault((com_id, prov_no), {}).update(fields)
+
+
+def visibility_progress(com_id: str, prov_no: int) -> Optional[Dict[str, Any]]:
+    with _progress_lock:
+        item = _progress.get((com_id, prov_no))
+        return dict(item) if item else None
+
+
+def _default_vector(vector):
+    # include_vector=True면 {"default": [...]} 형태로 온다
+    if isinstance(vector, dict):
+        return vector.get("default") or next(iter(vector.values()), None)
+    return vector
+
+
+_VISIBILITY_STALE_ROUNDS = 5  # 갱신한 객체만 다시 보일 때 재조회/재기록 최대 횟수
+
+
+@_reconnecting
+def update_prov_chunks_public(com_id: str, prov_no: int, is_public: bool, batch_size: int = 500) -> int:
     """
-    Vector search over 규약 청크. Returns top chunks' content text.
+    Update isPublic metadata for all chunks matching com_id + prov_no.
+
+    Weaviate 커서(after)는 필터와 함께 쓸 수 없으므로, 아직 바뀌지 않은 객체(isPublic != 목표값)만
+    offset 없이 반복 조회한다. 갱신된 객체는 필터에서 빠지므로 매 페이지가 곧 다음 커서 위치가 된다.
+    갱신은 벡터를 포함한 같은 uuid로 배치 upsert 한다(객체별 PATCH 왕복 없음).
     """
-    client = get_client()
-    ensure_collection(client)
-    coll = client.collections.get(COLLECTION_NAME)
+    coll = _collection(get_client(), com_id)
+    if coll is None:
+        _set_progress(com_id, prov_no, isPublic=bool(is_public), total=0, pending=0, updated=0, state="done", error=None)
+        return 0
+    target = bool(is_public)
+    pending_filter = _prov_filter(com_id, prov_no) & Filter.by_property("isPublic").not_equal(target)
+
+    total = count_prov_chunks(com_id, prov_no, None)
+    remaining = coll.aggregate.over_all(filters=pending_filter, total_count=True).total_count or 0
+    started = time.perf_counter()
+    _set_progress(com_id, prov_no, isPublic=target, total=total, pending=remaining, updated=0, state="running", error=None)
+    if not remaining:
+        # 이미 목표 상태면 객체를 읽지 않고 끝낸다
+        _set_progress(com_id, prov_no, state="done")
+        print(f"[WEAVIATE] update comId={com_id} provNo={prov_no} isPublic={is_public} already up to date total={total}")
+        return 0
+
+    seen = set()
+    stale_rounds = 0
+    try:
+        while True:
+            res = coll.query.fetch_objects(filters=pending_filter, limit=batch_size, include_vector=True)
+            objs = res.objects or []
+            if not objs:
+                break
+            fresh = [obj for obj in objs if obj.uuid not in seen]
+            if fresh:
+                stale_rounds = 0
+            else:
+                # 이미 갱신한 객체만 다시 보이면(인덱스 반영 지연 또는 유실) 잠시 기다렸다가 다시 쓴다
+                stale_rounds += 1
+                if stale_rounds > _VISIBILITY_STALE_ROUNDS:
+                    break
+                time.sleep(0.2 * stale_rounds)
+            seen.update(obj.uuid for obj in objs)
+            objects = [
+                {"properties": {**obj.properties, "isPublic": target}, "vector": _default_vector(obj.vector), "uuid": obj.uuid}
+                for obj in (fresh or objs)
+            ]
+            _batch_insert(coll, objects)
+            _set_progress(com_id, prov_no, updated=len(seen), pending=max(remaining - len(seen), 0))
+    except Exception as e:
+        _set_progress(com_id, prov_no, state="failed", error=str(e))
+        raise
+
+    updated = len(seen)
+    elapsed = time.perf_counter() - started
+    # 끝났다고 보고하기 전에 아직 이전 값인 객체가 남았는지 다시 센다
+    left = coll.aggregate.over_all(filters=pending_filter, total_count=True).total_count or 0
+    if left:
+        _set_progress(
+            com_id, prov_no, state="pending", pending=left, updated=updated, elapsedMs=round(elapsed * 1000, 1),
+            error=f"{left}개 청크가 아직 isPublic={not target} 상태입니다. 같은 요청을 다시 보내면 이어서 반영합니다.",
+        )
+        print(f"[WEAVIATE] update comId={com_id} provNo={prov_no} isPublic={is_public} updated={updated} still pending={left}")
+        return updated
+    _set_progress(com_id, prov_no, state="done", pending=0, updated=updated, elapsedMs=round(elapsed * 1000, 1))
+    print(f"[WEAVIATE] update comId={com_id} provNo={prov_no} isPublic={is_public} updated={updated} elapsed={elapsed:.2f}s")
+    return updated
 
-    query_vec = embed_chunks([query])[0].tolist()
 
+def _search_filter(com_id: Optional[str], prov_no: Optional[int]):
     where_filters = []
     if com_id:
         where_filters.append(Filter.by_property("comId").equal(com_id))
     if prov_no is not None:
         where_filters.append(Filter.by_property("provNo").equal(prov_no))
     where_filters.append(Filter.by_property("isPublic").equal(True))
-    where = Filter.all_of(where_filters) if where_filters else None
+    return Filter.all_of(where_filters) if where_filters else None
 
-    res = coll.query.near_vector(
-        near_vector=query_vec,
-        filters=where,
-        limit=top_k,
-        return_properties=["content", "originalName", "chunkIndex", "comId", "provNo"],
-    )
 
-    snippets: List[str] = []
+def _hit_score(metadata) -> float:
+    # hybrid는 융합 점수(score), near_vector는 1 - distance. 순위 정보가 없으면 0
+    score = getattr(metadata, "score", None)
+    if score is not None:
+        return float(score)
+    distance = getattr(metadata, "distance", None)
+    return 1.0 - distance if distance is not None else 0.0
+
+
+def _parse_hits(res) -> List[Dict[str, Any]]:
+    hits: List[Dict[str, Any]] = []
     try:
         for obj in res.objects:  # type: ignore[attr-defined]
             props = obj.properties or {}
@@ -177,10 +831,159 @@ def search_prov_chunks(
             idx = props.get("chunkIndex")
             prefix_parts = [p for p in [origin, f"chunk#{idx}" if idx is not None else None] if p]
             prefix = " ".join(prefix_parts)
-            snippet = f"{prefix} {content}".strip() if prefix else content
-            snippets.append(snippet)
+            hits.append({
+                "provNo": props.get("provNo"),
+                "chunkIndex": idx,
+                "articleNo": props.get("articleNo"),
+                "originalName": props.get("originalName"),
+                "content": content,
+                "snippet": f"{prefix} {content}".strip() if prefix else content,
+                "score": _hit_score(obj.metadata),
+            })
     except Exception as e:
         print(f"[WEAVIATE] search parse failed: {e} raw={res}")
         return []
+    return hits
+
+
+_SEARCH_PROPERTIES = ["content", "originalName", "chunkIndex", "comId", "provNo", "articleNo"]
+
+
+def _article_filter(query: str):
+    """
+    질문의 "제N조"(+ "제M장")를 검색 필터 조건으로 바꾼다. 조 번호가 없으면 None.
+    순위 검색(hybrid/near_vector)에 함께 걸어, 여러 규정에 같은 조 번호가 있어도 질문과 가까운 문서의 조가 위로 온다.
+    """
+    if not settings.RAG_ARTICLE_LOOKUP:
+        return None
+    articles, chapters = find_article_refs(query)
+    if not articles:
+        return None
+    where = Filter.by_property("articleNo").contains_any(articles)
+    if chapters:
+        where = where & Filter.by_property("chapterNo").contains_any(chapters)
+    return where
+
+
+def _search_kwargs(query: str, query_vec: List[float], where, top_k: int):
+    kwargs = {
+        "filters": where,
+        "limit": top_k,
+        "return_properties": _SEARCH_PROPERTIES,
+    }
+    if settings.RAG_SEARCH_MODE == "hybrid":
+        kwargs.update(
+            query=query,
+            vector=query_vec,
+            alpha=settings.RAG_HYBRID_ALPHA,
+            query_properties=["content"],
+            return_metadata=MetadataQuery(score=True),
+        )
+    else:
+        kwargs.update(near_vector=query_vec, return_metadata=MetadataQuery(distance=True))
+    return kwargs
+
+
+def _search_filters(com_id: Optional[str], prov_no: Optional[int], query: str) -> List[Any]:
+    """시도할 필터 순서: 조 번호를 건 검색 -> (결과가 없으면) 일반 검색."""
+    base = _search_filter(com_id, prov_no)
+    article = _article_filter(query)
+    return [base & article, base] if article is not None else [base]
+
+
+@_reconnecting
+def search_prov_chunk_hits(
+    query: str,
+    top_k: int = 5,
+    com_id: Optional[str] = None,
+    prov_no: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Vector search over 규약 청크. Returns hits with metadata and score (1 - distance).
+    RAG_SEARCH_MODE=hybrid면 BM25와 벡터 점수를 RAG_HYBRID_ALPHA로 섞는다(score는 융합 점수).
+    질문에 "제N조"가 있으면 해당 조로 좁힌 순위 검색을 먼저 하고, 결과가 없으면 전체에서 검색한다.
+    """
+    if settings.WEAVIATE_MULTI_TENANCY and not com_id:
+        print("[WEAVIATE] multi-tenancy search without comId, skipped")
+        return []
+    coll = _collection(get_client(), com_id)
+    if coll is None:
+        return []
+
+    query_vec = embed_chunks([query])[0].tolist()
+    hits: List[Dict[str, Any]] = []
+    for where in _search_filters(com_id, prov_no, query):
+        kwargs = _search_kwargs(query, query_vec, where, top_k)
+        if settings.RAG_SEARCH_MODE == "hybrid":
+            res = coll.query.hybrid(**kwargs)
+        else:
+            res = coll.query.near_vector(**kwargs)
+        hits = _parse_hits(res)
+        if hits:
+            break
+    return hits
+
+
+async def _async_collection(com_id: Optional[str]):
+    client = await get_async_client()
+    key = tenant_name(com_id) if settings.WEAVIATE_MULTI_TENANCY else ""
+    coll = _async_handles.get(key)
+    if coll is None:
+        coll = client.collections.get(COLLECTION_NAME)
+        if key:
+            coll = coll.with_tenant(key)
+        _async_handles[key] = coll
+    return coll
+
+
+async def asearch_prov_chunk_hits(
+    query: str,
+    top_k: int = 5,
+    com_id: Optional[str] = None,
+    prov_no: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    search_prov_chunk_hits의 asyncio 버전 (챗봇 파이프라인용).
+    스키마는 시작 시 bootstrap_weaviate에서 확인하므로 여기서는 조회하지 않는다.
+    """
+    if settings.WEAVIATE_MULTI_TENANCY and not com_id:
+        print("[WEAVIATE] multi-tenancy search without comId, skipped")
+        return []
+
+    query_vec = (await aembed_query(query)).tolist()
+    filters = _search_filters(com_id, prov_no, query)
+    for attempt in range(2):
+        coll = await _async_collection(com_id)
+        try:
+            hits: List[Dict[str, Any]] = []
+            with observe_stage("chatbot", "vector_search"):
+                for where in filters:
+                    kwargs = _search_kwargs(query, query_vec, where, top_k)
+                    if settings.RAG_SEARCH_MODE == "hybrid":
+                        res = await coll.query.hybrid(**kwargs)
+                    else:
+                        res = await coll.query.near_vector(**kwargs)
+                    hits = _parse_hits(res)
+                    if hits:
+                        break
+                    if len(filters) > 1 and where is filters[0]:
+                        print(f"[RAG] no chunks indexed for article in query={query!r}, searching all")
+            return hits
+        except _DISCONNECT_ERRORS as e:
+            if attempt:
+                raise
+            print(f"[WEAVIATE] async search connection error, reconnecting: {e}")
+            await close_async_client()
+    return []
 
-    return snippets
+
+def search_prov_chunks(
+    query: str,
+    top_k: int = 5,
+    com_id: Optional[str] = None,
+    prov_no: Optional[int] = None,
+) -> List[str]:
+    """
+    Vector search over 규약 청크. Returns top chunks' content text.
+    """
+    return [h["snippet"] for h in search_prov_chunk_hits(query, top_k, com_id, prov_no)]
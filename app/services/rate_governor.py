@@ -0,0 +1,327 @@
+import asyncio
+import itertools
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from openai import RateLimitError
+
+from app.core.config import settings
+from app.services.tokens import count_tokens
+from app.services.tracing import span
+
+# 우선순위 (작을수록 먼저). 대기 시간이 길어지면 LLM_PRIORITY_AGING_S마다 한 단계씩 올라간다.
+PRIORITY_INTERACTIVE = 0  # 챗봇 응답 경로
+PRIORITY_NORMAL = 1  # 회의록 요약, 대화 요약 등
+PRIORITY_BULK = 2  # 규정 문서 대량 임베딩
+
+_WINDOW_S = 60.0
+_DEFAULT_OUTPUT_TOKENS = 512  # max_tokens가 없을 때 응답 토큰 추정치
+_MESSAGE_OVERHEAD = 4
+
+_tenant: ContextVar[str] = ContextVar("llm_tenant", default="-")
+
+
+def set_tenant(com_id: Optional[str]):
+    """
+    이후 같은 컨텍스트(요청/워커)에서 나가는 OpenAI 호출을 com_id 몫으로 집계한다.
+    """
+    return _tenant.set(str(com_id) if com_id else "-")
+
+
+def estimate_chat_tokens(messages: Iterable[Dict[str, Any]], model: str, max_tokens: Optional[int] = None) -> int:
+    prompt = sum(count_tokens(str(m.get("content") or ""), model) + _MESSAGE_OVERHEAD for m in messages)
+    return prompt + (max_tokens or _DEFAULT_OUTPUT_TOKENS)
+
+
+def estimate_embedding_tokens(texts: Iterable[str], model: str) -> int:
+    return sum(count_tokens(t, model) for t in texts)
+
+
+class _Bucket:
+    """모델별 TPM/RPM 토큰 버킷. 분당 한도만큼 채워지고 초당 limit/60씩 회복한다."""
+
+    def __init__(self, model: str, tpm: int, rpm: int):
+        self.model = model
+        self.tpm = tpm
+        self.rpm = rpm
+        self.tokens = float(tpm)
+        self.requests = float(rpm)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.in_flight = 0
+        self.usage: Deque[Tuple[float, int, int]] = deque()  # (시각, 토큰, 요청 수) 최근 1분
+        self.waits = 0
+        self.wait_s_total = 0.0
+        self.rate_limited = 0
+
+    def refill(self, now: float):
+        dt = now - self.updated
+        self.updated = now
+        if self.tpm:
+            self.tokens = min(float(self.tpm), self.tokens + dt * self.tpm / _WINDOW_S)
+        if self.rpm:
+            self.requests = min(float(self.rpm), self.requests + dt * self.rpm / _WINDOW_S)
+        while self.usage and now - self.usage[0][0] > _WINDOW_S:
+            self.usage.popleft()
+
+    def wait_for(self, estimate: int, now: float) -> float:
+        """estimate 토큰 요청이 통과하기까지 남은 시간(초). 0이면 즉시 가능."""
+        wait = max(self.blocked_until - now, 0.0)
+        if self.tpm:
+            need = min(estimate, self.tpm) - self.tokens  # 한도보다 큰 요청도 가득 찬 버킷이면 통과
+            if need > 0:
+                wait = max(wait, need * _WINDOW_S / self.tpm)
+        if self.rpm and self.requests < 1:
+            wait = max(wait, (1 - self.requests) * _WINDOW_S / self.rpm)
+        return wait
+
+    def used_last_minute(self) -> Tuple[int, int]:
+        return sum(u[1] for u in self.usage), sum(u[2] for u in self.usage)
+
+
+class _Waiter:
+    __slots__ = ("model", "estimate", "priority", "tenant", "seq", "enqueued")
+
+    def __init__(self, model: str, estimate: int, priority: int, tenant: str, seq: int):
+        self.model = model
+        self.estimate = estimate
+        self.priority = priority
+        self.tenant = tenant
+        self.seq = seq
+        self.enqueued = time.monotonic()
+
+
+class LlmTicket:
+    """승인된 호출 1건. settle()로 실제 사용량을 반영한다 (호출하지 않으면 추정치 유지)."""
+
+    def __init__(self, model: str, estimate: int, tenant: str, priority: int):
+        self.model = model
+        self.estimate = estimate
+        self.tenant = tenant
+        self.priority = priority
+        self.actual: Optional[int] = None
+
+    def settle(self, usage: Any):
+        if self.actual is not None or usage is None:
+            return
+        actual = usage if isinstance(usage, int) else getattr(usage, "total_tokens", None)
+        if actual is None:
+            return
+        self.actual = int(actual)
+        _settle(self, self.actual - self.estimate)
+
+
+_cond = threading.Condition()
+_buckets: Dict[str, _Bucket] = {}
+_waiters: List[_Waiter] = []
+_tenant_usage: Dict[str, Deque[Tuple[float, int]]] = defaultdict(deque)
+_seq = itertools.count()
+
+
+def _bucket(model: str) -> _Bucket:
+    b = _buckets.get(model)
+    if b is None:
+        limits = settings.LLM_RATE_LIMITS.get(model, {})
+        b = _buckets[model] = _Bucket(
+            model,
+            int(limits.get("tpm", settings.LLM_DEFAULT_TPM)),
+            int(limits.get("rpm", settings.LLM_DEFAULT_RPM)),
+        )
+    return b
+
+
+def _tenant_tokens(tenant: str, now: float) -> int:
+    q = _tenant_usage[tenant]
+    while q and now - q[0][0] > _WINDOW_S:
+        q.popleft()
+    return sum(t for _, t in q)
+
+
+def _rank(w: _Waiter, now: float) -> Tuple[float, int, int]:
+    aging = settings.LLM_PRIORITY_AGING_S
+    priority = w.priority - ((now - w.enqueued) / aging if aging > 0 else 0.0)
+    # 같은 우선순위 안에서는 최근 1분 사용량이 적은 회사가 먼저
+    return (round(priority), _tenant_tokens(w.tenant, now), w.seq)
+
+
+def _try_admit(w: _Waiter) -> Tuple[Optional[LlmTicket], float]:
+    """_cond를 잡은 상태에서 호출. (승인 티켓, 다음 확인까지 대기 초)"""
+    now = time.monotonic()
+    b = _bucket(w.model)
+    b.refill(now)
+    head = min((x for x in _waiters if x.model == w.model), key=lambda x: _rank(x, now))
+    if head is not w:
+        return None, 0.05
+    if settings.LLM_MAX_CONCURRENCY and b.in_flight >= settings.LLM_MAX_CONCURRENCY:
+        return None, 0.05
+    wait = b.wait_for(w.estimate, now)
+    if wait > 0:
+        return None, wait
+
+    b.tokens -= w.estimate
+    b.requests -= 1
+    b.in_flight += 1
+    b.usage.append((now, w.estimate, 1))
+    _tenant_usage[w.tenant].append((now, w.estimate))
+    _waiters.remove(w)
+    waited = now - w.enqueued
+    if waited > 0.01:
+        b.waits += 1
+        b.wait_s_total += waited
+    return LlmTicket(w.model, w.estimate, w.tenant, w.priority), 0.0
+
+
+def _enqueue(model: str, estimate: int, priority: int) -> _Waiter:
+    w = _Waiter(model, max(int(estimate), 0), priority, _tenant.get(), next(_seq))
+    with _cond:
+        _waiters.append(w)
+    return w
+
+
+def _abandon(w: _Waiter):
+    with _cond:
+        if w in _waiters:
+            _waiters.remove(w)
+        _cond.notify_all()
+
+
+def _timeout_error(w: _Waiter) -> RuntimeError:
+    return RuntimeError(f"LLM 호출 대기 시간 초과: model={w.model} tenant={w.tenant}")
+
+
+def _settle(ticket: LlmTicket, delta: int):
+    if not delta:
+        return
+    now = time.monotonic()
+    with _cond:
+        b = _bucket(ticket.model)
+        b.refill(now)
+        b.tokens -= delta
+        b.usage.append((now, delta, 0))
+        _tenant_usage[ticket.tenant].append((now, delta))
+        _cond.notify_all()
+
+
+def _release(ticket: LlmTicket, error: Optional[BaseException]):
+    with _cond:
+        b = _bucket(ticket.model)
+        b.in_flight = max(b.in_flight - 1, 0)
+        if isinstance(error, RateLimitError):
+            # 서버가 429를 돌려주면 추정이 틀렸다는 뜻이므로 버킷을 비우고 잠시 막는다
+            retry_after = _retry_after(error)
+            b.rate_limited += 1
+            b.tokens = min(b.tokens, 0.0)
+            b.blocked_until = max(b.blocked_until, time.monotonic() + retry_after)
+            print(f"[LLM GOVERNOR] 429 model={ticket.model} tenant={ticket.tenant} pause={retry_after:.1f}s")
+        _cond.notify_all()
+
+
+def _retry_after(error: RateLimitError) -> float:
+    try:
+        value = error.response.headers.get("retry-after")
+        return max(float(value), 0.0) if value else 1.0
+    except Exception:
+        return 1.0
+
+
+def acquire(model: str, estimate: int, priority: int = PRIORITY_NORMAL) -> LlmTicket:
+    """동기 호출용(스레드풀 워커). 한도가 생길 때까지 블로킹한다."""
+    if not settings.LLM_GOVERNOR_ENABLED:
+        return LlmTicket(model, estimate, _tenant.get(), priority)
+    w = _enqueue(model, estimate, priority)
+    deadline = time.monotonic() + settings.LLM_QUEUE_TIMEOUT_S
+    with _cond:
+        while True:
+            ticket, wait = _try_admit(w)
+            if ticket:
+                return ticket
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                _waiters.remove(w)
+                _cond.notify_all()
+                raise _timeout_error(w)
+            _cond.wait(timeout=min(wait, remaining, 1.0))
+
+
+async def acquire_async(model: str, estimate: int, priority: int = PRIORITY_INTERACTIVE) -> LlmTicket:
+    """asyncio 호출용. 이벤트 루프를 막지 않도록 짧게 잠들며 차례를 기다린다."""
+    if not settings.LLM_GOVERNOR_ENABLED:
+        return LlmTicket(model, estimate, _tenant.get(), priority)
+    w = _enqueue(model, estimate, priority)
+    deadline = time.monotonic() + settings.LLM_QUEUE_TIMEOUT_S
+    try:
+        while True:
+            with _cond:
+                ticket, wait = _try_admit(w)
+            if ticket:
+                return ticket
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise _timeout_error(w)
+            await asyncio.sleep(min(wait, remaining, 0.25))
+    except BaseException:
+        _abandon(w)
+        raise
+
+
+@contextmanager
+def llm_slot(model: str, estimate: int, priority: int = PRIORITY_NORMAL) -> Iterator[LlmTicket]:
+    with span("llm_queue", model=model, estimate=estimate):
+        ticket = acquire(model, estimate, priority)
+    try:
+        yield ticket
+    except BaseException as e:
+        _release(ticket, e)
+        raise
+    _release(ticket, None)
+
+
+@asynccontextmanager
+async def allm_slot(model: str, estimate: int, priority: int = PRIORITY_INTERACTIVE) -> AsyncIterator[LlmTicket]:
+    with span("llm_queue", model=model, estimate=estimate):
+        ticket = await acquire_async(model, estimate, priority)
+    try:
+        yield ticket
+    except BaseException as e:
+        _release(ticket, e)
+        raise
+    _release(ticket, None)
+
+
+def governor_status() -> Dict[str, Any]:
+    """모델별 최근 1분 사용률/대기열과 회사별 사용량."""
+    now = time.monotonic()
+    with _cond:
+        models = {}
+        for name, b in _buckets.items():
+            b.refill(now)
+            tokens, requests = b.used_last_minute()
+            queued: Dict[int, int] = defaultdict(int)
+            for w in _waiters:
+                if w.model == name:
+                    queued[w.priority] += 1
+            models[name] = {
+                "tpm": b.tpm,
+                "rpm": b.rpm,
+                "tokensLastMinute": tokens,
+                "requestsLastMinute": requests,
+                "tpmUtilisation": round(tokens / b.tpm, 3) if b.tpm else None,
+                "rpmUtilisation": round(requests / b.rpm, 3) if b.rpm else None,
+                "tokensAvailable": int(b.tokens),
+                "inFlight": b.in_flight,
+                "queued": dict(queued),
+                "throttledCalls": b.waits,
+                "avgWaitMs": round(b.wait_s_total / b.waits * 1000, 1) if b.waits else 0.0,
+                "rateLimited": b.rate_limited,
+                "pausedForS": round(max(b.blocked_until - now, 0.0), 2),
+            }
+        tenants = {t: _tenant_tokens(t, now) for t in list(_tenant_usage)}
+    return {
+        "enabled": settings.LLM_GOVERNOR_ENABLED,
+        "models": models,
+        "tenantsTokensLastMinute": {t: v for t, v in tenants.items() if v},
+    }
@@ -0,0 +1,84 @@
+from functools import lru_cache
+from typing import List, Optional
+
+_FALLBACK_ENCODING = "o200k_base"
+
+
+@lru_cache(maxsize=8)
+def _encoding(model: str):
+    """
+    모델별 tiktoken 인코더. tiktoken 미설치/BPE 파일 다운로드 실패 시 None (근사치로 대체).
+    """
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        pass
+    except Exception as e:
+        print(f"[TOKENS] encoder load failed for {model}: {e}")
+        return None
+    try:
+        return tiktoken.get_encoding(_FALLBACK_ENCODING)
+    except Exception as e:
+        print(f"[TOKENS] encoder load failed for {_FALLBACK_ENCODING}: {e}")
+        return None
+
+
+def _approx_tokens(text: str) -> int:
+    # 인코더가 없을 때의 상한 근사: 한글 등 비ASCII는 cl100k/o200k에서 글자당 1토큰 이상인 경우가 많아 1자=1토큰,
+    # ASCII(영문/숫자/공백)는 4자당 1토큰으로 센다. 예산/레이트 리밋 추정이 실제보다 작아지지 않도록 넉넉하게 잡는다.
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return (len(text) - ascii_chars) + (ascii_chars + 3) // 4
+
+
+def _approx_prefix_len(text: str, max_tokens: int) -> int:
+    """_approx_tokens 기준으로 max_tokens를 넘지 않는 가장 긴 앞부분의 글자 수."""
+    non_ascii = ascii_chars = 0
+    for i, ch in enumerate(text):
+        if ord(ch) < 128:
+            ascii_chars += 1
+        else:
+            non_ascii += 1
+        if non_ascii + (ascii_chars + 3) // 4 > max_tokens:
+            return i
+    return len(text)
+
+
+def count_tokens(text: Optional[str], model: str) -> int:
+    if not text:
+        return 0
+    enc = _encoding(model)
+    if enc is None:
+        return _approx_tokens(text)
+    return len(enc.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: str) -> str:
+    if max_tokens <= 0 or not text:
+        return ""
+    enc = _encoding(model)
+    if enc is None:
+        return text[: _approx_prefix_len(text, max_tokens)]
+    ids = enc.encode(text, disallowed_special=())
+    if len(ids) <= max_tokens:
+        return text
+    return enc.decode(ids[:max_tokens])
+
+
+def split_by_tokens(text: str, max_tokens: int, model: str) -> List[str]:
+    """max_tokens 이하 조각으로 나눈다. 인코더가 없으면 _approx_tokens 근사로 자른다."""
+    if max_tokens <= 0 or not text:
+        return []
+    enc = _encoding(model)
+    if enc is None:
+        pieces = []
+        while text:
+            cut = max(_approx_prefix_len(text, max_tokens), 1)
+            pieces.append(text[:cut])
+            text = text[cut:]
+        return pieces
+    ids = enc.encode(text, disallowed_special=())
+    return [enc.decode(ids[i:i + max_tokens]) for i in range(0, len(ids), max_tokens)]
@@ -0,0 +1,262 @@
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+
+import httpx
+
+from app.core.config import settings
+
+_SERVICE_NAME = "meeting-ai"
+
+
+class _Span:
+    __slots__ = ("span_id", "parent_id", "name", "attrs", "start_ns", "end_ns", "error", "thread")
+
+    def __init__(self, name: str, parent_id: Optional[str], attrs: Dict[str, Any]):
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.name = name
+        self.attrs = attrs
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.error: Optional[str] = None
+        self.thread = threading.current_thread().name
+
+
+class _Trace:
+    def __init__(self, kind: str, key: str):
+        # 실행마다 새 trace id (같은 provNo/meetNo 재실행끼리 덮어쓰지 않도록).
+        # messageId/meetNo/provNo는 key로 남기고, _find는 key로도 가장 최근 실행을 찾는다
+        self.trace_id = uuid.uuid4().hex
+        self.kind = kind
+        self.key = key
+        self.spans: List[_Span] = []
+        self.lock = threading.Lock()
+
+    def add(self, span: _Span):
+        with self.lock:
+            self.spans.append(span)
+
+
+_trace: ContextVar[Optional[_Trace]] = ContextVar("trace", default=None)
+_current_span: ContextVar[Optional[str]] = ContextVar("trace_span", default=None)
+
+_recent_lock = threading.Lock()
+_recent: "OrderedDict[str, _Trace]" = OrderedDict()
+
+_exports: "queue.Queue[_Trace]" = queue.Queue(maxsize=1000)
+_exporter: Optional[threading.Thread] = None
+_exporter_lock = threading.Lock()
+
+
+def current_trace_id() -> Optional[str]:
+    trace = _trace.get()
+    return trace.trace_id if trace else None
+
+
+@contextmanager
+def span(name: str, /, **attrs: Any) -> Iterator[None]:
+    """
+    현재 trace에 하위 span을 연다. trace 밖에서 호출되면 아무것도 하지 않는다.
+    asyncio 태스크는 생성 시점 컨텍스트를 물려받으므로 gather로 나뉜 작업도 같은 부모 아래 기록된다.
+    """
+    trace = _trace.get()
+    if trace is None or not settings.TRACE_ENABLED:
+        yield
+        return
+    s = _Span(name, _current_span.get(), {k: v for k, v in attrs.items() if v is not None})
+    token = _current_span.set(s.span_id)
+    try:
+        yield
+    except BaseException as e:
+        s.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        s.end_ns = time.time_ns()
+        _current_span.reset(token)
+        trace.add(s)
+
+
+@contextmanager
+def start_trace(kind: str, key: Any, /, **attrs: Any) -> Iterator[str]:
+    """
+    요청 1건(챗봇 messageId, 회의 meetNo, 규정 provNo)의 trace를 시작한다. 종료 시 내보낸다.
+    """
+    trace = _Trace(kind, str(key))
+    token = _trace.set(trace)
+    span_token = _current_span.set(None)
+    try:
+        with span(kind, **{"key": str(key), **attrs}):
+            yield trace.trace_id
+    finally:
+        _current_span.reset(span_token)
+        _trace.reset(token)
+        if settings.TRACE_ENABLED:
+            _finish(trace)
+
+
+def _finish(trace: _Trace):
+    with _recent_lock:
+        _recent[trace.trace_id] = trace
+        _recent.move_to_end(trace.trace_id)
+        while len(_recent) > settings.TRACE_KEEP:
+            _recent.popitem(last=False)
+    if settings.TRACE_JSONL_PATH or settings.TRACE_OTLP_ENDPOINT:
+        _ensure_exporter()
+        try:
+            _exports.put_nowait(trace)
+        except queue.Full:
+            print(f"[TRACE] export queue full, dropped trace={trace.trace_id}")
+
+
+def _ensure_exporter():
+    global _exporter
+    with _exporter_lock:
+        if _exporter is None or not _exporter.is_alive():
+            _exporter = threading.Thread(target=_export_loop, name="trace-exporter", daemon=True)
+            _exporter.start()
+
+
+def _export_loop():
+    # 요청 처리 경로(특히 이벤트 루프)를 막지 않도록 파일/네트워크 내보내기는 전용 스레드에서 한다
+    while True:
+        trace = _exports.get()
+        if settings.TRACE_JSONL_PATH:
+            try:
+                _write_jsonl(trace)
+            except Exception as e:
+                print(f"[TRACE] jsonl export failed: {e}")
+        if settings.TRACE_OTLP_ENDPOINT:
+            try:
+                httpx.post(settings.TRACE_OTLP_ENDPOINT, json=_to_otlp(trace), timeout=5.0).raise_for_status()
+            except Exception as e:
+                print(f"[TRACE] otlp export failed: {e}")
+
+
+def _span_dict(trace: _Trace, s: _Span) -> Dict[str, Any]:
+    return {
+        "traceId": trace.trace_id,
+        "spanId": s.span_id,
+        "parentSpanId": s.parent_id,
+        "name": s.name,
+        "startNs": s.start_ns,
+        "endNs": s.end_ns,
+        "durationMs": round(((s.end_ns or s.start_ns) - s.start_ns) / 1e6, 3),
+        "thread": s.thread,
+        "error": s.error,
+        "attributes": s.attrs,
+    }
+
+
+def _write_jsonl(trace: _Trace):
+    path = settings.TRACE_JSONL_PATH
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with trace.lock:
+        lines = [json.dumps(_span_dict(trace, s), ensure_ascii=False, default=str) for s in trace.spans]
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def _otlp_value(v: Any) -> Dict[str, Any]:
+    if isinstance(v, bool):
+        return {"boolValue": v}
+    if isinstance(v, int):
+        return {"intValue": str(v)}
+    if isinstance(v, float):
+        return {"doubleValue": v}
+    return {"stringValue": str(v)}
+
+
+def _to_otlp(trace: _Trace) -> Dict[str, Any]:
+    """OTLP/HTTP JSON (ExportTraceServiceRequest) 형식. 로컬 OpenTelemetry Collector의 /v1/traces로 보낸다."""
+    spans = []
+    with trace.lock:
+        for s in trace.spans:
+            item = {
+                "traceId": trace.trace_id,
+                "spanId": s.span_id,
+                "name": s.name,
+                "kind": 1,
+                "startTimeUnixNano": str(s.start_ns),
+                "endTimeUnixNano": str(s.end_ns or s.start_ns),
+                "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in {**s.attrs, "thread.name": s.thread}.items()],
+                "status": {"code": 2, "message": s.error} if s.error else {"code": 1},
+            }
+            if s.parent_id:
+                item["parentSpanId"] = s.parent_id
+            spans.append(item)
+    return {
+        "resourceSpans": [
+            {
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": _SERVICE_NAME}}]},
+                "scopeSpans": [{"scope": {"name": "app.services.tracing"}, "spans": spans}],
+            }
+        ]
+    }
+
+
+def _find(trace_ref: str) -> Optional[_Trace]:
+    with _recent_lock:
+        if trace_ref in _recent:
+            return _recent[trace_ref]
+        for trace in reversed(_recent.values()):
+            if trace.key == trace_ref:
+                return trace
+    return None
+
+
+def recent_traces(limit: int = 50) -> List[Dict[str, Any]]:
+    with _recent_lock:
+        traces = list(_recent.values())[-limit:]
+    out = []
+    for t in reversed(traces):
+        root = next((s for s in t.spans if s.parent_id is None), None)
+        out.append(
+            {
+                "traceId": t.trace_id,
+                "kind": t.kind,
+                "key": t.key,
+                "spans": len(t.spans),
+                "durationMs": _span_dict(t, root)["durationMs"] if root else None,
+            }
+        )
+    return out
+
+
+def trace_waterfall(trace_ref: str) -> Optional[Dict[str, Any]]:
+    """
+    trace id 또는 messageId/meetNo/provNo로 찾은 trace를 시작 시각 순 waterfall로 돌려준다.
+    offsetMs는 루트 span 시작 기준, depth는 부모-자식 깊이.
+    """
+    trace = _find(trace_ref)
+    if trace is None:
+        return None
+    with trace.lock:
+        spans = sorted(trace.spans, key=lambda s: s.start_ns)
+    if not spans:
+        return {"traceId": trace.trace_id, "spans": [], "text": ""}
+    origin = spans[0].start_ns
+    total = max((s.end_ns or s.start_ns) for s in spans) - origin or 1
+    depth: Dict[str, int] = {}
+    rows = []
+    lines = []
+    width = 40
+    for s in spans:
+        d = depth[s.span_id] = depth.get(s.parent_id, -1) + 1 if s.parent_id else 0
+        item = _span_dict(trace, s)
+        item["offsetMs"] = round((s.start_ns - origin) / 1e6, 3)
+        item["depth"] = d
+        rows.append(item)
+        begin = int((s.start_ns - origin) / total * width)
+        length = max(int(((s.end_ns or s.start_ns) - s.start_ns) / total * width), 1)
+        bar = " " * begin + "█" * min(length, width - begin)
+        label = ("  " * d + s.name)[:32]
+        lines.append(f"{label:<32} |{bar:<{width}}| {item['offsetMs']:>9.1f}ms +{item['durationMs']:.1f}ms" + (" !" if s.error else ""))
+    return {"traceId": trace.trace_id, "kind": trace.kind, "key": trace.key, "spans": rows, "text": "\n".join(lines)}
@@ -6,11 +6,20 @@ from app.schemas import RunRequest
 from app.services.meetings.ai import gpt_summarize, whisper_transcribe
 from app.services.meetings.audio import download_audio, split_audio
 from app.services.callbacks import callback_to_spring, format_callback_url
+from app.services.metrics import observe_stage
+from app.services.rate_governor import set_tenant
 from app.services.storage import presign_get_url
+from app.services.tracing import start_trace
 
 
 def process_job(req: RunRequest):
+    with start_trace("meetings", req.meetNo, objectKey=req.objectKey):
+        _process_job(req)
+
+
+def _process_job(req: RunRequest):
     print("=== JOB START ===", req.meetNo, req.objectKey)
+    set_tenant(req.comId)
     meet_no = req.meetNo
     object_key = req.objectKey
 
@@ -29,24 +38,28 @@ def process_job(req: RunRequest):
             chunks_dir = td_path / "chunks"
 
             download_url = req.downloadUrl or presign_get_url(object_key)
-            download_audio(download_url, audio_path)
+            with observe_stage("meetings", "download"):
+                download_audio(download_url, audio_path)
             print("STEP1 DONE bytes=", audio_path.stat().st_size)
 
             print("STEP2: splitting...")
-            chunks = split_audio(audio_path, chunks_dir, split_seconds)
+            with observe_stage("meetings", "split"):
+                chunks = split_audio(audio_path, chunks_dir, split_seconds)
             print("STEP2 DONE chunks=", len(chunks))
 
             print("STEP3: whisper...")
             texts = []
             for chunk in chunks:
-                t = whisper_transcribe(chunk, stt_model)
+                with observe_stage("meetings", "stt"):
+                    t = whisper_transcribe(chunk, stt_model)
                 texts.append(t)
 
             transcribed_text = "\n\n".join(texts).strip()
             print("STEP3 DONE stt_len=", len(transcribed_text))
 
             print("STEP4: gpt summarize...")
-            summary = gpt_summarize(transcribed_text, sum_model, meeting_title)
+            with observe_stage("meetings", "summarize"):
+                summary = gpt_summarize(transcribed_text, sum_model, meeting_title)
             print("STEP4 DONE ai_len=", len(summary))
 
             payload = {
@@ -57,7 +70,8 @@ def process_job(req: RunRequest):
                 "aiText": summary,
                 "errorMessage": None,
             }
-            callback_to_spring(cb_url, req.callbackKey, payload)
+            with observe_stage("meetings", "callback"):
+                callback_to_spring(cb_url, req.callbackKey, payload)
 
     except Exception as e:
         print("=== JOB FAIL ===", repr(e))
@@ -6,7 +6,10 @@ from app.schemas import ProvEmbeddingRequest
 from app.services.callbacks import callback_to_spring
 from app.services.provdocuments.documents import chunk_by_article, download_object, extract_text
 from app.services.provdocuments.embeddings import embed_chunks
-from app.services.provdocuments.weaviate_store import store_prov_chunks
+from app.services.provdocuments.weaviate_store import apply_prov_reindex, plan_prov_reindex
+from app.services.metrics import observe_stage
+from app.services.rate_governor import set_tenant
+from app.services.tracing import start_trace
 
 
 def _format_callback_url(raw: str, prov_no: int) -> str:
@@ -26,7 +29,13 @@ def _absolute_callback_url(cb: str) -> str:
 
 
 def process_prov_embedding(req: ProvEmbeddingRequest):
+    with start_trace("prov", req.provNo, comId=req.comId, objectKey=req.objectKey):
+        _process_prov_embedding(req)
+
+
+def _process_prov_embedding(req: ProvEmbeddingRequest):
     prov_no = req.provNo
+    set_tenant(req.comId)
     raw_callback_url = req.callbackUrl
     print(f"[PROV] raw callbackUrl={raw_callback_url}")
     callback_url = _absolute_callback_url(_format_callback_url(raw_callback_url, prov_no))
@@ -43,48 +52,26 @@ def process_prov_embedding(req: ProvEmbeddingRequest):
             file_path = td_path / req.originalName
 
             print(f"[PROV] STEP1 download -> {file_path}")
-            download_object(req.objectKey, file_path)
+            with observe_stage("prov_embedding", "download"):
+                download_object(req.objectKey, file_path)
 
             print(f"[PROV] STEP2 extract text")
-            text = extract_text(file_path, req.contentType)
+            with observe_stage("prov_embedding", "extract"):
+                text = extract_text(file_path, req.contentType)
             print(f"[PROV] extracted chars={len(text)}")
 
             base_title = Path(req.originalName).stem or req.originalName
             print(f"[PROV] STEP3 chunking by article docTitle={base_title}")
-            doc_title, chunks = chunk_by_article(
-                text,
-                base_title,
-                settings.EMBED_CHUNK_WORDS,
-                settings.EMBED_CHUNK_OVERLAP,
-            )
+            with observe_stage("prov_embedding", "chunk"):
+                doc_title, chunks = chunk_by_article(
+                    text,
+                    base_title,
+                    settings.EMBED_CHUNK_WORDS,
+                    settings.EMBED_CHUNK_OVERLAP,
+                )
             print(f"[PROV] chunk count={len(chunks)} docTitle={doc_title}")
 
-            print(f"[PROV] STEP4 embedding start model={settings.EMBED_MODEL}")
-            # 실제 임베딩 (필요시 이 결과를 벡터DB 등에 저장)
-            embs = embed_chunks(chunks)
-            try:
-                print(f"[PROV] embedding done shape={embs.shape} dtype={embs.dtype}")
-                # 첫 번째 벡터 일부 샘플(과도한 로그 방지)
-                first = embs[0][:8].tolist() if len(embs) else []
-                print(f"[PROV] first vector (8 dims) preview={first}")
-            except Exception:
-                print("[PROV] embedding done (shape 확인 실패)")
-
-            # ✅ 회사별 메타를 포함해 벡터 DB 저장
-            try:
-                store_prov_chunks(
-                    com_id=req.comId,
-                    prov_no=prov_no,
-                    object_key=req.objectKey,
-                    original_name=req.originalName,
-                    is_public=req.isPublic,
-                    chunks=chunks,
-                    embeddings=embs,
-                )
-                print(f"[PROV] weaviate stored chunks={len(chunks)} collection={settings.WEAVIATE_COLLECTION}")
-            except Exception as e:
-                print(f"[PROV] weaviate store failed: {e}")
-                raise
+            _reindex(req, chunks)
 
         payload = {
             "provNo": prov_no,
@@ -95,7 +82,8 @@ def process_prov_embedding(req: ProvEmbeddingRequest):
         try:
             key_preview = (callback_key[:3] + "***") if callback_key else "(none)"
             print(f"[PROV] CALLBACK header={settings.CALLBACK_HEADER} key={key_preview} url={callback_url}")
-            callback_to_spring(callback_url, callback_key, payload)
+            with observe_stage("prov_embedding", "callback"):
+                callback_to_spring(callback_url, callback_key, payload)
         except Exception as e:
             print(f"[PROV] callback failed: {e}")
             raise
@@ -111,3 +99,42 @@ def process_prov_embedding(req: ProvEmbeddingRequest):
             callback_to_spring(callback_url, callback_key or "", payload)
         except Exception:
             pass
+
+
+
+def _reindex(req: ProvEmbeddingRequest, chunks):
+    """
+    저장된 청크와 비교해 바뀐 조항만 임베딩하고, 사라진 조항은 삭제한다.
+    PROV_INGEST_MODE=full이면 전체를 다시 임베딩한다.
+    """
+    full = settings.PROV_INGEST_MODE == "full"
+    with observe_stage("prov_embedding", "diff"):
+        plan = plan_prov_reindex(
+            com_id=req.comId,
+            prov_no=req.provNo,
+            object_key=req.objectKey,
+            original_name=req.originalName,
+            is_public=req.isPublic,
+            chunks=chunks,
+            full=full,
+        )
+
+    print(f"[PROV] STEP4 embedding start model={settings.EMBED_MODEL} new={len(plan.new)}/{len(chunks)} full={full}")
+    with observe_stage("prov_embedding", "embed"):
+        embs = embed_chunks([chunks[i] for i in plan.new])
+    try:
+        print(f"[PROV] embedding done shape={embs.shape} dtype={embs.dtype}")
+    except Exception:
+        print("[PROV] embedding done (shape 확인 실패)")
+
+    # ✅ 회사별 메타를 포함해 벡터 DB 저장 (새/변경 청크 반영 후 사라진 청크 삭제)
+    try:
+        with observe_stage("prov_embedding", "store"):
+            written = apply_prov_reindex(plan, embs)
+        print(
+            f"[PROV] weaviate reindexed written={written} unchanged={plan.unchanged} "
+            f"deleted={len(plan.delete)} collection={settings.WEAVIATE_COLLECTION}"
+        )
+    except Exception as e:
+        print(f"[PROV] weaviate store failed: {e}")
+        raise
@@ -0,0 +1,100 @@
+"""
+컬렉션 설정별 검색 품질/지연 벤치마크.
+
+  python bench_weaviate.py --collections ProvDocuments ProvDocumentsPQ --com-id C001 --queries 200 --k 5
+
+첫 컬렉션의 벡터로 정답(필터 적용 후 정확한 코사인 top-k)을 numpy로 계산하고,
+각 컬렉션에 같은 질의를 보내 recall@k와 p50/p99 지연을 출력한다.
+비교할 컬렉션은 migrate_weaviate.py rebuild로 설정만 바꿔 복사해 둔다(uuid가 같아야 recall 계산 가능).
+질의는 저장된 청크 벡터에 작은 잡음을 더해 만든다.
+"""
+import argparse
+import time
+
+import numpy as np
+from weaviate.classes.query import Filter
+
+from app.services.provdocuments.weaviate_store import (
+    COLLECTION_NAME,
+    _default_vector,
+    _search_filter,
+    close_client,
+    get_client,
+)
+
+_WARMUP = 5
+
+
+def _load(coll, com_id):
+    ids, vectors = [], []
+    for obj in coll.iterator(include_vector=True, return_properties=["comId", "isPublic"]):
+        props = obj.properties
+        if not props.get("isPublic") or (com_id and props.get("comId") != com_id):
+            continue
+        ids.append(str(obj.uuid))
+        vectors.append(_default_vector(obj.vector))
+    return ids, np.asarray(vectors, dtype=np.float32)
+
+
+def _queries(vectors: np.ndarray, n: int, noise: float, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    picked = vectors[rng.choice(len(vectors), size=min(n, len(vectors)), replace=False)]
+    queries = picked + rng.normal(0, noise, picked.shape).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    return queries
+
+
+def _ground_truth(ids, vectors: np.ndarray, queries: np.ndarray, k: int):
+    normed = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    scores = queries @ normed.T
+    top = np.argsort(-scores, axis=1)[:, :k]
+    return [{ids[j] for j in row} for row in top]
+
+
+def _run(coll, queries: np.ndarray, truth, k: int, where: Filter):
+    for q in queries[:_WARMUP]:
+        coll.query.near_vector(near_vector=q.tolist(), filters=where, limit=k, return_properties=[])
+    latencies, recalls = [], []
+    for q, expected in zip(queries, truth):
+        started = time.perf_counter()
+        res = coll.query.near_vector(near_vector=q.tolist(), filters=where, limit=k, return_properties=[])
+        latencies.append((time.perf_counter() - started) * 1000)
+        got = {str(o.uuid) for o in res.objects}
+        recalls.append(len(got & expected) / max(len(expected), 1))
+    lat = np.asarray(latencies)
+    return {
+        "recall": float(np.mean(recalls)),
+        "p50": float(np.percentile(lat, 50)),
+        "p99": float(np.percentile(lat, 99)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--collections", nargs="+", default=[COLLECTION_NAME])
+    parser.add_argument("--com-id", default=None)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--noise", type=float, default=0.02)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    client = get_client()
+    try:
+        ids, vectors = _load(client.collections.get(args.collections[0]), args.com_id)
+        if not len(ids):
+            raise RuntimeError("필터 조건에 맞는 벡터가 없습니다.")
+        queries = _queries(vectors, args.queries, args.noise, args.seed)
+        truth = _ground_truth(ids, vectors, queries, args.k)
+        where = _search_filter(args.com_id, None)
+        print(f"[BENCH] objects={len(ids)} dims={vectors.shape[1]} queries={len(queries)} k={args.k} comId={args.com_id}")
+        print(f"{'collection':<28} {'recall@' + str(args.k):>10} {'p50(ms)':>9} {'p99(ms)':>9}")
+        for name in args.collections:
+            r = _run(client.collections.get(name), queries, truth, args.k, where)
+            print(f"{name:<28} {r['recall']:>10.4f} {r['p50']:>9.2f} {r['p99']:>9.2f}")
+    finally:
+        close_client()
+
+
+if __name__ == "__main__":
+    main()
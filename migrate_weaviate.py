@@ -0,0 +1,182 @@
+"""
+ProvDocuments 컬렉션 설정 마이그레이션.
+
+  python migrate_weaviate.py reconfigure
+      기존 컬렉션에 바꿀 수 있는 항목(ef, 필터 전략, PQ/BQ/SQ 압축 활성화)만 현재 설정대로 반영한다.
+
+  python migrate_weaviate.py rebuild --target ProvDocumentsV2 [--swap]
+      속성 인덱스/efConstruction/maxConnections처럼 생성 후 바꿀 수 없는 항목은 새 컬렉션을 만들어
+      uuid와 벡터를 그대로 복사한다. --swap이면 원본을 지우고 원본 이름의 alias가 새 컬렉션을 가리키게 한다
+      (alias 전환 사이 짧은 구간 동안 검색이 비므로 트래픽이 적을 때 실행).
+
+  python migrate_weaviate.py to-tenants --target ProvDocumentsMT [--swap]
+      단일 컬렉션(comId 필터)을 comId별 테넌트 컬렉션으로 복사한다. 완료 후 WEAVIATE_MULTI_TENANCY=true로 전환.
+
+  python migrate_weaviate.py tenants
+  python migrate_weaviate.py tenant-activity --com-id C001 --inactive
+      테넌트 상태 조회 / 활성 상태 변경 (INACTIVE 테넌트는 조회 시 자동으로 다시 활성화된다).
+
+환경 변수(.env)는 서비스와 같은 WEAVIATE_* / EMBED_* 설정을 쓴다.
+"""
+import argparse
+import time
+
+from weaviate.classes.tenants import Tenant, TenantActivityStatus
+
+from app.core.config import settings
+from app.services.provdocuments.weaviate_store import (
+    COLLECTION_NAME,
+    _batch_insert,
+    _default_vector,
+    close_client,
+    create_collection,
+    get_client,
+    set_tenant_activity,
+    tenant_name,
+    tenant_status,
+    vector_index_update,
+)
+
+_PAGE = 1000
+
+
+def reconfigure():
+    client = get_client()
+    coll = client.collections.get(COLLECTION_NAME)
+    coll.config.update(vector_index_config=vector_index_update())
+    config = coll.config.get()
+    print(f"[MIGRATE] reconfigured collection={COLLECTION_NAME} vector_index={config.vector_index_config}")
+
+
+def _count(coll) -> int:
+    return int(coll.aggregate.over_all(total_count=True).total_count or 0)
+
+
+def _swap(client, target: str):
+    client.collections.delete(COLLECTION_NAME)
+    client.alias.create(alias_name=COLLECTION_NAME, target_collection=target)
+    print(f"[MIGRATE] alias {COLLECTION_NAME} -> {target}")
+
+
+def rebuild(target: str, swap: bool):
+    client = get_client()
+    source = client.collections.get(COLLECTION_NAME)
+    if client.collections.exists(target):
+        raise RuntimeError(f"대상 컬렉션이 이미 있습니다: {target}")
+    create_collection(client, target, multi_tenancy=False)
+    dest = client.collections.get(target)
+
+    total = _count(source)
+    copied = 0
+    started = time.perf_counter()
+    page = []
+    # 필터 없는 전체 순회라 after 커서(iterator)를 쓸 수 있다
+    for obj in source.iterator(include_vector=True):
+        page.append({"properties": obj.properties, "vector": _default_vector(obj.vector), "uuid": obj.uuid})
+        if len(page) >= _PAGE:
+            copied += _batch_insert(dest, page)
+            page = []
+            print(f"[MIGRATE] copied {copied}/{total}")
+    if page:
+        copied += _batch_insert(dest, page)
+
+    copied_count = _count(dest)
+    print(f"[MIGRATE] rebuild done source={total} target={copied_count} elapsed={time.perf_counter() - started:.1f}s")
+    if copied_count != total:
+        raise RuntimeError(f"복사 건수 불일치: source={total} target={copied_count}")
+
+    if swap:
+        _swap(client, target)
+    else:
+        print(f"[MIGRATE] WEAVIATE_COLLECTION={target} 로 전환하거나 --swap으로 다시 실행하세요.")
+
+
+def to_tenants(target: str, swap: bool):
+    client = get_client()
+    source = client.collections.get(COLLECTION_NAME)
+    if client.collections.exists(target):
+        raise RuntimeError(f"대상 컬렉션이 이미 있습니다: {target}")
+    create_collection(client, target, multi_tenancy=True)
+    dest = client.collections.get(target)
+
+    total = _count(source)
+    pages = {}  # 테넌트 -> 적재 대기 객체
+    created = set()
+    copied = 0
+    started = time.perf_counter()
+
+    def flush(name):
+        nonlocal copied
+        copied += _batch_insert(dest.with_tenant(name), pages.pop(name))
+        print(f"[MIGRATE] copied {copied}/{total}")
+
+    for obj in source.iterator(include_vector=True):
+        com_id = obj.properties.get("comId")
+        if not com_id:
+            print(f"[MIGRATE] skip object without comId uuid={obj.uuid}")
+            continue
+        name = tenant_name(com_id)
+        if name not in created:
+            if not dest.tenants.exists(name):
+                dest.tenants.create(Tenant(name=name, activity_status=TenantActivityStatus.ACTIVE))
+            created.add(name)
+        pages.setdefault(name, []).append(
+            {"properties": obj.properties, "vector": _default_vector(obj.vector), "uuid": obj.uuid}
+        )
+        if len(pages[name]) >= _PAGE:
+            flush(name)
+    for name in list(pages):
+        flush(name)
+
+    tenants = dest.tenants.get()
+    copied_count = sum(_count(dest.with_tenant(name)) for name in tenants)
+    print(
+        f"[MIGRATE] to-tenants done source={total} target={copied_count} tenants={len(tenants)} "
+        f"elapsed={time.perf_counter() - started:.1f}s"
+    )
+    if copied_count > total:
+        raise RuntimeError(f"복사 건수 불일치: source={total} target={copied_count}")
+    if swap:
+        _swap(client, target)
+    print("[MIGRATE] WEAVIATE_MULTI_TENANCY=true 로 전환하세요.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("reconfigure")
+    rb = sub.add_parser("rebuild")
+    rb.add_argument("--target", required=True)
+    rb.add_argument("--swap", action="store_true")
+    mt = sub.add_parser("to-tenants")
+    mt.add_argument("--target", required=True)
+    mt.add_argument("--swap", action="store_true")
+    sub.add_parser("tenants")
+    ta = sub.add_parser("tenant-activity")
+    ta.add_argument("--com-id", required=True)
+    ta.add_argument("--inactive", action="store_true")
+    args = parser.parse_args()
+
+    print(
+        f"[MIGRATE] url={settings.WEAVIATE_HTTP_URL} collection={COLLECTION_NAME} "
+        f"compression={settings.WEAVIATE_COMPRESSION} ef={settings.WEAVIATE_HNSW_EF} "
+        f"efConstruction={settings.WEAVIATE_HNSW_EF_CONSTRUCTION} maxConnections={settings.WEAVIATE_HNSW_MAX_CONNECTIONS}"
+    )
+    try:
+        if args.command == "reconfigure":
+            reconfigure()
+        elif args.command == "rebuild":
+            rebuild(args.target, args.swap)
+        elif args.command == "to-tenants":
+            to_tenants(args.target, args.swap)
+        elif args.command == "tenants":
+            for name, status in sorted(tenant_status().items()):
+                print(f"{name}\t{status}")
+        else:
+            set_tenant_activity(args.com_id, active=not args.inactive)
+    finally:
+        close_client()
+
+
+if __name__ == "__main__":
+    main()
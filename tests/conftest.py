@@ -0,0 +1,14 @@
+import os
+
+# Settings는 필수 환경 변수가 없으면 import 시점에 실패하므로 테스트용 더미 값을 채운다
+for key, value in {
+    "OPENAI_API_KEY": "test",
+    "AWS_ACCESS_KEY": "test",
+    "AWS_SECRET_KEY": "test",
+    "AWS_REGION": "ap-northeast-2",
+    "AWS_BUCKET": "test",
+    "CALLBACK_HEADER": "X-CALLBACK-SECRET",
+    "CALLBACK_KEY": "test",
+    "EMP_DB_DSN": "sqlite:///:memory:",
+}.items():
+    os.environ.setdefault(key, value)
@@ -0,0 +1,30 @@
+import pytest
+
+from app.services.chatbot.agent_synthesizer import _match_action_rule
+
+
+@pytest.mark.parametrize(
+    "question",
+    [
+        "회의실 예약 규정이 뭐야",
+        "홍길동 이메일 주소",
+        "메일",
+        "결재 라인은 누가 정해?",
+        "예약 일정 보여줘",  # 두 액션이 동시에 걸리면 LLM에 맡긴다
+    ],
+)
+def test_unclear_questions_fall_back_to_llm(question):
+    assert _match_action_rule(question) is None
+
+
+@pytest.mark.parametrize(
+    "question, action_id",
+    [
+        ("메일 작성하고 싶어", "NAV_MAIL_COMPOSE"),
+        ("내 예약 내역 보여줘", "NAV_MY_RESERVATIONS"),
+        ("오늘 스케줄 뭐야", "NAV_TODAY_SCHEDULE"),
+        ("휴가 기안 올리려고", "NAV_APPROVAL_DRAFT"),
+    ],
+)
+def test_intent_phrases_pick_action(question, action_id):
+    assert _match_action_rule(question) == {"actionId": action_id, "params": {}}
@@ -0,0 +1,54 @@
+import asyncio
+
+import pytest
+
+from app.services.chatbot import agent_tools
+from app.services.chatbot.agent_tools import RDB_QUERIES, RdbQuery, _check_static
+
+
+def test_catalog_queries_are_company_scoped():
+    for q in RDB_QUERIES.values():
+        _check_static(q)
+        assert "com_id = :com_id" in q.sql, q.name
+
+
+def test_check_static_rejects_query_without_com_id():
+    q = RdbQuery(
+        name="leaky",
+        description="",
+        sql="SELECT title FROM mail WHERE emp_id = :emp_id",
+        columns={"mail": ["emp_id", "title"]},
+    )
+    with pytest.raises(RuntimeError):
+        _check_static(q)
+
+
+def test_check_static_rejects_select_star_on_personal_table():
+    q = RdbQuery(
+        name="star",
+        description="",
+        sql="SELECT * FROM todo_list WHERE com_id = :com_id AND emp_id = :emp_id",
+        columns={"todo_list": ["com_id", "emp_id"]},
+    )
+    with pytest.raises(RuntimeError):
+        _check_static(q)
+
+
+def test_run_rdb_query_binds_com_id(monkeypatch):
+    calls = []
+
+    async def fake_select(sql, params, guard=True):
+        calls.append((sql, params))
+        return []
+
+    async def loaded():
+        return True
+
+    monkeypatch.setattr(agent_tools, "ensure_schema_catalog", loaded)
+    monkeypatch.setattr(agent_tools, "available_rdb_queries", lambda: RDB_QUERIES)
+    monkeypatch.setattr(agent_tools, "execute_select", fake_select)
+    asyncio.run(agent_tools.run_rdb_query("my_unread_mail", {}, "c1", "e1"))
+
+    sql, params = calls[0]
+    assert "com_id = :com_id" in sql
+    assert params["com_id"] == "c1" and params["emp_id"] == "e1"
@@ -0,0 +1,32 @@
+import asyncio
+
+from app.services.chatbot import chatbot_service
+
+
+def test_shutdown_waits_for_cancelled_requests(monkeypatch):
+    cleaned = []
+
+    async def fake_run(req):
+        try:
+            await asyncio.sleep(10)
+        finally:
+            await asyncio.sleep(0.01)  # 취소 후 정리 작업 (콜백/커넥션 반환)
+            cleaned.append(req.messageId)
+
+    monkeypatch.setattr(chatbot_service, "run_chatbot", fake_run)
+
+    class Req:
+        messageId = "m1"
+        sessionId = None
+
+    async def scenario():
+        chatbot_service.start_chatbot(Req())
+        await asyncio.sleep(0)
+        await chatbot_service.cancel_all_chatbots()
+        return list(cleaned)
+
+    assert asyncio.run(scenario()) == ["m1"]
+
+
+def test_cancel_unknown_message_returns_false():
+    assert chatbot_service.cancel_chatbot("missing") is False
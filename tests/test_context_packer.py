@@ -0,0 +1,29 @@
+from app.services.chatbot.context_packer import dedupe_hits, pack_context
+
+
+def _hits(n):
+    return [
+        {"provNo": 1, "chunkIndex": i, "score": 1.0 - i / 100, "content": f"조항 {i} " + "내용 " * 20}
+        for i in range(n)
+    ]
+
+
+def test_history_shares_the_context_budget():
+    _, without_history = pack_context(_hits(20), "", "", budget_tokens=400)
+    _, with_history = pack_context(_hits(20), "", "이전 대화 " * 150, budget_tokens=400)
+    assert len(with_history.splitlines()) < len(without_history.splitlines())
+
+
+def test_db_text_is_capped_at_half_of_remaining_budget():
+    db_text, _ = pack_context([], "행 " * 1000, "", budget_tokens=200)
+    assert len(db_text) < len("행 " * 1000)
+
+
+def test_dedupe_drops_same_chunk_and_near_duplicates():
+    hits = [
+        {"provNo": 1, "chunkIndex": 0, "score": 0.5, "content": "제1조 목적 이 규정은 휴가를 정한다"},
+        {"provNo": 1, "chunkIndex": 0, "score": 0.9, "content": "제1조 목적 이 규정은 휴가를 정한다"},
+        {"provNo": 2, "chunkIndex": 3, "score": 0.7, "content": "제1조 목적 이 규정은 휴가를 정한다"},
+    ]
+    kept = dedupe_hits(hits, threshold=0.9)
+    assert len(kept) == 1 and kept[0]["score"] == 0.9
@@ -0,0 +1,12 @@
+from app.services.provdocuments.documents import chunk_article_numbers, chunk_by_article, find_article_refs
+
+
+def test_find_article_refs():
+    assert find_article_refs("제2장 제 12조 연차는?") == ([12], [2])
+    assert find_article_refs("연차 규정 알려줘") == ([], [])
+
+
+def test_chunks_carry_article_and_chapter_numbers():
+    text = "취업규칙\n제1장 총칙\n제1조(목적) 이 규칙은 근로조건을 정한다.\n제2조(적용) 모든 직원에게 적용한다.\n"
+    _, chunks = chunk_by_article(text, "취업규칙", 200, 20)
+    assert [chunk_article_numbers(c) for c in chunks] == [(1, 1), (2, 1)]
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from app.core.config import settings
+from app.services.provdocuments import embedding_cache
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "EMBED_CACHE_PATH", str(tmp_path / "embeddings.sqlite3"))
+    monkeypatch.setattr(settings, "EMBED_CACHE_MAX_ENTRIES", 2)
+    embedding_cache._connection.cache_clear()
+    yield embedding_cache
+    conn = embedding_cache._connection()
+    if conn is not None:
+        conn.close()
+    embedding_cache._connection.cache_clear()
+
+
+def test_round_trip_is_keyed_by_model_and_dims(cache):
+    vec = np.arange(4, dtype=np.float32)
+    cache.put_many("m", 4, ["제1조"], [vec])
+    hits = cache.get_many("m", 4, ["제1조", "제2조"])
+    assert list(hits) == [0] and hits[0].dtype == np.float32
+    np.testing.assert_array_equal(hits[0], vec)
+    assert cache.get_many("m", 8, ["제1조"]) == {}
+    assert cache.get_many("other", 4, ["제1조"]) == {}
+
+
+def test_least_recently_used_entry_is_evicted(cache, monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(embedding_cache.time, "time", lambda: clock[0])
+    vec = np.ones(2, dtype=np.float32)
+
+    cache.put_many("m", 2, ["a", "b"], [vec, vec])
+    clock[0] += 1
+    cache.get_many("m", 2, ["a"])  # a를 최근 사용으로 갱신
+    clock[0] += 1
+    cache.put_many("m", 2, ["c"], [vec])
+
+    assert sorted(cache.get_many("m", 2, ["a", "b", "c"])) == [0, 2]
+
+
+def test_disabled_cache_is_a_no_op(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "EMBED_CACHE_MAX_ENTRIES", 0)
+    embedding_cache._connection.cache_clear()
+    embedding_cache.put_many("m", 2, ["a"], [np.ones(2, dtype=np.float32)])
+    assert embedding_cache.get_many("m", 2, ["a"]) == {}
+    embedding_cache._connection.cache_clear()
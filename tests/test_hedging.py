@@ -0,0 +1,49 @@
+import asyncio
+
+from app.core.config import settings
+from app.services.chatbot import hedging
+
+
+def _fast_hedge(monkeypatch, delay=0.05):
+    monkeypatch.setattr(settings, "CHAT_HEDGE_MIN_SAMPLES", 10**6)
+    monkeypatch.setattr(settings, "CHAT_HEDGE_DEFAULT_DELAY_S", delay)
+    monkeypatch.setattr(settings, "CHAT_HEDGE_MIN_DELAY_S", 0.0)
+
+
+def test_queue_wait_does_not_fire_hedge(monkeypatch):
+    _fast_hedge(monkeypatch)
+    starts = []
+
+    async def start(admitted):
+        starts.append(admitted)
+        await asyncio.sleep(0.2)  # rate governor 대기 (마감보다 김)
+        admitted.set()
+        await asyncio.sleep(0.01)  # 슬롯 이후 첫 토큰은 마감 안
+        return "primary"
+
+    async def close(result):
+        pass
+
+    assert asyncio.run(hedging.race_first_token(start, close)) == "primary"
+    assert len(starts) == 1
+
+
+def test_late_first_token_after_admission_fires_hedge(monkeypatch):
+    _fast_hedge(monkeypatch)
+    closed = []
+    started = []
+
+    async def start(admitted):
+        admitted.set()
+        if len(started) == 0:
+            started.append("primary")
+            await asyncio.sleep(1.0)
+            return "primary"
+        started.append("hedge")
+        return "hedge"
+
+    async def close(result):
+        closed.append(result)
+
+    assert asyncio.run(hedging.race_first_token(start, close)) == "hedge"
+    assert started == ["primary", "hedge"]
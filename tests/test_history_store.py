@@ -0,0 +1,52 @@
+import asyncio
+
+from app.core.config import settings
+from app.services.chatbot import history_store
+
+
+def _history(n):
+    return [{"role": "user" if i % 2 == 0 else "assistant", "content": f"메시지 {i}"} for i in range(n)]
+
+
+def test_reset_during_update_drops_stale_summary(monkeypatch):
+    monkeypatch.setattr(settings, "CHAT_HISTORY_RECENT_TURNS", 2)
+    async def scenario():
+        gate = asyncio.Event()
+
+        async def slow_summarize(previous, turns):
+            await gate.wait()
+            return "이전 대화 요약"
+
+        monkeypatch.setattr(history_store, "_summarize", slow_summarize)
+        history_store.build_history_block("s-reset", _history(8))
+        await asyncio.sleep(0)
+        state = history_store._get_state("s-reset")
+        # 요약 갱신 중 다른 대화로 바뀜 (history가 짧아짐)
+        with history_store._lock:
+            state.summarized_turns = 6
+        history_store.build_history_block("s-reset", _history(4))
+        gate.set()
+        await asyncio.gather(*history_store._background)
+        return state
+
+    state = asyncio.run(scenario())
+    assert state.summary == ""
+    assert state.summarized_turns == 0
+    assert state.updating is False
+
+
+def test_summary_is_applied_when_session_unchanged(monkeypatch):
+    monkeypatch.setattr(settings, "CHAT_HISTORY_RECENT_TURNS", 2)
+
+    async def fake_summarize(previous, turns):
+        return f"요약 {len(turns)}턴"
+
+    async def scenario():
+        monkeypatch.setattr(history_store, "_summarize", fake_summarize)
+        history_store.build_history_block("s-keep", _history(6))
+        await asyncio.gather(*history_store._background)
+        return history_store._get_state("s-keep")
+
+    state = asyncio.run(scenario())
+    assert state.summary == "요약 4턴"
+    assert state.summarized_turns == 4
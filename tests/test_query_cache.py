@@ -0,0 +1,51 @@
+from app.core.config import settings
+from app.services.chatbot import query_cache
+
+
+def test_shortest_table_ttl_wins(monkeypatch):
+    monkeypatch.setattr(settings, "SQL_CACHE_TTL_S", 30)
+    monkeypatch.setattr(settings, "SQL_CACHE_TABLE_TTLS", {"mail": 10, "employee": 300})
+    assert query_cache.ttl_for_tables(["employee", "mail"]) == 10
+    assert query_cache.ttl_for_tables(["board"]) == 30
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    monkeypatch.setattr(settings, "SQL_CACHE_TABLE_TTLS", {"mail": 10})
+    now = [1000.0]
+    monkeypatch.setattr(query_cache.time, "monotonic", lambda: now[0])
+    sql, params = "SELECT title FROM mail WHERE com_id = :com_id", {"com_id": "c1"}
+
+    query_cache.put_cached(sql, params, [{"title": "a"}], ["mail"])
+    assert query_cache.get_cached(sql, params) == [{"title": "a"}]
+    assert query_cache.get_cached(sql, {"com_id": "c2"}) is None  # 파라미터가 다르면 다른 항목
+
+    now[0] += 11
+    assert query_cache.get_cached(sql, params) is None
+
+
+def test_zero_ttl_disables_caching(monkeypatch):
+    monkeypatch.setattr(settings, "SQL_CACHE_TABLE_TTLS", {"attendance": 0})
+    sql = "SELECT emp_id FROM attendance"
+    query_cache.put_cached(sql, None, [{"emp_id": "e1"}], ["attendance"])
+    assert query_cache.get_cached(sql, None) is None
+
+
+def test_fingerprint_groups_literals():
+    a = query_cache.fingerprint_sql("SELECT * FROM mail WHERE emp_id = 'e1' AND id IN (1, 2)")
+    b = query_cache.fingerprint_sql("select *  from mail where emp_id = 'e2' and id in (3)")
+    assert a == b
+
+
+def test_whitespace_inside_literals_keeps_cache_keys_apart():
+    a = query_cache.normalize_sql("SELECT  title FROM board\n WHERE title = 'a  b'")
+    b = query_cache.normalize_sql("SELECT title FROM board WHERE title = 'a b'")
+    assert a == "SELECT title FROM board WHERE title = 'a  b'"
+    assert a != b
+    assert query_cache.normalize_sql("SELECT 1 WHERE x = 'it''s  ok' AND y  =  'p'") == "SELECT 1 WHERE x = 'it''s  ok' AND y = 'p'"
+    assert query_cache.fingerprint_sql("WHERE title = 'a  b'") == query_cache.fingerprint_sql("WHERE title = 'a b'")
+
+
+def test_cached_rows_are_not_shared_across_literal_whitespace(monkeypatch):
+    monkeypatch.setattr(settings, "SQL_CACHE_TABLE_TTLS", {"board": 60})
+    query_cache.put_cached("SELECT title FROM board WHERE title = 'a  b'", None, [{"title": "a  b"}], ["board"])
+    assert query_cache.get_cached("SELECT title FROM board WHERE title = 'a b'", None) is None
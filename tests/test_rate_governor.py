@@ -0,0 +1,32 @@
+import time
+
+import pytest
+
+from app.core.config import settings
+from app.services import rate_governor
+
+
+@pytest.fixture(autouse=True)
+def fresh_buckets(monkeypatch):
+    monkeypatch.setattr(rate_governor, "_buckets", {})
+    monkeypatch.setattr(rate_governor, "_waiters", [])
+
+
+def test_no_token_limit_until_configured(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_QUEUE_TIMEOUT_S", 1.0)
+    started = time.monotonic()
+    for _ in range(20):  # 챗봇 1건(~15k 토큰) x 20
+        with rate_governor.llm_slot("gpt-4o", 15000):
+            pass
+    assert time.monotonic() - started < 0.5
+    status = rate_governor._bucket("gpt-4o")
+    assert status.tpm == 0 and status.rpm == 0
+
+
+def test_configured_limit_is_enforced(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_RATE_LIMITS", {"gpt-4o": {"tpm": 20000, "rpm": 0}})
+    monkeypatch.setattr(settings, "LLM_QUEUE_TIMEOUT_S", 0.2)
+    with rate_governor.llm_slot("gpt-4o", 15000):
+        pass
+    with pytest.raises(RuntimeError):
+        rate_governor.acquire("gpt-4o", 15000)
@@ -0,0 +1,44 @@
+import pytest
+
+from app.core.config import settings
+from app.services.chatbot import rdb_service
+from app.services.chatbot.agent_tools import format_rows
+from app.services.chatbot.rdb_service import NarrowedRows, _guard_cost
+
+
+def _estimates(monkeypatch, by_sql):
+    monkeypatch.setattr(settings, "SQL_EXPLAIN_MAX_ROWS", 100)
+    monkeypatch.setattr(rdb_service, "_explain_row_estimate", lambda conn, sql, params: by_sql[sql])
+
+
+def test_guard_rejects_expensive_like_by_default(monkeypatch):
+    sql = "SELECT title FROM board WHERE title LIKE '%휴가%'"
+    _estimates(monkeypatch, {sql: 10_000})
+    assert settings.SQL_GUARD_REWRITE_LIKE is False
+    with pytest.raises(RuntimeError):
+        _guard_cost(None, sql, {})
+
+
+def test_guard_marks_prefix_rewrite_as_narrowed(monkeypatch):
+    sql = "SELECT title FROM board WHERE title LIKE '%휴가%'"
+    rewritten = "SELECT title FROM board WHERE title LIKE '휴가%'"
+    _estimates(monkeypatch, {sql: 10_000, rewritten: 10})
+    monkeypatch.setattr(settings, "SQL_GUARD_REWRITE_LIKE", True)
+    assert _guard_cost(None, sql, {}) == (rewritten, True)
+
+
+def test_narrowed_rows_are_flagged_in_db_text():
+    text = format_rows(NarrowedRows([{"title": "휴가 신청"}]))
+    assert "시작하는" in text.splitlines()[0]
+    assert "시작하는" not in format_rows([{"title": "휴가 신청"}])
+
+
+def test_async_dsn_uses_installed_drivers():
+    import importlib.util
+
+    from app.services.chatbot.rdb_service import _async_dsn
+
+    assert _async_dsn("sqlite:////tmp/emp.db") == "sqlite+aiosqlite:////tmp/emp.db"
+    assert _async_dsn("postgresql://u:p@db/emp") == "postgresql+asyncpg://u:p@db/emp"
+    assert _async_dsn("mysql+pymysql://u:p@db/emp") == "mysql+aiomysql://u:p@db/emp"
+    assert importlib.util.find_spec("aiosqlite") is not None
@@ -0,0 +1,56 @@
+import asyncio
+import threading
+
+from app.services.chatbot import schema_catalog
+
+
+def test_cold_catalog_loads_off_the_event_loop(monkeypatch):
+    threads = []
+
+    def fake_load():
+        threads.append(threading.current_thread())
+        monkeypatch.setattr(schema_catalog, "_tables", {"employee": ["emp_id str"]})
+        return schema_catalog._tables
+
+    monkeypatch.setattr(schema_catalog, "_tables", None)
+    monkeypatch.setattr(schema_catalog, "load_schema_catalog", fake_load)
+
+    async def scenario():
+        loop_thread = threading.current_thread()
+        assert await schema_catalog.ensure_schema_catalog() is True
+        assert await schema_catalog.ensure_schema_catalog() is True  # 두 번째는 캐시
+        return loop_thread
+
+    loop_thread = asyncio.run(scenario())
+    assert len(threads) == 1 and threads[0] is not loop_thread
+
+
+def test_failed_load_reports_false(monkeypatch):
+    def broken():
+        raise RuntimeError("db down")
+
+    monkeypatch.setattr(schema_catalog, "_tables", None)
+    monkeypatch.setattr(schema_catalog, "load_schema_catalog", broken)
+    assert asyncio.run(schema_catalog.ensure_schema_catalog()) is False
+
+
+def test_lifespan_starts_schema_catalog_off_the_event_loop(monkeypatch):
+    import app.main as main
+
+    threads = []
+
+    async def noop():
+        pass
+
+    monkeypatch.setattr(main, "start_schema_catalog", lambda: threads.append(threading.current_thread()))
+    monkeypatch.setattr(main, "bootstrap_weaviate", lambda: None)
+    monkeypatch.setattr(main, "stop_schema_catalog", lambda: None)
+    for name in ("cancel_all_chatbots", "close_http", "close_weaviate", "dispose_read_engine"):
+        monkeypatch.setattr(main, name, noop)
+
+    async def scenario():
+        async with main.lifespan(main.app):
+            return threading.current_thread()
+
+    loop_thread = asyncio.run(scenario())
+    assert len(threads) == 1 and threads[0] is not loop_thread
@@ -0,0 +1,24 @@
+import pytest
+
+from app.services import tokens
+
+
+@pytest.fixture
+def no_encoder(monkeypatch):
+    monkeypatch.setattr(tokens, "_encoding", lambda model: None)
+
+
+def test_fallback_does_not_undercount_korean(no_encoder):
+    text = "연차휴가는 입사일 기준으로 부여한다"
+    hangul = sum(1 for ch in text if ord(ch) >= 128)
+    assert tokens.count_tokens(text, "gpt-4o") >= hangul
+    assert tokens.count_tokens("a" * 40, "gpt-4o") == 10
+
+
+def test_fallback_truncate_and_split_respect_the_budget(no_encoder):
+    text = "제1조(목적) 이 규정은 Annual leave 기준을 정한다. " * 20
+    cut = tokens.truncate_to_tokens(text, 50, "gpt-4o")
+    assert tokens.count_tokens(cut, "gpt-4o") <= 50 and text.startswith(cut)
+    pieces = tokens.split_by_tokens(text, 50, "gpt-4o")
+    assert "".join(pieces) == text
+    assert all(tokens.count_tokens(p, "gpt-4o") <= 50 for p in pieces)
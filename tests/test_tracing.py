@@ -0,0 +1,22 @@
+from app.core.config import settings
+from app.services import tracing
+
+
+def test_reruns_of_same_key_get_distinct_traces(monkeypatch):
+    monkeypatch.setattr(settings, "TRACE_ENABLED", True)
+    monkeypatch.setattr(settings, "TRACE_JSONL_PATH", None)
+    monkeypatch.setattr(settings, "TRACE_OTLP_ENDPOINT", None)
+
+    ids = []
+    for run in range(2):
+        with tracing.start_trace("prov", 42, run=run) as trace_id:
+            with tracing.span("embed"):
+                pass
+            ids.append(trace_id)
+
+    assert ids[0] != ids[1]
+    recent = {t["traceId"] for t in tracing.recent_traces()}
+    assert set(ids) <= recent
+    # key로 찾으면 가장 최근 실행
+    assert tracing.trace_waterfall("42")["traceId"] == ids[1]
+    assert tracing.trace_waterfall(ids[0])["traceId"] == ids[0]
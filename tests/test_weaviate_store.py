@@ -0,0 +1,186 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.provdocuments import weaviate_store
+
+
+class _LaggyCollection:
+    """upsert가 lag_reads번의 조회 뒤에야 필터에 반영되는 가짜 컬렉션. lost면 끝까지 반영되지 않는다."""
+
+    def __init__(self, n, lag_reads=1, lost=()):
+        self.objects = {
+            f"u{i}": {"isPublic": False, "comId": "c1", "provNo": 1, "chunkIndex": i} for i in range(n)
+        }
+        self.visible = {k: False for k in self.objects}
+        self.lag_reads = lag_reads
+        self.lost = set(lost)
+        self.written = []
+        self.reads = 0
+        self.query = SimpleNamespace(fetch_objects=self._fetch)
+        self.aggregate = SimpleNamespace(over_all=self._count)
+
+    def _pending(self):
+        return [k for k, v in self.visible.items() if v is False]
+
+    def _fetch(self, filters=None, limit=None, include_vector=False):
+        self.reads += 1
+        for uuid, at in list(self.written):
+            if self.reads - at > self.lag_reads and uuid not in self.lost:
+                self.visible[uuid] = True
+        objs = [
+            SimpleNamespace(uuid=k, properties=dict(self.objects[k]), vector={"default": [0.1, 0.2]})
+            for k in self._pending()[:limit]
+        ]
+        return SimpleNamespace(objects=objs)
+
+    def _count(self, filters=None, total_count=True):
+        return SimpleNamespace(total_count=len(self._pending()))
+
+
+@pytest.fixture
+def fake_store(monkeypatch):
+    def install(coll):
+        monkeypatch.setattr(weaviate_store, "get_client", lambda: None)
+        monkeypatch.setattr(weaviate_store, "_collection", lambda client, com_id, create=False: coll)
+        monkeypatch.setattr(weaviate_store, "count_prov_chunks", lambda *a: len(coll.objects))
+        monkeypatch.setattr(weaviate_store.time, "sleep", lambda s: None)
+
+        def fake_insert(c, objects):
+            c.written.extend((o["uuid"], c.reads) for o in objects)
+            return len(objects)
+
+        monkeypatch.setattr(weaviate_store, "_batch_insert", fake_insert)
+        return coll
+
+    return install
+
+
+def test_visibility_update_waits_out_read_lag(fake_store):
+    coll = fake_store(_LaggyCollection(5, lag_reads=2))
+    assert weaviate_store.update_prov_chunks_public("c1", 1, True, batch_size=2) == 5
+    progress = weaviate_store.visibility_progress("c1", 1)
+    assert progress["state"] == "done" and progress["pending"] == 0
+    assert not coll._pending()
+
+
+def test_visibility_update_reports_pending_instead_of_done(fake_store):
+    fake_store(_LaggyCollection(3, lag_reads=0, lost={"u1"}))
+    weaviate_store.update_prov_chunks_public("c1", 1, True, batch_size=10)
+    progress = weaviate_store.visibility_progress("c1", 1)
+    assert progress["state"] == "pending"
+    assert progress["pending"] == 1
+
+
+class _SearchCollection:
+    def __init__(self, results):
+        self.results = list(results)
+        self.calls = []
+        self.query = SimpleNamespace(hybrid=self._hybrid)
+
+    def _hybrid(self, **kwargs):
+        self.calls.append(kwargs)
+        return SimpleNamespace(objects=self.results.pop(0))
+
+
+def _hit(prov_no, score, article_no=3):
+    return SimpleNamespace(
+        properties={"content": f"제{article_no}조 내용", "provNo": prov_no, "chunkIndex": 0, "articleNo": article_no},
+        metadata=SimpleNamespace(score=score, distance=None),
+    )
+
+
+@pytest.fixture
+def fake_search(monkeypatch):
+    import numpy as np
+
+    def install(coll):
+        monkeypatch.setattr(weaviate_store.settings, "RAG_SEARCH_MODE", "hybrid")
+        monkeypatch.setattr(weaviate_store.settings, "RAG_ARTICLE_LOOKUP", True)
+        monkeypatch.setattr(weaviate_store, "get_client", lambda: None)
+        monkeypatch.setattr(weaviate_store, "_collection", lambda client, com_id, create=False: coll)
+        monkeypatch.setattr(weaviate_store, "embed_chunks", lambda texts: [np.zeros(4, dtype=np.float32)])
+        return coll
+
+    return install
+
+
+def _filter_text(where):
+    # _FilterAnd/_FilterOr는 하위 필터 목록, _FilterValue는 target을 가진다
+    children = getattr(where, "filters", None)
+    if children is not None:
+        return " ".join(_filter_text(f) for f in children)
+    return str(getattr(where, "target", ""))
+
+
+def test_article_question_is_ranked_within_the_article(fake_search):
+    coll = fake_search(_SearchCollection([[_hit(7, 0.82), _hit(2, 0.31)]]))
+    hits = weaviate_store.search_prov_chunk_hits("휴가 규정 제3조 알려줘", com_id="c1")
+
+    assert len(coll.calls) == 1
+    call = coll.calls[0]
+    assert call["query"] == "휴가 규정 제3조 알려줘" and "vector" in call
+    assert "articleNo" in _filter_text(call["filters"]) and "comId" in _filter_text(call["filters"])
+    assert [h["score"] for h in hits] == [0.82, 0.31]
+
+
+def test_article_question_falls_back_to_full_search(fake_search):
+    coll = fake_search(_SearchCollection([[], [_hit(1, 0.5, article_no=None)]]))
+    hits = weaviate_store.search_prov_chunk_hits("제99조 뭐야", com_id="c1")
+
+    assert len(coll.calls) == 2
+    assert "articleNo" not in _filter_text(coll.calls[1]["filters"])
+    assert hits[0]["score"] == 0.5
+
+
+def test_hits_without_ranking_metadata_do_not_outscore_matches():
+    assert weaviate_store._hit_score(None) == 0.0
+    assert weaviate_store._hit_score(SimpleNamespace(score=None, distance=0.25)) == 0.75
+
+
+class _TenantCollection:
+    def __init__(self, existing=()):
+        self.existing = set(existing)
+        self.tenants = SimpleNamespace(exists=lambda n: n in self.existing, create=self._create)
+
+    def _create(self, tenant):
+        self.existing.add(tenant.name)
+
+    def with_tenant(self, name):
+        return SimpleNamespace(tenant=name)
+
+
+@pytest.fixture
+def multi_tenant(monkeypatch):
+    def install(coll):
+        monkeypatch.setattr(weaviate_store.settings, "WEAVIATE_MULTI_TENANCY", True)
+        monkeypatch.setattr(weaviate_store, "ensure_collection", lambda client: None)
+        monkeypatch.setattr(weaviate_store, "_handles", {"": coll})
+        monkeypatch.setattr(weaviate_store, "_known_tenants", set())
+        return coll
+
+    return install
+
+
+def test_tenant_name_hashes_invalid_com_ids():
+    assert weaviate_store.tenant_name("C001") == "C001"
+    hashed = weaviate_store.tenant_name("회사/1")
+    assert hashed.startswith("t_") and hashed == weaviate_store.tenant_name("회사/1")
+
+
+def test_reads_do_not_create_missing_tenants(multi_tenant):
+    coll = multi_tenant(_TenantCollection(existing={"c1"}))
+    assert weaviate_store._collection(None, "c1").tenant == "c1"
+    assert weaviate_store._collection(None, "c2") is None
+    assert "c2" not in coll.existing
+
+
+def test_ingest_creates_tenant_lazily(multi_tenant):
+    coll = multi_tenant(_TenantCollection())
+    assert weaviate_store._collection(None, "c9", create=True).tenant == "c9"
+    assert "c9" in coll.existing
+
+
+def test_multi_tenant_search_requires_com_id(multi_tenant):
+    multi_tenant(_TenantCollection())
+    assert weaviate_store.search_prov_chunk_hits("연차", com_id=None) == []